@@ -1,30 +1,59 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify,make_response
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Response, stream_with_context
 import json
 import os
+import re
 from datetime import datetime
-from flask_mysqldb import MySQL
-import pymysql.cursors
-import MySQLdb.cursors
-from MySQLdb.cursors import DictCursor
-from weasyprint import HTML
 from io import BytesIO
-import pandas as pd
-import xlsxwriter
-import openpyxl
-from flask import send_file
-from xhtml2pdf import pisa 
-import io
-from weasyprint.text.fonts import FontConfiguration
+from flask import send_file, abort
+import gzip
+import hashlib
 from werkzeug.security import generate_password_hash
+from werkzeug.utils import secure_filename
 import traceback
+import time
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired
-from functools import wraps
-import mysql.connector
-
+from functools import lru_cache, wraps
+import sys
+import click
+
+# config.py (raiz do projeto) e o pacote servicos/ precisam ser importáveis tanto
+# pelo gunicorn (app.app:app) quanto por `flask run` / `python app/app.py`
+_DIR_APP = os.path.dirname(os.path.abspath(__file__))
+for _caminho in (_DIR_APP, os.path.dirname(_DIR_APP)):
+    if _caminho not in sys.path:
+        sys.path.append(_caminho)
+
+from config import get_config_class
+from servicos.pool_mysql import PoolMySQL
+from servicos.carregamento_tardio import ModuloTardio, aquecer_bibliotecas
+from servicos.exportacao import (FONTES_EXPORTACAO, MIMETYPE_XLSX, abrir_cursor_servidor, estimar_linhas,
+                                  exportar_texto, exportar_xlsx, gerar_xlsx)
+from servicos.cache_pdf import CachePDF
+from servicos.tarefas import CONCLUIDA, FilaTarefas
+from servicos.render_pdf import CSS_GUIDE, MOTOR_WEASYPRINT, MOTOR_XHTML2PDF, Renderizador, html_para_pdf
+from servicos.lote_pdf import Vazao, converter_em_paralelo, processos_padrao, zip_em_stream
+from servicos import contadores_alunos, cpf_alunos, listagem_alunos, questionarios, resumo_guide, status_lote
+from servicos.esquema import garantir_indices
+from servicos import anexos, busca_alunos, evidencias_suporte, ingestao, listagem_chamados, listagem_relatorios, uploads
+from servicos.uploads_retomaveis import AreaUploads, BlocoInvalido, UploadIncompleto, UploadInexistente
+from servicos.anexos import ArmazemAnexos
+from servicos.uploads import (ASSINATURAS_IMAGEM, ASSINATURAS_PDF, ArquivoGrandeDemais,
+                              RequisicaoComUploads, TipoNaoPermitido, UploadRecusado)
+from servicos.versoes import VersoesCompartilhadas
+from servicos.cache_ttl import CacheTTL
+
+# MySQLdb importado só no primeiro uso; weasyprint/xhtml2pdf ficam em servicos.render_pdf
+MySQLdb = ModuloTardio('MySQLdb', submodulos=('cursors',))
+# Estatísticas do dashboard dependem de NumPy: carregadas no primeiro acesso ao dashboard
+estatisticas_guide = ModuloTardio('servicos.estatisticas_guide')
+importacao_alunos = ModuloTardio('servicos.importacao_alunos')
 
 app = Flask(__name__)
+# Arquivos do multipart gravados direto no destino nas rotas com @recebe_uploads
+app.request_class = RequisicaoComUploads
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'uma_chave_de_dev_aleatoria')
 
 class ServidorForm(FlaskForm):
@@ -90,8 +119,68 @@ app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD', 'Q1k2v1y5@2025')
 app.config['MYSQL_DB'] = os.getenv('MYSQL_DB', 'u799109175_db_funcae')
 app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
 
-
-mysql = MySQL(app)
+# Pool de conexões e demais ajustes de desempenho vêm das classes Config do config.py
+_config = get_config_class()
+for _chave in dir(_config):
+    if _chave.startswith(('MYSQL_POOL_', 'PRELOAD_', 'PDF_CACHE_', 'PDF_BATCH_', 'JOBS_', 'DASHBOARD_', 'CACHE_', 'CPF_', 'ALUNOS_',
+                          'INGESTAO_', 'ANEXOS_', 'SUPORTE_')):
+        app.config[_chave] = getattr(_config, _chave)
+
+mysql = PoolMySQL(app)
+
+if app.config['PRELOAD_REPORT_LIBS']:
+    aquecer_bibliotecas()
+
+# Cache em disco dos PDFs (caminhos relativos partem da raiz do projeto)
+cache_pdf = CachePDF(
+    os.path.join(os.path.dirname(_DIR_APP), app.config['PDF_CACHE_DIR']),
+    app.config['PDF_CACHE_MAX_MB'] * 1024 * 1024,
+    ativo=app.config['PDF_CACHE_ENABLED']
+)
+
+# Fila de tarefas em segundo plano (executadas por `flask tarefas-worker`)
+fila_tarefas = FilaTarefas(
+    os.path.join(os.path.dirname(_DIR_APP), app.config['JOBS_DB']),
+    os.path.join(os.path.dirname(_DIR_APP), app.config['JOBS_DIR']),
+    retencao=app.config['JOBS_RETENTION_HOURS'] * 3600
+)
+fila_tarefas.init_app(app)
+
+# Anexos dos relatórios de avaliação, fora do banco (só os metadados ficam na tabela)
+armazem_anexos = ArmazemAnexos(
+    os.path.join(os.path.dirname(_DIR_APP), app.config['ANEXOS_DIR']),
+    app.config['ANEXOS_MAX_MB'] * 1024 * 1024,
+    ASSINATURAS_PDF
+)
+
+# Uploads de anexo em blocos (retomáveis) ficam dentro do armazém: finalizar só renomeia
+area_uploads = AreaUploads(
+    os.path.join(armazem_anexos.diretorio, 'parciais'),
+    app.config['ANEXOS_RETOMAVEL_MAX_MB'] * 1024 * 1024,
+    app.config['ANEXOS_BLOCO_MB'] * 1024 * 1024,
+    app.config['ANEXOS_PARCIAIS_HORAS'] * 3600
+)
+
+# Evidências dos chamados de suporte (imagem ou PDF), uma cópia por conteúdo
+armazem_evidencias = ArmazemAnexos(
+    os.path.join(os.path.dirname(_DIR_APP), app.config['SUPORTE_EVIDENCIA_DIR']),
+    app.config['SUPORTE_EVIDENCIA_MAX_MB'] * 1024 * 1024,
+    ASSINATURAS_PDF + ASSINATURAS_IMAGEM
+)
+
+# Versões compartilhadas entre os workers: invalidam os caches em memória de todos
+versoes = VersoesCompartilhadas(os.path.join(os.path.dirname(_DIR_APP), app.config['CACHE_VERSIONS_DIR']))
+cache_dashboard = CacheTTL(app.config['DASHBOARD_CACHE_TTL'])
+# Lista de alunos ativos dos formulários (selects), invalidada pela versão 'alunos'
+cache_alunos_ativos = CacheTTL(app.config['ALUNOS_ATIVOS_CACHE_TTL'])
+# Índice de busca de alunos por nome/matrícula/CPF, sincronizado pela versão 'alunos'
+indice_alunos = busca_alunos.IndiceAlunos()
+
+# Processos de conversão aquecidos, reaproveitados entre os lotes de PDF
+renderizador = Renderizador(
+    app.config['PDF_BATCH_WORKERS'] or processos_padrao(),
+    tempo_ocioso=app.config['PDF_BATCH_IDLE_TIMEOUT']
+)
     
 @app.route('/')
 def index():
@@ -142,37 +231,29 @@ def acesso_requerido(*tipo_acesso):
         return decorated_function
     return decorator
 
+
+def recebe_uploads(fabrica):
+    """
+    Decorador: os arquivos do multipart desta rota vão para fabrica() (ex.: um
+    ArquivoRecebido), gravados em blocos no destino durante o upload.
+
+    Use abaixo de @acesso_requerido, que não lê o formulário.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            request.fabrica_uploads = fabrica
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
 @app.route('/home')
 @acesso_requerido('Master', 'Pleno', 'Junior')
 def home():
     try:
-        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)  # Use DictCursor específico
-        
-        # Primeiro, vamos ver todos os status únicos na tabela
-        cur.execute("SELECT DISTINCT status_aluno FROM tbl_cad_alunos WHERE status_aluno IS NOT NULL")
-        status_list = cur.fetchall()
-        print(f"Status encontrados na tabela: {status_list}")
-        
-        # Consulta principal com mais debug
-        cur.execute("""
-            SELECT 
-                COUNT(CASE WHEN TRIM(UPPER(status_aluno)) = 'ATIVO' THEN 1 END) AS alunos_ativos,
-                COUNT(CASE WHEN TRIM(UPPER(status_aluno)) = 'INATIVO' THEN 1 END) AS alunos_inativos,
-                COUNT(*) AS total_alunos,
-                GROUP_CONCAT(DISTINCT CONCAT("'", TRIM(UPPER(status_aluno)), "'")) AS todos_status
-            FROM tbl_cad_alunos
-        """)
-        
-        result = cur.fetchone()
-        cur.close()
-        
-        print(f"Resultado da consulta: {result}")
-        print(f"Status processados: {result.get('todos_status', 'Nenhum')}")
-
-        # Garantir que os valores não sejam None
-        total_alunos = int(result.get('total_alunos') or 0)
-        alunos_ativos = int(result.get('alunos_ativos') or 0)
-        alunos_inativos = int(result.get('alunos_inativos') or 0)
+        # Totais mantidos por cad_aluno/atualizar_aluno/baixas (tbl_contadores_alunos)
+        contadores_alunos.garantir_tabela(mysql.connection)
+        total_alunos, alunos_ativos, alunos_inativos = contadores_alunos.totais(mysql.connection)
         
         print(f"Valores finais - Total: {total_alunos}, Ativos: {alunos_ativos}, Inativos: {alunos_inativos}")
 
@@ -273,36 +354,36 @@ def cad_aluno():
         equipe_multidisciplinar = request.form.get('equipe_multidisciplinar')
         status_aluno = request.form.get('status_aluno')
         observacoes = request.form.get('observacoes')
-        data_registro = datetime.now().date()
 
+        cursor = None
         try:
+            contadores_alunos.garantir_tabela(mysql.connection)
+            cpf_alunos.garantir_coluna(mysql.connection)
             cursor = mysql.connection.cursor()
-            
-            # Debug: verificar dados recebidos
-            print(f"Dados recebidos: coordenador_pedagogico = {coordenador_pedagogico}")
-            
-            # Debug: contar campos e valores
-            campos = [nome_aluno, data_registro, dt_nascimento, cpf_aluno, tipo_rede_social, rede_social, genero, whatsapp,endereco_aluno, tipo_responsavel,
-                nome_pai, nome_mae, patologia, tipo_educacao, contato, nome_escola, turma,
-                coordenador_pedagogico, profissional_AEE, cod_cid, equipe_multidisciplinar, status_aluno, observacoes]
-            print(f"Total de valores: {len(campos)}")
-            
             cursor.execute("""
                         INSERT INTO tbl_cad_alunos (
-                        nome_aluno, dt_nascimento, cpf_aluno,tipo_rede_social, rede_social, genero, whatsapp, endereco_aluno, tipo_responsavel,
+                        nome_aluno, dt_nascimento, cpf_aluno, cpf_normalizado, tipo_rede_social, rede_social, genero, whatsapp, endereco_aluno, tipo_responsavel,
                         nome_pai, nome_mae, patologia, tipo_educacao, contato, nome_escola, turma,
                         coordenador_pedagogico, profissional_AEE, cod_cid, equipe_multidisciplinar, status_aluno, observacoes
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                     """,(
-                nome_aluno, dt_nascimento, cpf_aluno,tipo_rede_social, rede_social, genero, whatsapp, endereco_aluno, tipo_responsavel,
+                nome_aluno, dt_nascimento, cpf_aluno, cpf_alunos.normalizar(cpf_aluno), tipo_rede_social, rede_social, genero, whatsapp, endereco_aluno, tipo_responsavel,
                 nome_pai, nome_mae, patologia, tipo_educacao, contato, nome_escola, turma,
                 coordenador_pedagogico, profissional_AEE, cod_cid, equipe_multidisciplinar, status_aluno, observacoes
             ))
+            contadores_alunos.ajustar(cursor, status_aluno, 1)
             mysql.connection.commit()
+            versoes.incrementar('alunos')
             flash('Aluno cadastrado com sucesso!', 'success')
-            print("Cadastro realizado com sucesso!")
             
+        except MySQLdb.IntegrityError as e:
+            mysql.connection.rollback()
+            if not cpf_alunos.cpf_duplicado(e):
+                flash(f'Erro ao cadastrar aluno: {str(e)}', 'error')
+            else:
+                flash(f'Já existe um aluno cadastrado com o CPF {cpf_aluno}.', 'error')
         except Exception as e:
+            mysql.connection.rollback()
             flash(f'Erro ao cadastrar aluno: {str(e)}', 'error')
             print(f"Erro detalhado: {e}")   
             print(f"Tipo do erro: {type(e)}")
@@ -315,6 +396,59 @@ def cad_aluno():
 
     return render_template('cad_aluno.html')
 
+def importar_planilha_alunos(arquivo, nome_arquivo, simulacao, encoding='utf-8-sig'):
+    """
+    Importa (ou simula) uma planilha de alunos em tbl_cad_alunos
+
+    Raises:
+        ValueError: formato ou cabeçalho inválido
+        UnicodeDecodeError: CSV em outra codificação
+
+    Returns:
+        importacao_alunos.Relatorio
+    """
+    # DDL faz commit implícito: garante coluna e contadores antes das transações
+    cpf_alunos.garantir_coluna(mysql.connection)
+    contadores_alunos.garantir_tabela(mysql.connection)
+    relatorio = importacao_alunos.importar(
+        mysql.connection, importacao_alunos.ler_planilha(arquivo, nome_arquivo, encoding),
+        simulacao=simulacao, tamanho_lote=app.config['ALUNOS_IMPORT_BATCH_SIZE']
+    )
+    if relatorio.inseridos and not simulacao:
+        versoes.incrementar('alunos')
+    return relatorio
+
+
+@app.route('/importar_alunos', methods=['GET', 'POST'])
+@acesso_requerido('Master', 'Pleno')
+def importar_alunos():
+    relatorio = None
+    if request.method == 'POST':
+        arquivo = request.files.get('arquivo')
+        if arquivo is None or not arquivo.filename:
+            flash('Selecione uma planilha (.xlsx ou .csv).', 'warning')
+            return redirect(url_for('importar_alunos'))
+
+        simulacao = request.form.get('simulacao') == '1'
+        try:
+            relatorio = importar_planilha_alunos(arquivo.stream, arquivo.filename, simulacao).como_dict()
+        except UnicodeDecodeError:
+            flash('O CSV não está em UTF-8. Salve a planilha como "CSV UTF-8" e envie novamente.', 'danger')
+        except ValueError as e:
+            flash(str(e), 'danger')
+        except Exception as e:
+            mysql.connection.rollback()
+            flash(f'Erro na importação: {str(e)}', 'danger')
+        else:
+            if simulacao:
+                flash(f'Simulação: {relatorio["inseridos"]} aluno(s) seriam cadastrados.', 'info')
+            else:
+                flash(f'{relatorio["inseridos"]} aluno(s) cadastrado(s) com sucesso!', 'success')
+
+    return render_template('importar_alunos.html', relatorio=relatorio,
+                           colunas=importacao_alunos.COLUNAS, obrigatorias=importacao_alunos.OBRIGATORIAS)
+
+
 @app.route('/atualizar_aluno', methods=['POST'])
 @acesso_requerido('Master', 'Pleno', 'Junior')
 def atualizar_aluno():
@@ -350,14 +484,20 @@ def atualizar_aluno():
         status_aluno = request.form.get('status_aluno')
         observacoes = request.form.get('observacoes')
 
+        cursor = None
         try:
+            resumo_guide.garantir_tabela(mysql.connection)
+            contadores_alunos.garantir_tabela(mysql.connection)
+            cpf_alunos.garantir_coluna(mysql.connection)
             cursor = mysql.connection.cursor()
+            status_anteriores = contadores_alunos.status_atuais(cursor, 'matricula_aluno', matricula_aluno)
             
             cursor.execute("""
                 UPDATE tbl_cad_alunos SET
                     nome_aluno = %s,
                     dt_nascimento = %s,
                     cpf_aluno = %s,
+                    cpf_normalizado = %s,
                     tipo_rede_social = %s,
                     rede_social = %s,
                     genero = %s,
@@ -379,21 +519,33 @@ def atualizar_aluno():
                     observacoes = %s
                 WHERE matricula_aluno = %s
             """, (
-                nome_aluno, dt_nascimento, cpf_aluno, tipo_rede_social, rede_social, 
+                nome_aluno, dt_nascimento, cpf_aluno, cpf_alunos.normalizar(cpf_aluno), tipo_rede_social, rede_social, 
                 genero, whatsapp, endereco_aluno, tipo_responsavel, nome_pai, nome_mae, 
                 patologia, tipo_educacao, contato, nome_escola, turma, coordenador_pedagogico, 
                 profissional_AEE, cod_cid, equipe_multidisciplinar, status_aluno, observacoes,
                 matricula_aluno
             ))
+            atualizados = cursor.rowcount
+            for anterior in status_anteriores:
+                contadores_alunos.mudar_status(cursor, anterior, status_aluno)
+            resumo_guide.sincronizar_nome(cursor, matricula_aluno)
             
             mysql.connection.commit()
             
-            if cursor.rowcount > 0:
+            if atualizados > 0:
+                versoes.incrementar('dashboard')
+                versoes.incrementar('alunos')
                 flash('Dados do aluno atualizados com sucesso!', 'success')
                 print(f"Aluno {matricula_aluno} atualizado com sucesso!")
             else:
                 flash('Nenhum registro foi atualizado. Verifique a matrícula.', 'warning')
             
+        except MySQLdb.IntegrityError as e:
+            mysql.connection.rollback()
+            if not cpf_alunos.cpf_duplicado(e):
+                flash(f'Erro ao atualizar aluno: {str(e)}', 'error')
+            else:
+                flash(f'Já existe outro aluno cadastrado com o CPF {cpf_aluno}.', 'error')
         except Exception as e:
             mysql.connection.rollback()
             flash(f'Erro ao atualizar aluno: {str(e)}', 'error')
@@ -476,200 +628,105 @@ def teste_mysql():
             'dica': 'Verifique configurações de conexão MySQL'
         })
 
-@app.route('/buscar_aluno')
-@acesso_requerido('Master', 'Pleno', 'Junior')
-def buscar_aluno():
+@lru_cache(maxsize=app.config['CPF_CACHE_SIZE'])
+def aluno_por_cpf(cpf_normalizado, versao):
+    """
+    Cadastro do aluno pelo CPF normalizado (consulta no índice único)
+
+    `versao` é versoes.atual('alunos'): qualquer gravação em alunos muda a
+    chave, então buscas repetidas só são servidas da memória enquanto o
+    cadastro não muda.
+    """
+    cursor = mysql.connection.cursor()
     try:
-        cpf_aluno = request.args.get('cpf_aluno')
-        print(f"\n=== BUSCA POR CPF ===")
-        print(f"CPF recebido: {cpf_aluno}")
-        
-        if not cpf_aluno:
-            return jsonify({
-                'encontrado': False,
-                'erro': True,
-                'mensagem': 'CPF não informado'
-            }), 400
+        return cpf_alunos.buscar(cursor, cpf_normalizado)
+    finally:
+        cursor.close()
 
-        cpf_limpo = ''.join(filter(str.isdigit, cpf_aluno))
-        print(f"CPF limpo: {cpf_limpo}")
 
-        if not mysql.connection:
-            return jsonify({
-                'encontrado': False,
-                'erro': True,
-                'mensagem': 'Sem conexão com banco de dados'
-            }), 500
+@app.route('/buscar_aluno')
+@acesso_requerido('Master', 'Pleno', 'Junior')
+def buscar_aluno():
+    cpf_aluno = request.args.get('cpf_aluno')
+    cpf_limpo = cpf_alunos.normalizar(cpf_aluno)
 
-        cursor = mysql.connection.cursor()
-        print("Cursor criado com sucesso")
-        
-        # CORREÇÃO: Tratamento robusto do fetchone() para DictCursor
-        try:
-            cursor.execute("SELECT COUNT(*) FROM tbl_cad_alunos")
-            count_result = cursor.fetchone()
-            print(f"count_result raw: {count_result} (tipo: {type(count_result)})")
-            
-            # Verificar se count_result é válido
-            if count_result is None:
-                print("ERRO: count_result é None")
-                cursor.close()
-                return jsonify({
-                    'encontrado': False,
-                    'erro': True,
-                    'mensagem': 'Erro ao acessar tabela - resultado None'
-                })
-            
-            # CORREÇÃO: Verificar se é tupla/lista OU dicionário (DictCursor)
-            if isinstance(count_result, (tuple, list)) and len(count_result) > 0:
-                total = count_result[0]
-            elif isinstance(count_result, dict) and 'COUNT(*)' in count_result:
-                total = count_result['COUNT(*)']
-            else:
-                print(f"ERRO: count_result formato inesperado: {count_result}")
-                cursor.close()
-                return jsonify({
-                    'encontrado': False,
-                    'erro': True,
-                    'mensagem': f'Formato inesperado do resultado: {type(count_result)}'
-                })
-                
-        except Exception as count_error:
-            print(f"ERRO na query COUNT: {count_error}")
-            cursor.close()
-            return jsonify({
-                'encontrado': False,
-                'erro': True,
-                'mensagem': f'Erro ao contar registros: {str(count_error)}'
-            })
-        
-        print(f"Total de registros na tabela: {total}")
-        
-        if total == 0:
-            cursor.close()
-            return jsonify({
-                'encontrado': False,
-                'erro': False,
-                'mensagem': 'Nenhum aluno cadastrado no sistema. Cadastre um aluno primeiro.',
-                'debug': 'Tabela vazia'
-            })
-        
-        # CORREÇÃO: Tratamento para DictCursor nos CPFs existentes
-        try:
-            cursor.execute("SELECT cpf_aluno, nome_aluno FROM tbl_cad_alunos LIMIT 3")
-            cpfs_existentes = cursor.fetchall()
-            print("CPFs existentes na base (primeiros 3):")
-            for cpf_ex in cpfs_existentes:
-                if isinstance(cpf_ex, dict):
-                    print(f"  - CPF: '{cpf_ex['cpf_aluno']}', Nome: {cpf_ex['nome_aluno']}")
-                else:
-                    print(f"  - CPF: '{cpf_ex[0]}', Nome: {cpf_ex[1]}")
-        except Exception as cpf_error:
-            print(f"Erro ao buscar CPFs existentes: {cpf_error}")
-            cpfs_existentes = []
-        
-        # Busca exata primeiro
-        print(f"\n1. Testando busca exata por: '{cpf_aluno}'")
-        try:
-            cursor.execute("SELECT nome_aluno, cpf_aluno FROM tbl_cad_alunos WHERE cpf_aluno = %s", (cpf_aluno,))
-            resultado_exato = cursor.fetchone()
-            print(f"   Resultado busca exata: {resultado_exato}")
-        except Exception as e:
-            print(f"Erro na busca exata: {e}")
-            resultado_exato = None
-        
-        # Busca por CPF limpo
-        print(f"\n2. Testando busca por CPF limpo: '{cpf_limpo}'")
-        try:
-            cursor.execute("SELECT nome_aluno, cpf_aluno FROM tbl_cad_alunos WHERE REPLACE(REPLACE(REPLACE(cpf_aluno, '.', ''), '-', ''), ' ', '') = %s", (cpf_limpo,))
-            resultado_limpo = cursor.fetchone()
-            print(f"   Resultado busca limpa: {resultado_limpo}")
-        except Exception as e:
-            print(f"Erro na busca limpa: {e}")
-            resultado_limpo = None
-        
-        # Se encontrou algum resultado, fazer a busca completa
-        if resultado_exato or resultado_limpo:
-            print("\n3. Aluno encontrado! Fazendo busca completa...")
-            
-            try:
-                query = """
-                    SELECT 
-                        id_aluno, matricula_aluno, nome_aluno,
-                        dt_nascimento, cpf_aluno, genero, whatsapp, 
-                        endereco_aluno, tipo_responsavel, nome_pai, nome_mae, 
-                        patologia, tipo_educacao, contato, nome_escola, turma,
-                        coordenador_pedagogico, profissional_AEE, cod_cid, 
-                        equipe_multidisciplinar, status_aluno, observacoes
-                    FROM tbl_cad_alunos 
-                    WHERE cpf_aluno = %s OR REPLACE(REPLACE(REPLACE(cpf_aluno, '.', ''), '-', ''), ' ', '') = %s
-                """
-                
-                cursor.execute(query, (cpf_aluno, cpf_limpo))
-                aluno = cursor.fetchone()
-                
-                if aluno:
-                    # CORREÇÃO: Tratamento para DictCursor na busca completa
-                    if isinstance(aluno, dict):
-                        aluno_dict = aluno
-                    else:
-                        columns = [col[0] for col in cursor.description]
-                        aluno_dict = dict(zip(columns, aluno))
-                    
-                    # Formatar data
-                    if aluno_dict.get('dt_nascimento'):
-                        if hasattr(aluno_dict['dt_nascimento'], 'strftime'):
-                            aluno_dict['dt_nascimento'] = aluno_dict['dt_nascimento'].strftime('%Y-%m-%d')
-                        else:
-                            aluno_dict['dt_nascimento'] = str(aluno_dict['dt_nascimento'])
-                    
-                    print(f"   Dados completos encontrados: {list(aluno_dict.keys())}")
-                    cursor.close()
-                    
-                    return jsonify({
-                        'encontrado': True,
-                        'erro': False,
-                        'aluno': aluno_dict,
-                        'mensagem': 'Aluno encontrado com sucesso'
-                    })
-            except Exception as e:
-                print(f"Erro na busca completa: {e}")
-        
-        print("\n4. Nenhum resultado encontrado")
-        cursor.close()
-        
-        # CORREÇÃO: Tratamento para DictCursor no debug final
+    if not cpf_limpo:
         return jsonify({
             'encontrado': False,
-            'erro': False,
-            'mensagem': f'Aluno com CPF {cpf_aluno} não encontrado',
-            'debug': {
-                'cpfs_existentes': [
-                    {'cpf': cpf['cpf_aluno'], 'nome': cpf['nome_aluno']} if isinstance(cpf, dict) 
-                    else {'cpf': cpf[0], 'nome': cpf[1]} 
-                    for cpf in cpfs_existentes
-                ] if cpfs_existentes else [],
-                'total_registros': total
-            }
-        })
+            'erro': True,
+            'mensagem': 'CPF não informado'
+        }), 400
 
+    try:
+        cpf_alunos.garantir_coluna(mysql.connection)
+        aluno = aluno_por_cpf(cpf_limpo, versoes.atual('alunos'))
     except Exception as e:
         print(f"Erro geral na busca: {str(e)}")
-        import traceback
-        print(f"Traceback completo: {traceback.format_exc()}")
-        
-        try:
-            if 'cursor' in locals():
-                cursor.close()
-        except:
-            pass
-            
+        traceback.print_exc()
         return jsonify({
             'encontrado': False,
             'erro': True,
             'mensagem': 'Erro interno do servidor',
             'detalhes': str(e)
         }), 500
+
+    if aluno is None:
+        return jsonify({
+            'encontrado': False,
+            'erro': False,
+            'mensagem': f'Aluno com CPF {cpf_aluno} não encontrado'
+        })
+
+    return jsonify({
+        'encontrado': True,
+        'erro': False,
+        'aluno': aluno,
+        'mensagem': 'Aluno encontrado com sucesso'
+    })
+
+
+def sincronizar_indice_alunos():
+    """Sincroniza o índice de busca numa thread, com conexão própria (o esquema já foi garantido)"""
+    with app.app_context():
+        indice_alunos.sincronizar(mysql.connection, versoes.atual('alunos'))
+
+
+@app.route('/api/alunos/search')
+@acesso_requerido('Master', 'Pleno', 'Junior')
+def api_busca_alunos():
+    """
+    Busca incremental (typeahead) de alunos por nome, matrícula ou CPF
+
+    ?q=termos  ?limite=20  ?todos=1 inclui alunos inativos
+
+    A carga e as atualizações do índice rodam em segundo plano: a busca usa o
+    índice atual e, antes da primeira carga do worker, responde vazio com
+    carregando=true. Sem termos (a página abrindo), só dispara a carga se
+    ALUNOS_BUSCA_AQUECER.
+    """
+    consulta = request.args.get('q', '')
+    try:
+        limite = int(request.args.get('limite') or busca_alunos.LIMITE_PADRAO)
+    except ValueError:
+        limite = busca_alunos.LIMITE_PADRAO
+    limite = min(max(limite, 1), busca_alunos.LIMITE_MAXIMO)
+
+    busca_alunos.garantir_esquema(mysql.connection)
+    if (consulta.strip() or app.config['ALUNOS_BUSCA_AQUECER']) and \
+            indice_alunos.desatualizado(versoes.atual('alunos')):
+        indice_alunos.sincronizar_em_segundo_plano(sincronizar_indice_alunos)
+    if not indice_alunos.carregado:
+        return jsonify({'alunos': [], 'total': 0, 'carregando': True})
+
+    inicio = time.perf_counter()
+    alunos = indice_alunos.buscar(consulta, limite, apenas_ativos=request.args.get('todos') != '1')
+    return jsonify({
+        'alunos': alunos,
+        'total': len(alunos),
+        'tempo_ms': round((time.perf_counter() - inicio) * 1000, 3),
+    })
+
+
 @app.route('/test_db')
 def test_db():
     """Rota para testar a conexão com o banco de dados"""
@@ -691,6 +748,13 @@ def test_db():
         }), 500
 
 
+@app.route('/pool_status')
+@acesso_requerido('Master')
+def pool_status():
+    """Métricas do pool de conexões MySQL deste worker"""
+    return jsonify({'pid': os.getpid(), 'pool': mysql.metricas()})
+
+
 # Rota para listar todas as tabelas (debug)
 @app.route('/list_tables')
 def list_tables():
@@ -728,144 +792,85 @@ def describe_table():
             'error': str(e)
         }), 500
 
-@app.route('/saiba_mais', methods=['GET'])
-def saiba_mais():
-    return render_template('saiba_mais.html')
+def alunos_ativos():
+    """
+    (alunos ativos ordenados por nome, versão) compartilhados pelos
+    questionários e relatórios
 
-@app.route('/quest_pei', methods=['GET', 'POST'])
-@acesso_requerido('Master','Pleno')
-def quest_pei():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT id_aluno, nome_aluno FROM tbl_cad_alunos WHERE status_aluno = 'Ativo' ORDER BY nome_aluno")
-    alunos = cur.fetchall()
-    cur.close()
+    A lista fica em memória até alguma rota de escrita em alunos incrementar
+    a versão 'alunos' (ou ALUNOS_ATIVOS_CACHE_TTL expirar).
+    """
+    versao = versoes.etiqueta('alunos')
 
-    if request.method == 'POST':
-        cur = None  # Inicializa cursor como None
+    def consultar():
+        cur = mysql.connection.cursor()
         try:
-            aluno_id = request.form.get('aluno_id')
-            
-            # Validação básica
-            if not aluno_id:
-                flash('Por favor, selecione um aluno.', 'danger')
-                return render_template('quest_pei.html', alunos=alunos)
+            cur.execute("SELECT id_aluno, nome_aluno FROM tbl_cad_alunos WHERE status_aluno = 'Ativo' ORDER BY nome_aluno")
+            return tuple(cur.fetchall())
+        finally:
+            cur.close()
 
-            cur = mysql.connection.cursor()
+    return cache_alunos_ativos.obter_ou_calcular('alunos_ativos', versao, consultar), versao
 
-            # 1 - Acompanhamento e avaliação
-            cur.execute("""
-                INSERT INTO tbl_acompanhamento_avaliacao (
-                    aluno_id, frequencia_reavaliacao, responsavel_acompanhamento, reunioes
-                ) VALUES (%s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('frequencia_reavaliacao'),
-                request.form.get('responsavel_acompanhamento'),
-                request.form.get('reunioes')
-            ))
 
-            # 2 - Comportamento e Interação
-            cur.execute("""
-                INSERT INTO tbl_comportamento_interacao_pei (
-                    aluno_id, comunicacao, tipo_linguagem, atividades_grupo, comp_desaf, socializacao
-                ) VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('comunicacao'),
-                request.form.get('tipo_linguagem'),
-                request.form.get('atividades_grupo'),
-                request.form.get('comp_desaf'),
-                request.form.get('socializacao')
-            ))
+def contexto_alunos_ativos():
+    """Variáveis de template `alunos` e `versao_alunos` (só consultado ao renderizar)"""
+    alunos, versao = alunos_ativos()
+    return {'alunos': alunos, 'versao_alunos': versao}
 
-            # 3 - Desenvolvimento Geral
-            cur.execute("""
-                INSERT INTO tbl_desenvolvimento_geral_pei (
-                    aluno_id, autonomia, atraso_desenvolvimento, questoes_saude, talentos
-                ) VALUES (%s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('autonomia'),
-                request.form.get('atraso_desenvolvimento'),
-                request.form.get('questoes_saude'),
-                request.form.get('talentos')
-            ))
 
-            # 4 - Estratégia e Adaptações
-            cur.execute("""
-                INSERT INTO tbl_estrategias_adaptacoes_pei (
-                    aluno_id, estrategias, adaptacoes_curriculares, materiais_concretos, avaliacoes
-                ) VALUES (%s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('estrategias'),
-                request.form.get('adaptacoes_curriculares'),
-                request.form.get('materiais_concretos'),
-                request.form.get('avaliacoes')
-            ))
+@app.route('/api/alunos/ativos')
+@acesso_requerido('Master', 'Pleno', 'Junior')
+def api_alunos_ativos():
+    """Lista de alunos ativos com ETag = versão (304 se o cliente já tem esta versão)"""
+    alunos, versao = alunos_ativos()
+    resposta = jsonify({'versao': versao, 'alunos': alunos})
+    resposta.set_etag(versao)
+    return resposta.make_conditional(request)
 
-            # 5 - Habilidades Escolares
-            cur.execute("""
-                INSERT INTO tbl_habilidades_escolares_pei (
-                    aluno_id, leitura_escrita, numeros_matematica, interesse_aulas, recursos_aprendizagem, barreiras
-                ) VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('leitura_escrita'),
-                request.form.get('numeros_matematica'),
-                request.form.get('interesse_aulas'),
-                request.form.get('recursos_aprendizagem'),
-                request.form.get('barreiras')
-            ))
 
-            # 6 - Necessidade de Apoio
-            # Tratamento especial para campo múltiplo
-            apoios = request.form.getlist('apoios')  # Use getlist para select múltiplo
-            apoios_str = ','.join(apoios) if apoios else None
-            
-            cur.execute("""
-                INSERT INTO tbl_necessidades_apoio_pei (
-                    aluno_id, apoios, equipamentos
-                ) VALUES (%s, %s, %s)
-            """, (
-                aluno_id,
-                apoios_str,
-                request.form.get('equipamentos')
-            ))
+@app.route('/saiba_mais', methods=['GET'])
+def saiba_mais():
+    return render_template('saiba_mais.html')
 
-            # 7 - Objetivos PEI
-            cur.execute("""
-                INSERT INTO tbl_objetivos_pei (
-                    aluno_id, objetivo_cognitivo, objetivo_linguagem, objetivo_autonomia, 
-                    objetivo_interacao, objetivo_motor, objetivo_comportamento
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('objetivo_cognitivo'),
-                request.form.get('objetivo_linguagem'),
-                request.form.get('objetivo_autonomia'),
-                request.form.get('objetivo_interacao'),
-                request.form.get('objetivo_motor'),
-                request.form.get('objetivo_comportamento')
-            ))
+def respostas_do_formulario(questionario):
+    """
+    (aluno_id, valores) do formulário de um questionário do registro
+
+    Returns:
+        a tupla pronta para questionario.gravar(), ou None (com flash dos erros)
+    """
+    aluno_id = request.form.get('aluno_id')
+    if not aluno_id:
+        flash('Por favor, selecione um aluno.', 'danger')
+        return None
+    valores = questionario.extrair(request.form)
+    erros = questionario.validar(aluno_id, valores)
+    if erros:
+        flash(f'Respostas inválidas: {"; ".join(erros)}', 'danger')
+        return None
+    return questionarios.aluno_id_valido(aluno_id), valores
 
-            # 8 - Outras Informações
-            cur.execute("""
-                INSERT INTO tbl_outras_informacoes_pei (
-                    aluno_id, historico_escolar, consideracoes_familia, 
-                    observacoes_professores, comentarios_equipe
-                ) VALUES (%s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('historico_escolar'),
-                request.form.get('consideracoes_familia'),
-                request.form.get('observacoes_professores'),
-                request.form.get('comentarios_equipe')
-            ))
+
+@app.route('/quest_pei', methods=['GET', 'POST'])
+@acesso_requerido('Master','Pleno')
+def quest_pei():
+    if request.method == 'POST':
+        cur = None  # Inicializa cursor como None
+        try:
+            resposta = respostas_do_formulario(questionarios.PEI)
+            if resposta is None:
+                return render_template('quest_pei.html', **contexto_alunos_ativos())
+            aluno_id = resposta[0]
+
+            # Um INSERT pronto por seção (ver servicos.questionarios)
+            cur = mysql.connection.cursor()
+            questionarios.PEI.gravar(cur, [resposta])
 
             # Commit das transações
             mysql.connection.commit()
             cur.close()
+            cache_pdf.invalidar('pei', aluno_id)
             flash('Questionário PEI salvo com sucesso!', 'success')
             return redirect(url_for('quest_pei'))
             
@@ -876,20 +881,69 @@ def quest_pei():
                 cur.close()
             print(f"Erro detalhado: {str(e)}")  # Para debug
             flash(f'Erro ao salvar: {str(e)}', 'danger')
-            return render_template('quest_pei.html', alunos=alunos)
+            return render_template('quest_pei.html', **contexto_alunos_ativos())
+
+    return render_template('quest_pei.html', **contexto_alunos_ativos())
+
+
 
-    return render_template('quest_pei.html', alunos=alunos)
+# Relatórios por aluno: view de origem, template, motor de PDF e CSS extra
+RELATORIOS_PDF = {
+    'pei': ('vw_quest_pei', 'relatorio_pdf_pei.html', MOTOR_XHTML2PDF, None),
+    'pedi': ('vw_quest_pedi', 'relatorio_pdf_pedi.html', MOTOR_XHTML2PDF, None),
+    'guide': ('vw_quest_guide', 'relatorio_pdf_guide.html', MOTOR_WEASYPRINT, CSS_GUIDE),
+}
 
 
+def trabalho_pdf(tipo, respostas):
+    """Renderiza o template do relatório e devolve os argumentos de html_para_pdf"""
+    _, template, motor, css = RELATORIOS_PDF[tipo]
+    if tipo == 'pei':
+        aluno = {
+            "id_aluno": respostas.get("id_aluno"),
+            "nome_aluno": respostas.get("nome_aluno"),
+            "matricula_aluno": respostas.get("matricula_aluno"),
+            "dt_nascimento": respostas.get("dt_nascimento")
+        }
+        html = render_template(template, aluno=aluno, respostas=respostas)
+    else:
+        html = render_template(template, respostas=respostas)
+    return motor, html, css, motor == MOTOR_WEASYPRINT
+
+
+def enviar_pdf_em_cache(rota, id_dono, dados, template, gerar_pdf, nome_arquivo):
+    """
+    Envia o PDF guardado no cache em disco ou gera um novo com gerar_pdf()
+
+    Args:
+        rota: grupo do cache ('pei', 'pedi', 'guide', 'avaliacao')
+        id_dono: aluno dono do PDF (usado na invalidação)
+        dados: linha do banco usada na renderização (entra na chave do cache)
+        template: template do relatório (sua versão também entra na chave)
+        gerar_pdf: função sem argumentos que retorna os bytes do PDF ou None em erro
+
+    Returns:
+        resposta do send_file, ou None se gerar_pdf() falhou
+    """
+    chave = cache_pdf.chave(rota, dados, cache_pdf.versao_template(app.jinja_env, template))
+    caminho = cache_pdf.obter(rota, id_dono, chave)
+    if caminho is not None:
+        # Aberto já aqui: invalidar() ou a LRU de outro worker podem apagar o arquivo a qualquer momento
+        try:
+            return send_file(open(caminho, 'rb'), mimetype='application/pdf',
+                             download_name=nome_arquivo, as_attachment=False)
+        except FileNotFoundError:
+            pass
+    conteudo = gerar_pdf()
+    if conteudo is None:
+        return None
+    cache_pdf.guardar(rota, id_dono, chave, conteudo)
+    return send_file(BytesIO(conteudo), mimetype='application/pdf', download_name=nome_arquivo, as_attachment=False)
+
 
 @app.route('/gerar_pdf_pei', methods=['GET', 'POST'])
 @acesso_requerido('Master','Pleno')
 def gerar_pdf_pei():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT id_aluno, nome_aluno FROM tbl_cad_alunos where status_aluno = 'Ativo' ORDER BY nome_aluno")
-    alunos = cur.fetchall()
-    cur.close()
-
     aluno_selecionado = None
 
     if request.method == 'POST':
@@ -910,30 +964,21 @@ def gerar_pdf_pei():
         if not respostas:
             flash('Aluno não encontrado ou sem respostas PEI.', 'danger')
             return redirect(url_for('gerar_pdf_pei'))
-        aluno = {
-        "id_aluno": respostas.get("id_aluno"),
-        "nome_aluno": respostas.get("nome_aluno"),
-        "matricula_aluno": respostas.get("matricula_aluno"),
-        "dt_nascimento": respostas.get("dt_nascimento")
-        }
 
-        html = render_template('relatorio_pdf_pei.html', aluno=aluno, respostas=respostas)
-        pdf = BytesIO()
-        pisa_status = pisa.CreatePDF(html, dest=pdf)
-        if pisa_status.err:
-            flash('Erro ao gerar o PDF.', 'danger')
-            return redirect(url_for('gerar_pdf_pei'))
+        def gerar_pdf():
+            return html_para_pdf(*trabalho_pdf('pei', respostas))
 
-        pdf.seek(0)
         nome_aluno = respostas.get("nome_aluno", "Aluno")
-        return send_file(
-            pdf,
-            mimetype='application/pdf',
-            download_name=f'Relatorio_PEI_Aluno_{nome_aluno}.pdf',
-            as_attachment=False
+        resposta = enviar_pdf_em_cache(
+            'pei', respostas['id_aluno'], respostas, 'relatorio_pdf_pei.html',
+            gerar_pdf, f'Relatorio_PEI_Aluno_{nome_aluno}.pdf'
         )
+        if resposta is None:
+            flash('Erro ao gerar o PDF.', 'danger')
+            return redirect(url_for('gerar_pdf_pei'))
+        return resposta
 
-    return render_template('gerar_pdf_pei.html', alunos=alunos, aluno_selecionado=aluno_selecionado)
+    return render_template('gerar_pdf_pei.html', **contexto_alunos_ativos(), aluno_selecionado=aluno_selecionado)
 
 
 @app.route('/pdf_pei', methods=['GET'])
@@ -944,156 +989,133 @@ def pdf_pei():
     dados = cur.fetchall()
     cur.close()
 
+# Planilhas das rotas *_excel: fonte, filtros fixos, nome da aba e do arquivo
+EXPORTACOES_EXCEL = {
+    'pei': ('pei', None, 'PEI', 'relatorio_pei.xlsx'),
+    'pedi': ('pedi', None, 'PDI', 'relatorio_pdi.xlsx'),
+    'guide': ('guide', None, 'GUIDE', 'relatorio_guide.xlsx'),
+    'alunos_ativos': ('alunos', {'status_aluno': 'Ativo'}, 'Alunos Ativos', 'alunos_ativos.xlsx'),
+    'alunos_inativos': ('alunos', {'status_aluno': 'Inativo'}, 'Alunos Inativos', 'alunos_inativos.xlsx'),
+}
+
+
+def exportar_excel_ou_enfileirar(exportacao):
+    """
+    Gera a planilha na própria requisição ou a envia para a fila de tarefas
+
+    Vai para a fila quando a estimativa de linhas passa de JOBS_EXCEL_THRESHOLD_ROWS
+    ou quando a requisição pede ?assincrono=1; nesse caso redireciona para a
+    página de acompanhamento da tarefa.
+
+    Returns:
+        resposta do Flask, ou None se a consulta não retornou linhas
+    """
+    fonte, filtros, aba, nome_download = EXPORTACOES_EXCEL[exportacao]
+    definicao = FONTES_EXPORTACAO[fonte]
+
+    assincrono = request.args.get('assincrono') == '1'
+    limiar = app.config['JOBS_EXCEL_THRESHOLD_ROWS']
+    if not assincrono and limiar > 0:
+        estimativa = estimar_linhas(mysql.connection, definicao)
+        assincrono = estimativa is not None and estimativa >= limiar
+
+    if assincrono:
+        id_tarefa = fila_tarefas.enfileirar('excel', {'exportacao': exportacao}, usuario=session.get('email'))
+        return redirect(url_for('status_tarefa', id_tarefa=id_tarefa))
+
+    sql, params = definicao.consulta(filtros)
+    return exportar_xlsx(mysql.connection, sql, params, aba, nome_download)
+
+
 @app.route('/pei_excel', methods=['GET'])
 def pei_excel():
-    cur = mysql.connection.cursor()
-    cur.execute("""SELECT  
-	id_aluno,
-    matricula_aluno,
-    nome_aluno,
-    idade,
-    id_desenvolvimento,
-    autonomia,
-    atraso_desenvolvimento,
-    questoes_saude,
-    talentos,
-    id_habilidade,
-    leitura_escrita,
-    numeros_matematica,
-    interesse_aulas,
-    recursos_aprendizagem,
-    barreiras,
-    id_comportamento,
-    comunicacao,
-    tipo_linguagem,
-    atividades_grupo,
-    comp_desaf,
-    socializacao,
-    id_necessidade,
-    apoios,
-    equipamentos,
-    id_estrategia,
-    estrategias,
-    adaptacoes_curriculares,
-    materiais_concretos,
-    avaliacoes,
-    id_objetivo,
-    objetivo_cognitivo,
-    objetivo_linguagem,
-    objetivo_autonomia,
-    objetivo_interacao,
-    objetivo_motor,
-    objetivo_comportamento,
-    id_informe,
-    historico_escolar,
-    consideracoes_familia,
-    observacoes_professores,
-    comentarios_equipe,
-    id_acomp_av,
-    frequencia_reavaliacao,
-    responsavel_acompanhamento,
-    reunioes
-FROM u799109175_db_funcae.vw_quest_pei""")
-    dados = cur.fetchall()
-    cur.close()
+    resposta = exportar_excel_ou_enfileirar('pei')
 
     # Se não vier nenhum dado, retorna mensagem simples
-    if not dados:
+    if resposta is None:
         return "Nenhum dado para exportar.", 404
 
-    # Cria um DataFrame pandas com os dados retornados
-    df = pd.DataFrame(dados)
-
-    # Usa BytesIO para criar arquivo Excel na memória
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='PEI')
-
-    output.seek(0)
-
-    # Retorna o arquivo Excel para download
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='relatorio_pei.xlsx'
-    )
+    return resposta
     
 
 @app.route('/alunos_ativos_excel', methods=['GET'])
 @acesso_requerido('Master', 'Pleno')
 def alunos_ativos_excel():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM tbl_cad_alunos WHERE status_aluno = 'Ativo'")
-    alunos = cur.fetchall()
-    colunas = [desc[0] for desc in cur.description]
-    cur.close()
+    resposta = exportar_excel_ou_enfileirar('alunos_ativos')
 
-    if not alunos:
+    if resposta is None:
         return "Nenhum aluno ativo encontrado.", 404
 
-    df = pd.DataFrame(alunos, columns=colunas)
-
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Alunos Ativos')
-    output.seek(0)
-
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='alunos_ativos.xlsx'
-    )
+    return resposta
 
 @app.route('/baixa_alunos', methods=['GET'])
 @acesso_requerido('Master', 'Pleno')
 def baixa_alunos():
+    """
+    Listagem paginada (?apos=/?antes=) e filtrável (?nome=&status=&patologia=)
+
+    Com ?formato=json devolve só a página da tabela.
+    """
+    filtros = listagem_alunos.filtros_da_requisicao(request.args)
+    por_pagina = listagem_alunos.por_pagina_da_requisicao(request.args)
+
+    garantir_indices(mysql.connection, 'tbl_cad_alunos', listagem_alunos.INDICES)
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("""
-        SELECT id_aluno, matricula_aluno, nome_aluno, dt_nascimento, 
-            idade, patologia, status_aluno 
-        FROM tbl_cad_alunos
-        ORDER BY nome_aluno
-    """)
-    alunos = cur.fetchall()
-    cur.close()
+    try:
+        resultado = listagem_alunos.pagina(
+            cur, filtros,
+            apos=request.args.get('apos'), antes=request.args.get('antes'),
+            por_pagina=por_pagina
+        )
+    finally:
+        cur.close()
 
-    # Chama as funções de contagem
-    total_ativos = get_total_ativos()
-    total_inativos = get_total_inativos()
+    if request.args.get('formato') == 'json':
+        return jsonify({
+            'alunos': [listagem_alunos.aluno_json(a) for a in resultado['alunos']],
+            'proximo': resultado['proximo'],
+            'anterior': resultado['anterior'],
+            'por_pagina': por_pagina,
+            'filtros': filtros,
+        })
+
+    # Totais mantidos em tbl_contadores_alunos (sem varrer tbl_cad_alunos)
+    contadores_alunos.garantir_tabela(mysql.connection)
+    total_alunos, total_ativos, total_inativos = contadores_alunos.totais(mysql.connection)
 
     return render_template(
         'baixa_alunos.html',
-        alunos=alunos,
+        alunos=resultado['alunos'],
+        proximo=resultado['proximo'],
+        anterior=resultado['anterior'],
+        filtros=filtros,
+        por_pagina=por_pagina,
+        total_alunos=total_alunos,
         total_ativos=total_ativos,
         total_inativos=total_inativos
     )
 
 def get_total_ativos():
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("SELECT COUNT(*) AS total_ativos FROM tbl_cad_alunos WHERE LOWER(status_aluno) = 'ativo'")
-    total_ativos = cur.fetchone()['total_ativos']
-    cur.close()
-    return total_ativos
+    contadores_alunos.garantir_tabela(mysql.connection)
+    return contadores_alunos.carregar(mysql.connection).get(contadores_alunos.ATIVO, 0)
 
 def get_total_inativos():
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("SELECT COUNT(*) AS total_inativos FROM tbl_cad_alunos WHERE LOWER(status_aluno) = 'inativo'")
-    total_inativos = cur.fetchone()['total_inativos']
-    cur.close()
-    return total_inativos
+    contadores_alunos.garantir_tabela(mysql.connection)
+    return contadores_alunos.carregar(mysql.connection).get(contadores_alunos.INATIVO, 0)
 
 
 @app.route('/baixar_aluno/<int:id_aluno>', methods=['POST'])
 @acesso_requerido('Master', 'Pleno')
 def baixar_aluno(id_aluno):
+    cur = None
     try:
         motivo = request.form.get('motivo', '')
         observacoes = request.form.get('observacoes', '')
         data_baixa = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
+        contadores_alunos.garantir_tabela(mysql.connection)
         cur = mysql.connection.cursor()
+        status_anteriores = contadores_alunos.status_atuais(cur, 'id_aluno', id_aluno)
         
         # 1. Atualizar status do aluno para "Inativo"
         cur.execute("""
@@ -1101,6 +1123,8 @@ def baixar_aluno(id_aluno):
             SET status_aluno = 'Inativo' 
             WHERE id_aluno = %s
         """, (id_aluno,))
+        for anterior in status_anteriores:
+            contadores_alunos.mudar_status(cur, anterior, 'Inativo')
         
         # 2. Inserir registro na tabela de baixas (se existir)
         # Se você não tem essa tabela, pode criar ou comentar esta parte
@@ -1116,6 +1140,7 @@ def baixar_aluno(id_aluno):
         
         mysql.connection.commit()
         cur.close()
+        versoes.incrementar('alunos')
         
         flash('Aluno dado como baixa com sucesso!', 'success')
         
@@ -1131,8 +1156,11 @@ def baixar_aluno(id_aluno):
 @acesso_requerido('Master', 'Pleno')
 @acesso_requerido('Master','Pleno')
 def reativar_aluno(id_aluno):
+    cur = None
     try:
+        contadores_alunos.garantir_tabela(mysql.connection)
         cur = mysql.connection.cursor()
+        status_anteriores = contadores_alunos.status_atuais(cur, 'id_aluno', id_aluno)
         
         # Reativar aluno
         cur.execute("""
@@ -1140,6 +1168,8 @@ def reativar_aluno(id_aluno):
             SET status_aluno = 'Ativo' 
             WHERE id_aluno = %s
         """, (id_aluno,))
+        for anterior in status_anteriores:
+            contadores_alunos.mudar_status(cur, anterior, 'Ativo')
         
         # Registrar reativação (opcional)
         try:
@@ -1155,6 +1185,7 @@ def reativar_aluno(id_aluno):
         
         mysql.connection.commit()
         cur.close()
+        versoes.incrementar('alunos')
         
         flash('Aluno reativado com sucesso!', 'success')
         
@@ -1166,52 +1197,67 @@ def reativar_aluno(id_aluno):
     
     return redirect(url_for('baixa_alunos'))
 
-@app.route('/baixa_lote', methods=['POST'])
-@acesso_requerido('Master', 'Pleno')
-@acesso_requerido('Master','Pleno','Junior')
-def baixa_lote():
+def ids_do_lote():
+    """Ids enviados pelo formulário de baixa_alunos (marcados ou "todos do filtro")"""
+    alunos_ids = request.form.getlist('alunos_ids')
+    
+    # "Selecionar todos" com a listagem paginada: o servidor resolve os ids do filtro
+    if request.form.get('todos_filtrados') == '1':
+        cur = mysql.connection.cursor()
+        try:
+            alunos_ids = listagem_alunos.ids_filtrados(cur, listagem_alunos.filtros_da_requisicao(request.form))
+        finally:
+            cur.close()
+    return status_lote.ids_validos(alunos_ids)
+
+
+def alterar_status_lote(de, para, motivo, observacoes, verbo):
+    """Executa a mudança de status em lote e informa quantos alunos mudaram de fato"""
+    cur = None
     try:
-        alunos_ids = request.form.getlist('alunos_ids')
-        
+        alunos_ids = ids_do_lote()
         if not alunos_ids:
             flash('Nenhum aluno selecionado!', 'warning')
             return redirect(url_for('baixa_alunos'))
         
+        contadores_alunos.garantir_tabela(mysql.connection)
         cur = mysql.connection.cursor()
+        alterados = status_lote.alterar_status(
+            cur, alunos_ids, de, para, motivo, observacoes, session.get('user_id', 'Sistema')
+        )
+        mysql.connection.commit()
+        versoes.incrementar('alunos')
         
-        # Baixa em lote
-        for aluno_id in alunos_ids:
-            cur.execute("""
-                UPDATE tbl_cad_alunos 
-                SET status_aluno = 'Inativo' 
-                WHERE id_aluno = %s AND status_aluno = 'Ativo'
-            """, (aluno_id,))
-            
-            # Log da baixa em lote
-            try:
-                cur.execute("""
-                    INSERT INTO tbl_baixas_alunos 
-                    (aluno_id, motivo_baixa, observacoes, data_baixa, usuario_baixa) 
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (aluno_id, 'BAIXA EM LOTE', 'Baixa realizada em lote', 
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
-                    session.get('user_id', 'Sistema')))
-            except:
-                pass
-        
-        mysql.connection.commit()
-        cur.close()
-        
-        flash(f'{len(alunos_ids)} aluno(s) dado(s) como baixa com sucesso!', 'success')
+        ignorados = len(alunos_ids) - alterados
+        mensagem = f'{alterados} aluno(s) {verbo} com sucesso!'
+        if ignorados:
+            mensagem += f' {ignorados} selecionado(s) já não estava(m) {de.lower()}(s).'
+        flash(mensagem, 'success' if alterados else 'warning')
         
     except Exception as e:
         mysql.connection.rollback()
+        flash(f'Erro na alteração em lote: {str(e)}', 'danger')
+    finally:
         if cur:
             cur.close()
-        flash(f'Erro na baixa em lote: {str(e)}', 'danger')
     
     return redirect(url_for('baixa_alunos'))
 
+
+@app.route('/baixa_lote', methods=['POST'])
+@acesso_requerido('Master', 'Pleno')
+@acesso_requerido('Master','Pleno','Junior')
+def baixa_lote():
+    return alterar_status_lote('Ativo', 'Inativo', 'BAIXA EM LOTE', 'Baixa realizada em lote',
+                               'dado(s) como baixa')
+
+
+@app.route('/reativar_lote', methods=['POST'])
+@acesso_requerido('Master', 'Pleno')
+def reativar_lote():
+    return alterar_status_lote('Inativo', 'Ativo', 'REATIVAÇÃO EM LOTE', 'Alunos reativados em lote',
+                               'reativado(s)')
+
 # Rota adicional para criar tabela de log de baixas (opcional)
 @app.route('/criar_tabela_baixas')
 def criar_tabela_baixas():
@@ -1239,101 +1285,21 @@ def criar_tabela_baixas():
 @app.route('/quest_pedi', methods=['GET', 'POST'])
 @acesso_requerido('Master', 'Pleno')
 def quest_pedi():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT id_aluno, nome_aluno FROM tbl_cad_alunos WHERE status_aluno = 'Ativo' ORDER BY nome_aluno")
-    alunos = cur.fetchall()
-    cur.close()
-
     if request.method == 'POST':
+        cur = None
         try:
-            aluno_id = request.form.get('aluno_id')
+            resposta = respostas_do_formulario(questionarios.PEDI)
+            if resposta is None:
+                return render_template('quest_pedi.html', **contexto_alunos_ativos())
+            aluno_id = resposta[0]
 
-            # CUIDADO PESSOAL
+            # CUIDADO PESSOAL, MOBILIDADE e FUNÇÃO SOCIAL
             cur = mysql.connection.cursor()
-            cur.execute("""
-                INSERT INTO tbl_quest_pedi_cuidadopessoal (
-                    alimentacao_talher, mastigacao, ingestao_liquidos, cortar_alimentos, recurso_comer,
-                    escovacao_dentes, higiene_maos, papel_higienico, enxugase_banho, lembrete_higiene,
-                    vestimenta_camisa, vestimenta_calca, autonomia_ziper_amarras, calcados, diferencia_frente_verso,
-                    comunicacao_banheiro, autonomia_vaso_sanitario, acidentes_urina_outros, lavar_maos, supervisao_banheiro,
-                    observacoes, aluno_id
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                request.form.get('alimentacao_talher'),
-                request.form.get('mastigacao'),
-                request.form.get('ingestao_liquidos'),
-                request.form.get('cortar_alimentos'),
-                request.form.get('recurso_comer'),
-                request.form.get('escovacao_dentes'),
-                request.form.get('higiene_maos'),
-                request.form.get('papel_higienico'),
-                request.form.get('enxugase_banho'),
-                request.form.get('lembrete_higiene'),
-                request.form.get('vestimenta_camisa'),
-                request.form.get('vestimenta_calca'),
-                request.form.get('autonomia_ziper_amarras'),
-                request.form.get('calcados'),
-                request.form.get('diferencia_frente_verso'),
-                request.form.get('comunicacao_banheiro'),
-                request.form.get('autonomia_vaso_sanitario'),
-                request.form.get('acidentes_urina_outros'),
-                request.form.get('lavar_maos'),
-                request.form.get('supervisao_banheiro'),
-                request.form.get('observacoes'),
-                aluno_id
-            ))
-
-            # MOBILIDADE
-            cur.execute("""
-                INSERT INTO tbl_quest_pedi_mobilidade (
-                    senta_sozinho, levanta_cadeira, anda_sozinho, abre_portas, locomocao_escadas, locomocao_terrenos,
-                    usa_transporte, empurra_brinquedos, corre_pula, cadeira_rodas, observacoes_mobilidade, aluno_id
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                request.form.get('senta_sozinho'),
-                request.form.get('levanta_cadeira'),
-                request.form.get('anda_sozinho'),
-                request.form.get('abre_portas'),
-                request.form.get('locomocao_escadas'),
-                request.form.get('locomocao_terrenos'),
-                request.form.get('usa_transporte'),
-                request.form.get('empurra_brinquedos'),
-                request.form.get('corre_pula'),
-                request.form.get('cadeira_rodas'),
-                request.form.get('observacoes_mobilidade'),
-                aluno_id
-            ))
-
-            # FUNÇÃO SOCIAL
-            cur.execute("""
-                INSERT INTO tbl_quest_pedi_funcaosocial (
-                    responde_chamado, contato_visual, imita_acoes, participa_brincadeiras, respeita_turnos,
-                    fala_palavras, gestos_sinais, pede_ajuda, compreende_instrucoes, expressa_sentimento,
-                    guarda_brinquedo, lembra_atividades, cumpre_combinado, escolhe_roupas, demonstra_interesse,
-                    observacoes_fun_social, aluno_id
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                request.form.get('responde_chamado'),
-                request.form.get('contato_visual'),
-                request.form.get('imita_acoes'),
-                request.form.get('participa_brincadeiras'),
-                request.form.get('respeita_turnos'),
-                request.form.get('fala_palavras'),
-                request.form.get('gestos_sinais'),
-                request.form.get('pede_ajuda'),
-                request.form.get('compreende_instrucoes'),
-                request.form.get('expressa_sentimento'),
-                request.form.get('guarda_brinquedo'),
-                request.form.get('lembra_atividades'),
-                request.form.get('cumpre_combinado'),
-                request.form.get('escolhe_roupas'),
-                request.form.get('demonstra_interesse'),
-                request.form.get('observacoes_fun_social'),
-                aluno_id
-            ))
+            questionarios.PEDI.gravar(cur, [resposta])
 
             mysql.connection.commit()
             cur.close()
+            cache_pdf.invalidar('pedi', aluno_id)
             flash('Questionário PEDI salvo com sucesso!', 'success')
             return redirect(url_for('quest_pedi'))
 
@@ -1342,18 +1308,13 @@ def quest_pedi():
             if cur:
                 cur.close()
             flash(f'Erro ao salvar: {str(e)}', 'danger')
-            return render_template('quest_pedi.html', alunos=alunos)
+            return render_template('quest_pedi.html', **contexto_alunos_ativos())
 
-    return render_template('quest_pedi.html', alunos=alunos)
+    return render_template('quest_pedi.html', **contexto_alunos_ativos())
 
 @app.route('/gerar_pdf_pdi', methods=['GET', 'POST'])
 @acesso_requerido('Master', 'Pleno', 'Junior')
 def gerar_pdf_pdi():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT id_aluno, nome_aluno FROM tbl_cad_alunos where status_aluno = 'Ativo' ORDER BY nome_aluno")
-    alunos = cur.fetchall()
-    cur.close()
-
     if request.method == 'POST':
         id_aluno = request.form.get('id_aluno')
         if id_aluno:
@@ -1374,23 +1335,20 @@ def gerar_pdf_pdi():
             return redirect(url_for('gerar_pdf_pdi'))
 
         # Passa todas as respostas diretamente para o template
-        html = render_template('relatorio_pdf_pedi.html', respostas=respostas)
-        pdf = BytesIO()
-        pisa_status = pisa.CreatePDF(html, dest=pdf)
-        if pisa_status.err:
-            flash('Erro ao gerar o PDF.', 'danger')
-            return redirect(url_for('gerar_pdf_pdi'))
+        def gerar_pdf():
+            return html_para_pdf(*trabalho_pdf('pedi', respostas))
 
-        pdf.seek(0)
         nome_aluno = respostas.get("nome_aluno", "Aluno")
-        return send_file(
-            pdf,
-            mimetype='application/pdf',
-            download_name=f'Relatorio_PEDI_Aluno_{nome_aluno}.pdf',
-            as_attachment=False
+        resposta = enviar_pdf_em_cache(
+            'pedi', respostas['id_aluno'], respostas, 'relatorio_pdf_pedi.html',
+            gerar_pdf, f'Relatorio_PEDI_Aluno_{nome_aluno}.pdf'
         )
+        if resposta is None:
+            flash('Erro ao gerar o PDF.', 'danger')
+            return redirect(url_for('gerar_pdf_pdi'))
+        return resposta
 
-    return render_template('gerar_pdf_pdi.html', alunos=alunos)
+    return render_template('gerar_pdf_pdi.html', **contexto_alunos_ativos())
 
 #gerando pdf pedi
 @app.route('/pdf_pdi', methods=['GET'])
@@ -1404,89 +1362,12 @@ def pdf_pdi():
 @app.route('/gerar_excel_pdi', methods=['GET'])
 @acesso_requerido('Master', 'Pleno', 'Junior')
 def gerar_excel_pdi():
-    cur = mysql.connection.cursor()
-    cur.execute("""SELECT  
-        id_aluno,
-        matricula_aluno,
-        nome_aluno,
-        idade,
-        id_cuid_pessoal,
-        alimentacao_talher,
-        mastigacao,
-        ingestao_liquidos,
-        cortar_alimentos,
-        recurso_comer,
-        escovacao_dentes,
-        higiene_maos,
-        papel_higienico,
-        enxugase_banho,
-        lembrete_higiene,
-        vestimenta_camisa,
-        vestimenta_calca,
-        autonomia_ziper_amarras,
-        calcados,
-        diferencia_frente_verso,
-        comunicacao_banheiro,
-        autonomia_vaso_sanitario,
-        acidentes_urina_outros,
-        lavar_maos,
-        supervisao_banheiro,
-        observacoes,
-        id_mobilidade,
-        senta_sozinho,
-        levanta_cadeira,
-        anda_sozinho,
-        abre_portas,
-        locomocao_escadas,
-        locomocao_terrenos,
-        usa_transporte,
-        empurra_brinquedos,
-        corre_pula,
-        cadeira_rodas,
-        observacoes_mobilidade,
-        id_func_social,
-        responde_chamado,
-        contato_visual,
-        imita_acoes,
-        participa_brincadeiras,
-        respeita_turnos,
-        fala_palavras,
-        gestos_sinais,
-        pede_ajuda,
-        compreende_instrucoes,
-        expressa_sentimento,
-        guarda_brinquedo,
-        lembra_atividades,
-        cumpre_combinado,
-        escolhe_roupas,
-        demonstra_interesse,
-        observacoes_fun_social
-    FROM u799109175_db_funcae.vw_quest_pedi""")
+    resposta = exportar_excel_ou_enfileirar('pedi')
 
-    dados = cur.fetchall()
-    colunas = [desc[0] for desc in cur.description]  # pega nomes das colunas
-    cur.close()
-
-    if not dados:
+    if resposta is None:
         return "Nenhum dado para exportar.", 404
 
-    # Cria DataFrame com nomes das colunas
-    df = pd.DataFrame(dados, columns=colunas)
-
-    # Cria Excel em memória
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='PDI')
-
-    output.seek(0)
-
-    # Retorna Excel para download
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='relatorio_pdi.xlsx'
-    )
+    return resposta
 
 @app.route('/manutencao')
 def manutencao():
@@ -1505,11 +1386,8 @@ def ficha_matricula():
 
 @app.route('/relatorio_avaliacao', methods=['GET', 'POST'])
 @acesso_requerido('Master', 'Pleno')
+@recebe_uploads(armazem_anexos.receptor)
 def relatorio_avaliacao():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT id_aluno, nome_aluno FROM tbl_cad_alunos where status_aluno = 'Ativo' ORDER BY nome_aluno")
-    alunos = cur.fetchall()
-    cur.close()
     
     if request.method == 'POST':
         try:
@@ -1523,55 +1401,73 @@ def relatorio_avaliacao():
             responsavel_av = request.form.get('responsavel_av')
             questionario = request.form.get('questionario')  
             relatorio = request.form.get('relatorio')
-            anexo_doc = request.form.get('anexo_doc')
             
 
             #validar questionario
             validar_questionario = ['PEI', 'PDI', 'GUIDE','OUTROS']
             if questionario not in validar_questionario:
                 flash('Selecione um questionário válido.', 'danger')
-                return render_template('relatorio_avaliacao.html', alunos=alunos)
+                return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
 
             # Validação básica
             if not all([aluno_id, data_inicio, data_fim, responsavel_av, questionario, relatorio]):
                 flash('Todos os campos obrigatórios devem ser preenchidos.', 'danger')
-                return render_template('relatorio_avaliacao.html', alunos=alunos)
+                return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
             
             # VALIDAÇÃO DE TAMANHO DOS CAMPOS DE TEXTO
             # Verificar tamanho do questionário (ajuste conforme sua estrutura de BD)
             if len(questionario) > 5000:  # Ajuste este valor conforme o tamanho da coluna
                 flash('Texto do questionário muito longo. Limite: 5000 caracteres.', 'danger')
-                return render_template('relatorio_avaliacao.html', alunos=alunos)
+                return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
             
             # Verificar tamanho do relatório
             if len(relatorio) > 10000:  # Ajuste este valor conforme o tamanho da coluna
                 flash('Texto do relatório muito longo. Limite: 10000 caracteres.', 'danger')
-                return render_template('relatorio_avaliacao.html', alunos=alunos)
+                return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
             
             # Verificar tamanho do responsável
             if len(responsavel_av) > 255:  # Comum para campos VARCHAR
                 flash('Nome do responsável muito longo. Limite: 255 caracteres.', 'danger')
-                return render_template('relatorio_avaliacao.html', alunos=alunos)
+                return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
             
-            # Processamento de arquivo (se houver)
-            anexo_doc = None
-            if 'anexo_doc' in request.files:
+            if action not in ('save', 'generate_pdf'):
+                return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
+            
+            # Processamento de arquivo (se houver): já recebido em blocos dentro do armazém de anexos,
+            # com hash, limite de tamanho e assinatura %PDF- conferidos durante o upload
+            anexo_sha256 = anexo_tamanho = anexo_nome = anexo_tipo = None
+            anexo_upload = request.form.get('anexo_upload')
+            if anexo_upload:
+                # Enviado antes, em blocos, por /anexos/uploads (static/js/upload_retomavel.js)
+                try:
+                    enviado = area_uploads.finalizado(anexo_upload, session.get('email'))
+                except (UploadInexistente, UploadIncompleto):
+                    flash('O envio do anexo expirou ou não terminou. Selecione o arquivo novamente.', 'danger')
+                    return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
+                anexo_sha256, anexo_tamanho = enviado['sha256'], enviado['tamanho']
+                anexo_nome = secure_filename(enviado['nome'])[:255] or None
+                anexo_tipo = 'application/pdf'
+            elif 'anexo_doc' in request.files:
                 file = request.files['anexo_doc']
                 if file and file.filename:
                     allowed_extensions = {'pdf'}
-                    if '.' in file.filename:
-                        file_ext = file.filename.rsplit('.', 1)[1].lower()
-                        if file_ext in allowed_extensions:
-                            file.seek(0, os.SEEK_END)
-                            file_size = file.tell()
-                            file.seek(0)
-                            if file_size > 10 * 1024 * 1024:
-                                flash('Arquivo muito grande. Tamanho máximo: 10MB', 'danger')
-                                return render_template('relatorio_avaliacao.html', alunos=alunos)
-                            anexo_doc = file.read()
-                        else:
-                            flash('Tipo de arquivo não permitido. Use: PDF', 'danger')
-                            return render_template('relatorio_avaliacao.html', alunos=alunos)
+                    file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
+                    if file_ext not in allowed_extensions:
+                        flash('Tipo de arquivo não permitido. Use: PDF', 'danger')
+                        return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
+                    try:
+                        anexo_sha256, anexo_tamanho, _ = armazem_anexos.guardar(file.stream)
+                    except TipoNaoPermitido:
+                        flash('Tipo de arquivo não permitido. Use: PDF', 'danger')
+                        return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
+                    except UploadRecusado as e:
+                        flash(str(e), 'danger')
+                        return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
+                    anexo_nome = secure_filename(file.filename)[:255] or None
+                    anexo_tipo = 'application/pdf'
+            
+            # DDL faz commit implícito: garante as colunas de metadados antes da transação
+            anexos.garantir_esquema(mysql.connection)
             
             # Buscar nome do aluno para salvar junto
             cur = mysql.connection.cursor()
@@ -1585,54 +1481,39 @@ def relatorio_avaliacao():
             # questionario: ENUM - validado acima
             # relatorio: LONGTEXT - sem limite prático
             
+            # Inserir no banco de dados (o conteúdo do anexo fica no disco; aqui só os metadados)
+            cur.execute("""
+                INSERT INTO tbl_rel_ava_anterior (
+                    nome_aluno, data_inicio, data_fim, responsavel_av,
+                    questionario, relatorio, aluno_id,
+                    tem_anexo, anexo_sha256, anexo_tamanho, anexo_nome, anexo_tipo
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                nome_aluno,
+                data_inicio,
+                data_fim,
+                responsavel_av,
+                questionario,
+                relatorio,
+                aluno_id,
+                anexo_sha256 is not None,
+                anexo_sha256,
+                anexo_tamanho,
+                anexo_nome,
+                anexo_tipo
+            ))
+            
+            mysql.connection.commit()
+            cur.close()
+            cache_pdf.invalidar('avaliacao', aluno_id)
+            if anexo_upload:
+                area_uploads.descartar(anexo_upload)
+            
             if action == 'save':
-                # Inserir no banco de dados
-                cur.execute("""
-                    INSERT INTO tbl_rel_ava_anterior (
-                        nome_aluno, data_inicio, data_fim, responsavel_av,
-                        questionario, relatorio, anexo_doc, aluno_id
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    nome_aluno,
-                    data_inicio,
-                    data_fim,
-                    responsavel_av,  
-                    questionario,      
-                    relatorio,
-                    anexo_doc,
-                    aluno_id
-                ))
-                
-                mysql.connection.commit()
-                cur.close()
-                
                 flash('Relatório de avaliação salvo com sucesso!', 'success')
-                return redirect(url_for('relatorio_avaliacao'))
-                
-            elif action == 'generate_pdf':
-                
-                cur.execute("""
-                    INSERT INTO tbl_rel_ava_anterior (
-                        nome_aluno, data_inicio, data_fim, responsavel_av,
-                        questionario, relatorio, anexo_doc, aluno_id
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    nome_aluno,
-                    data_inicio,
-                    data_fim,
-                    responsavel_av,
-                    questionario,
-                    relatorio,
-                    anexo_doc,
-                    aluno_id
-                ))
-                
-                mysql.connection.commit()
-                cur.close()
-                
-                
+            else:
                 flash('PDF gerado e dados salvos com sucesso!', 'success')
-                return redirect(url_for('relatorio_avaliacao'))
+            return redirect(url_for('relatorio_avaliacao'))
             
         except Exception as e:
             mysql.connection.rollback()
@@ -1640,28 +1521,153 @@ def relatorio_avaliacao():
                 cur.close()
             print(f"Erro ao salvar relatório: {str(e)}")
             flash('Erro ao salvar relatório. Tente novamente.', 'danger')
-            return render_template('relatorio_avaliacao.html', alunos=alunos)
+            return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
     
-    return render_template('relatorio_avaliacao.html', alunos=alunos)
+    return render_template('relatorio_avaliacao.html', **contexto_alunos_ativos())
+
+def rota_de_upload(f):
+    """Responde os erros do protocolo de upload em blocos como JSON com o status HTTP"""
+    status = ((UploadInexistente, 404), (BlocoInvalido, 400), (UploadIncompleto, 409),
+              (ArquivoGrandeDemais, 413), (TipoNaoPermitido, 415))
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        except tuple(classe for classe, _ in status) as e:
+            codigo = next(codigo for classe, codigo in status if isinstance(e, classe))
+            return jsonify({'erro': str(e) or 'Upload não encontrado'}), codigo
+    return decorated_function
+
+
+@app.route('/anexos/uploads', methods=['POST'])
+@acesso_requerido('Master', 'Pleno')
+@rota_de_upload
+def iniciar_upload_anexo():
+    """
+    Inicia um upload em blocos: JSON {"nome": "laudo.pdf", "tamanho": bytes}
+
+    Protocolo (respostas com as faixas [inicio, fim) já recebidas):
+        PUT    /anexos/uploads/<id>?inicio=N   corpo = bytes do bloco
+        GET    /anexos/uploads/<id>            para retomar do que falta
+        POST   /anexos/uploads/<id>/finalizar  {"id_relatorio": n} opcional
+        DELETE /anexos/uploads/<id>
+    """
+    dados = request.get_json(silent=True) or {}
+    nome = str(dados.get('nome') or '')
+    if not nome.lower().endswith('.pdf'):
+        raise TipoNaoPermitido('Tipo de arquivo não permitido. Use: PDF')
+    resumo = area_uploads.iniciar(nome, dados.get('tamanho'), session.get('email'))
+    return jsonify(resumo), 201
+
+
+@app.route('/anexos/uploads/<id_upload>', methods=['GET'])
+@acesso_requerido('Master', 'Pleno')
+@rota_de_upload
+def consultar_upload_anexo(id_upload):
+    return jsonify(area_uploads.consultar(id_upload, session.get('email')))
+
+
+@app.route('/anexos/uploads/<id_upload>', methods=['PUT'])
+@acesso_requerido('Master', 'Pleno')
+@rota_de_upload
+def enviar_bloco_anexo(id_upload):
+    inicio = request.args.get('inicio', type=int)
+    resumo = area_uploads.gravar_bloco(id_upload, session.get('email'), inicio,
+                                       request.stream, request.content_length)
+    return jsonify(resumo)
+
+
+@app.route('/anexos/uploads/<id_upload>/finalizar', methods=['POST'])
+@acesso_requerido('Master', 'Pleno')
+@rota_de_upload
+def finalizar_upload_anexo(id_upload):
+    """
+    Confere o arquivo e o move para o armazém de anexos
+
+    Com {"id_relatorio": n} o anexo também passa a ser o do relatório n; sem
+    ele, o id do upload vai no campo anexo_upload do formulário de
+    relatorio_avaliacao.
+    """
+    resumo = area_uploads.finalizar(id_upload, session.get('email'), armazem_anexos)
+    id_relatorio = (request.get_json(silent=True) or {}).get('id_relatorio')
+    if id_relatorio is None:
+        return jsonify(resumo)
+
+    anexos.garantir_esquema(mysql.connection)
+    cur = mysql.connection.cursor()
+    try:
+        vinculado = anexos.vincular(cur, int(id_relatorio), resumo['sha256'], resumo['tamanho'],
+                                    secure_filename(resumo['nome'])[:255] or None)
+        if vinculado is None:
+            mysql.connection.rollback()
+            return jsonify({'erro': 'Relatório não encontrado'}), 404
+        mysql.connection.commit()
+        aluno_id, anterior = vinculado
+        if aluno_id:
+            cache_pdf.invalidar('avaliacao', aluno_id)
+        if anterior and anterior != resumo['sha256'] and not anexos.referenciado(cur, anterior):
+            armazem_anexos.remover(anterior)
+    except (TypeError, ValueError):
+        return jsonify({'erro': 'id_relatorio inválido'}), 400
+    finally:
+        cur.close()
+    area_uploads.descartar(id_upload)
+    return jsonify(dict(resumo, id_relatorio=int(id_relatorio)))
+
+
+@app.route('/anexos/uploads/<id_upload>', methods=['DELETE'])
+@acesso_requerido('Master', 'Pleno')
+@rota_de_upload
+def cancelar_upload_anexo(id_upload):
+    area_uploads.consultar(id_upload, session.get('email'))
+    area_uploads.descartar(id_upload)
+    return '', 204
+
 
 # Rota adicional para visualizar relatórios salvos
 @app.route('/listar_relatorios')
 def listar_relatorios():
+    """
+    Listagem paginada (?apos=/?antes=) e filtrável (?aluno=&questionario=&data_de=&data_ate=)
+
+    Com ?formato=json devolve só a página da tabela.
+    """
     try:
+        filtros = listagem_relatorios.filtros_da_requisicao(request.args)
+        por_pagina = listagem_relatorios.por_pagina_da_requisicao(request.args)
+
+        anexos.garantir_esquema(mysql.connection)
+        garantir_indices(mysql.connection, 'tbl_rel_ava_anterior', listagem_relatorios.INDICES)
         cur = mysql.connection.cursor()
-        cur.execute("""
-            SELECT 
-                id_relatorio, nome_aluno, data_inicio, data_fim, 
-                responsavel_av, questionario, 
-                CASE WHEN anexo_doc IS NOT NULL THEN 'Sim' ELSE 'Não' END as tem_anexo,
-                aluno_id
-            FROM tbl_rel_ava_anterior 
-            ORDER BY data_inicio DESC
-        """)
-        relatorios = cur.fetchall()
-        cur.close()
-        
-        return render_template('listar_relatorios.html', relatorios=relatorios)
+        try:
+            resultado = listagem_relatorios.pagina(
+                cur, filtros,
+                apos=request.args.get('apos'), antes=request.args.get('antes'),
+                por_pagina=por_pagina
+            )
+        finally:
+            cur.close()
+
+        if request.args.get('formato') == 'json':
+            return jsonify({
+                'relatorios': [listagem_relatorios.relatorio_json(r) for r in resultado['relatorios']],
+                'proximo': resultado['proximo'],
+                'anterior': resultado['anterior'],
+                'por_pagina': por_pagina,
+                'filtros': filtros,
+            })
+
+        return render_template(
+            'listar_relatorios.html',
+            relatorios=resultado['relatorios'],
+            proximo=resultado['proximo'],
+            anterior=resultado['anterior'],
+            filtros=filtros,
+            por_pagina=por_pagina,
+            questionarios=listagem_relatorios.QUESTIONARIOS,
+            **contexto_alunos_ativos()
+        )
     
     except Exception as e:
         flash(f'Erro ao carregar relatórios: {str(e)}', 'danger')
@@ -1671,12 +1677,9 @@ def listar_relatorios():
 @app.route('/ver_relatorio/<int:id_relatorio>')
 def ver_relatorio(id_relatorio):
     try:
+        anexos.garantir_esquema(mysql.connection)
         cur = mysql.connection.cursor()
-        cur.execute("""
-            SELECT * FROM tbl_rel_ava_anterior 
-            WHERE id_relatorio = %s
-        """, (id_relatorio,))
-        relatorio = cur.fetchone()
+        relatorio = listagem_relatorios.carregar(cur, id_relatorio)
         cur.close()
         
         if not relatorio:
@@ -1693,27 +1696,43 @@ def ver_relatorio(id_relatorio):
 @app.route('/download_anexo/<int:id_relatorio>')
 def download_anexo(id_relatorio):
     try:
+        anexos.garantir_esquema(mysql.connection)
         cur = mysql.connection.cursor()
+        # Só os metadados; o BLOB é lido apenas para relatórios ainda não migrados
         cur.execute("""
-            SELECT anexo_doc, nome_aluno FROM tbl_rel_ava_anterior 
-            WHERE id_relatorio = %s AND anexo_doc IS NOT NULL
+            SELECT nome_aluno, anexo_sha256, anexo_nome, anexo_tipo,
+                   anexo_doc IS NOT NULL AS tem_blob
+            FROM tbl_rel_ava_anterior 
+            WHERE id_relatorio = %s AND (anexo_sha256 IS NOT NULL OR anexo_doc IS NOT NULL)
         """, (id_relatorio,))
         resultado = cur.fetchone()
-        cur.close()
         
         if not resultado:
+            cur.close()
             flash('Anexo não encontrado.', 'danger')
             return redirect(url_for('listar_relatorios'))
         
-        anexo_doc = resultado['anexo_doc']
-        nome_aluno = resultado['nome_aluno']
-        
-        # Criar resposta com arquivo
-        response = make_response(anexo_doc)
-        response.headers['Content-Type'] = 'application/octet-stream'
-        response.headers['Content-Disposition'] = f'attachment; filename=anexo_relatorio_{nome_aluno}_{id_relatorio}'
+        nome_arquivo = resultado['anexo_nome'] or secure_filename(
+            f"anexo_relatorio_{resultado['nome_aluno']}_{id_relatorio}.pdf")
+        mimetype = resultado['anexo_tipo'] or 'application/pdf'
         
-        return response
+        if resultado['anexo_sha256']:
+            cur.close()
+            caminho = armazem_anexos.caminho(resultado['anexo_sha256'])
+            if not os.path.exists(caminho):
+                print(f"Anexo do relatório {id_relatorio} ausente no disco: {caminho}")
+                flash('Arquivo do anexo não encontrado no servidor.', 'danger')
+                return redirect(url_for('listar_relatorios'))
+            # conditional=True: responde 304 para If-None-Match e 206 para Range
+            return send_file(caminho, mimetype=mimetype, as_attachment=True, download_name=nome_arquivo,
+                             etag=resultado['anexo_sha256'], conditional=True, max_age=0)
+        
+        # Relatório anterior à migração (`flask anexos-migrar`): conteúdo ainda no BLOB
+        cur.execute("SELECT anexo_doc FROM tbl_rel_ava_anterior WHERE id_relatorio = %s", (id_relatorio,))
+        anexo_doc = cur.fetchone()['anexo_doc']
+        cur.close()
+        return send_file(BytesIO(anexo_doc), mimetype=mimetype, as_attachment=True, download_name=nome_arquivo,
+                         etag=hashlib.sha256(anexo_doc).hexdigest(), conditional=True, max_age=0)
     
     except Exception as e:
         flash(f'Erro ao baixar anexo: {str(e)}', 'danger')
@@ -1723,9 +1742,17 @@ def download_anexo(id_relatorio):
 @app.route('/deletar_relatorio/<int:id_relatorio>', methods=['POST'])
 def deletar_relatorio(id_relatorio):
     try:
+        anexos.garantir_esquema(mysql.connection)
         cur = mysql.connection.cursor()
+        cur.execute("SELECT aluno_id, anexo_sha256 FROM tbl_rel_ava_anterior WHERE id_relatorio = %s", (id_relatorio,))
+        relatorio = cur.fetchone()
         cur.execute("DELETE FROM tbl_rel_ava_anterior WHERE id_relatorio = %s", (id_relatorio,))
         mysql.connection.commit()
+        if relatorio and relatorio['aluno_id']:
+            cache_pdf.invalidar('avaliacao', relatorio['aluno_id'])
+        # O mesmo conteúdo pode estar em outros relatórios: só apaga o último
+        if relatorio and relatorio['anexo_sha256'] and not anexos.referenciado(cur, relatorio['anexo_sha256']):
+            armazem_anexos.remover(relatorio['anexo_sha256'])
         cur.close()
         
         flash('Relatório deletado com sucesso!', 'success')
@@ -1740,117 +1767,102 @@ def deletar_relatorio(id_relatorio):
 @app.route('/quest_guide', methods=['GET', 'POST'])
 @acesso_requerido('Master', 'Pleno')
 def quest_guide():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT id_aluno, nome_aluno FROM tbl_cad_alunos WHERE status_aluno = 'Ativo' ORDER BY nome_aluno ")
-    alunos = cur.fetchall()
-    cur.close()
-
     if request.method == 'POST':
+        cur = None
         try:    
-            aluno_id = request.form.get('aluno_id')
+            resposta = respostas_do_formulario(questionarios.GUIDE)
+            if resposta is None:
+                return render_template('quest_guide.html', **contexto_alunos_ativos())
+            aluno_id = resposta[0]
 
-            # 1. Socialização
-            cur = mysql.connection.cursor()
-            cur.execute("""
-                INSERT INTO tbl_socializacao_guide (
-                    aluno_id, sorri_amigavel, contato_visual, imita_acoes, brinca_com_criancas, responde_gestos, observacoes_socializacao
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('sorri_amigavel'),
-                request.form.get('contato_visual'),
-                request.form.get('imita_acoes'),
-                request.form.get('brinca_com_criancas'),
-                request.form.get('responde_gestos'),
-                request.form.get('observacoes_socializacao')
-            ))
-
-            # 2. Linguagem
-            cur.execute("""
-                INSERT INTO tbl_linguagem_guide (
-                    aluno_id, responde_chamado, emite_sons, usa_gestos, nomeia_objetos, constroi_frases, observacoes_linguagem
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('responde_chamado'),
-                request.form.get('emite_sons'),
-                request.form.get('usa_gestos'),
-                request.form.get('nomeia_objetos'),
-                request.form.get('constroi_frases'),
-                request.form.get('observacoes_linguagem')
-            ))
+            # DDL faz commit implícito: garante a tabela-resumo antes da transação
+            resumo_guide.garantir_tabela(mysql.connection)
 
-            # 3. Autocuidado
-            cur.execute("""
-                INSERT INTO tbl_autocuidado_guide (
-                    aluno_id, colher_aboca, bebe_copos, uso_sapatos, avisa_banheiro, escova_dentes, observacoes_autocuidados
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('colher_aboca'),
-                request.form.get('bebe_copos'),
-                request.form.get('uso_sapatos'),
-                request.form.get('avisa_banheiro'),
-                request.form.get('escova_dentes'),
-                request.form.get('observacoes_autocuidados')
-            ))
-
-            # 4. Motricidade Fina
-            cur.execute("""
-                INSERT INTO tbl_motricidade_guide (
-                    aluno_id, pega_objetos, empilha_blocos, encaixa_pecas, recorta_papel, faz_rabiscos, observacoes_motrocidade
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('pega_objetos'),
-                request.form.get('empilha_blocos'),
-                request.form.get('encaixa_pecas'),
-                request.form.get('recorta_papel'),
-                request.form.get('faz_rabiscos'),
-                request.form.get('observacoes_motrocidade')
-            ))
+            # 1 a 5. Socialização, Linguagem, Autocuidado, Motricidade Fina e Global
+            cur = mysql.connection.cursor()
+            questionarios.GUIDE.gravar(cur, [resposta])
 
-            # 5. Motricidade Global
-            cur.execute("""
-                INSERT INTO tbl_motroc_global_guide (
-                    aluno_id, engatinha, anda_semapoio, corre_controle, sobe_escadas_correto, pula_doispes, observacao_motroc_glob
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                aluno_id,
-                request.form.get('engatinha'),
-                request.form.get('anda_semapoio'),
-                request.form.get('corre_controle'),
-                request.form.get('sobe_escadas_correto'),
-                request.form.get('pula_doispes'),
-                request.form.get('observacao_motroc_glob')  
-            ))
+            # 6. Resumo do dashboard (mesma transação das respostas)
+            resumo_guide.atualizar_aluno(cur, aluno_id)
 
             mysql.connection.commit()
             cur.close()
+            cache_pdf.invalidar('guide', aluno_id)
+            versoes.incrementar('dashboard')
             flash('Questionário GUIDE salvo com sucesso!', 'success')
             return redirect(url_for('quest_guide'))
         except Exception as e:
             mysql.connection.rollback()
-            if 'cur' in locals():
+            if cur:
                 cur.close()
             flash(f'Erro ao salvar: {str(e)}', 'danger')
-            return render_template('quest_guide.html', alunos=alunos)
+            return render_template('quest_guide.html', **contexto_alunos_ativos())
+
+    return render_template('quest_guide.html', **contexto_alunos_ativos())
+
+def importar_respostas(tipo, linhas):
+    """
+    Importa respostas NDJSON de um questionário e invalida os caches afetados
+
+    Returns:
+        ingestao.Relatorio
+    """
+    def atualizar_resumo(cursor, ids_alunos):
+        for id_aluno in ids_alunos:
+            resumo_guide.atualizar_aluno(cursor, id_aluno)
+
+    if tipo == 'guide':
+        # DDL faz commit implícito: garante a tabela-resumo antes das transações
+        resumo_guide.garantir_tabela(mysql.connection)
+
+    relatorio = ingestao.importar(
+        mysql.connection, questionarios.QUESTIONARIOS[tipo], linhas,
+        tamanho_lote=app.config['INGESTAO_BATCH_SIZE'],
+        antes_do_commit=atualizar_resumo if tipo == 'guide' else None,
+        max_erros=app.config['INGESTAO_MAX_ERROS']
+    )
+    for id_aluno in relatorio.alunos:
+        cache_pdf.invalidar(tipo, id_aluno)
+    if tipo == 'guide' and relatorio.gravadas:
+        versoes.incrementar('dashboard')
+    return relatorio
+
+
+@app.route('/ingestao/<any(pei, pedi, guide):tipo>', methods=['POST'])
+@acesso_requerido('Master', 'Pleno')
+def ingestao_respostas(tipo):
+    """
+    Importa respostas de questionário em NDJSON (uma resposta por linha)
+
+    O corpo da requisição é lido em streaming (aceita Content-Encoding: gzip);
+    também aceita um arquivo enviado no campo 'arquivo' de um formulário.
+    Responde com o relatório: contagens, erros por linha e vazão.
+    """
+    arquivo = request.files.get('arquivo')
+    if arquivo is not None:
+        linhas = arquivo.stream
+        if arquivo.filename and arquivo.filename.endswith('.gz'):
+            linhas = gzip.GzipFile(fileobj=linhas)
+    else:
+        linhas = request.stream
+        if request.headers.get('Content-Encoding') == 'gzip':
+            linhas = gzip.GzipFile(fileobj=linhas)
+
+    try:
+        relatorio = importar_respostas(tipo, linhas)
+    except (OSError, EOFError) as e:  # gzip corrompido/truncado
+        return jsonify({'erro': f'Arquivo inválido: {e}'}), 400
+    return jsonify(relatorio.como_dict())
 
-    return render_template('quest_guide.html', alunos=alunos)
 
 @app.route('/gerar_pdf_guide', methods=['GET', 'POST'])
 @acesso_requerido('Master', 'Pleno')
 def gerar_pdf_guide():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT id_aluno, nome_aluno FROM tbl_cad_alunos WHERE status_aluno = 'Ativo' ORDER BY nome_aluno")
-    alunos = cur.fetchall()
-    cur.close()
-
     if request.method == 'POST':
         id_aluno = request.form.get('id_aluno')
         if not id_aluno:
             flash('Selecione um aluno.', 'danger')
-            return render_template('gerar_pdf_guide.html', alunos=alunos)
+            return render_template('gerar_pdf_guide.html', **contexto_alunos_ativos())
 
         # Busca as respostas do aluno na view
         cur = mysql.connection.cursor()
@@ -1862,138 +1874,50 @@ def gerar_pdf_guide():
 
         if not respostas:
             flash('Nenhum registro GUIDE encontrado para este aluno.', 'warning')
-            return render_template('gerar_pdf_guide.html', alunos=alunos)
+            return render_template('gerar_pdf_guide.html', **contexto_alunos_ativos())
+
+        if request.form.get('assincrono'):
+            id_tarefa = fila_tarefas.enfileirar('pdf_guide', {'id_aluno': respostas['id_aluno']},
+                                                usuario=session.get('email'))
+            return redirect(url_for('status_tarefa', id_tarefa=id_tarefa))
 
         try:
-            # Renderiza o HTML do relatório
-            rendered = render_template('relatorio_pdf_guide.html', respostas=respostas)
+            def gerar_pdf():
+                return html_para_pdf(*trabalho_pdf('guide', respostas))
 
-            # Configurações do WeasyPrint para melhor qualidade
-            from weasyprint import HTML, CSS
-            from weasyprint.text.fonts import FontConfiguration
-            
-            font_config = FontConfiguration()
-            
-            # CSS adicional para PDF
-            css_string = """
-            @page {
-                size: A4;
-                margin: 2cm;
-                @bottom-center {
-                    content: "Página " counter(page) " de " counter(pages);
-                    font-size: 10px;
-                    color: #666;
-                }
-            }
-            body { 
-                font-size: 12px; 
-                line-height: 1.4; 
-            }
-            """
-            
-            # Gera o PDF com configurações otimizadas
-            pdf = BytesIO()
-            HTML(string=rendered).write_pdf(
-                pdf,
-                stylesheets=[CSS(string=css_string)],
-                font_config=font_config,
-                presentational_hints=True
-            )
-            pdf.seek(0)
-            
             # Nome do arquivo limpo
             nome_aluno_limpo = respostas['nome_aluno'].replace(' ', '_').replace('/', '_')
             nome_arquivo = f"relatorio_guide_{nome_aluno_limpo}.pdf"
-            
-            return send_file(
-                pdf, 
-                download_name=nome_arquivo, 
-                as_attachment=False,
-                mimetype='application/pdf'
+
+            return enviar_pdf_em_cache(
+                'guide', respostas['id_aluno'], respostas, 'relatorio_pdf_guide.html',
+                gerar_pdf, nome_arquivo
             )
             
         except Exception as e:
             flash(f'Erro ao gerar o PDF: {str(e)}', 'danger')
-            return render_template('gerar_pdf_guide.html', alunos=alunos)
+            return render_template('gerar_pdf_guide.html', **contexto_alunos_ativos())
 
-    return render_template('gerar_pdf_guide.html', alunos=alunos)
+    return render_template('gerar_pdf_guide.html', **contexto_alunos_ativos())
 
 
 @app.route('/gerar_excel_guide', methods=['GET'])
 @acesso_requerido('Master', 'Pleno', 'Junior')
 def gerar_excel_guide():
-    cur = mysql.connection.cursor()
-    cur.execute("""SELECT  
-        id_aluno,
-        matricula_aluno,
-        nome_aluno,
-        idade,
-        id_social,
-        sorri_amigavel,
-        contato_visual,
-        imita_acoes,
-        brinca_com_criancas,
-        responde_gestos,
-        observacoes_socializacao,
-        id,
-        responde_chamado,
-        emite_sons,
-        usa_gestos,
-        nomeia_objetos,
-        constroi_frases,
-        observacoes_linguagem,
-        id_auto,
-        colher_aboca,
-        bebe_copos,
-        uso_sapatos,
-        avisa_banheiro,
-        escova_dentes,
-        observacoes_autocuidados,
-        pega_objetos,
-        empilha_blocos,
-        encaixa_pecas,
-        recorta_papel,
-        faz_rabiscos,
-        observacoes_motrocidade,
-        engatinha,
-        anda_semapoio,
-        corre_controle,
-        sobe_escadas_correto,
-        pula_doispes,
-        observacao_motroc_glob
-    FROM u799109175_db_funcae.vw_quest_guide""")
+    resposta = exportar_excel_ou_enfileirar('guide')
 
-    dados = cur.fetchall()
-    colunas = [desc[0] for desc in cur.description]  # pega nomes das colunas
-    cur.close()
-
-    if not dados:
+    if resposta is None:
         return "Nenhum dado para exportar.", 404
 
-    # Cria DataFrame com nomes das colunas
-    df = pd.DataFrame(dados, columns=colunas)
-
-    # Cria Excel em memória
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='GUIDE')
-
-    output.seek(0)
-
-    # Retorna Excel para download
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='relatorio_guide.xlsx'
-    )
+    return resposta
 
 @app.route('/gerar_avaliacao_pdf/<int:id_relatorio>', methods=['GET'])
 @acesso_requerido('Master', 'Pleno')
 def gerar_avaliacao_pdf(id_relatorio):
+    # Sem anexo_doc: o BLOB não é usado no PDF e entraria inteiro na chave do cache
+    anexos.garantir_esquema(mysql.connection)
     cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM tbl_rel_ava_anterior WHERE id_relatorio = %s", (id_relatorio,))
-    respostas = cur.fetchone()
+    respostas = listagem_relatorios.carregar(cur, id_relatorio)
     cur.close()
     
     if not respostas:
@@ -2001,20 +1925,14 @@ def gerar_avaliacao_pdf(id_relatorio):
         return redirect(url_for('listar_relatorios'))
 
     try:
-        rendered = render_template('relatorio_pdf_avaliacao.html', respostas=respostas)
+        def gerar_pdf():
+            rendered = render_template('relatorio_pdf_avaliacao.html', respostas=respostas)
+            return html_para_pdf(MOTOR_WEASYPRINT, rendered)
 
-        font_config = FontConfiguration()
-        
-        pdf = BytesIO()
-        HTML(string=rendered).write_pdf(pdf, font_config=font_config)
-        pdf.seek(0)
-        
         nome_arquivo = f"avaliacao_{id_relatorio}.pdf"
-        return send_file(
-            pdf,
-            download_name=nome_arquivo,
-            as_attachment=False,
-            mimetype='application/pdf'
+        return enviar_pdf_em_cache(
+            'avaliacao', respostas['aluno_id'], respostas, 'relatorio_pdf_avaliacao.html',
+            gerar_pdf, nome_arquivo
         )
         
     except Exception as e:
@@ -2025,30 +1943,454 @@ def gerar_avaliacao_pdf(id_relatorio):
 @app.route('/excel_alunos_inativos', methods=['GET'])
 @acesso_requerido('Master', 'Pleno', 'Junior')
 def excel_alunos_inativos():
+    resposta = exportar_excel_ou_enfileirar('alunos_inativos')
+
+    if resposta is None:
+        return "Nenhum aluno inativo encontrado.", 404
+
+    return resposta
+
+
+
+@app.route('/exportar/<fonte>.<any(csv, ndjson):formato>', methods=['GET'])
+@acesso_requerido('Master', 'Pleno', 'Junior')
+def exportar_fonte(fonte, formato):
+    """
+    Exportação em streaming CSV/NDJSON para integrações (análises, BI)
+
+    Fontes: pei (vw_quest_pei), pedi (vw_quest_pedi), guide (vw_quest_guide)
+    e alunos (tbl_cad_alunos, filtro opcional ?status_aluno=Ativo).
+
+    Parâmetros:
+        apos_id: retoma a partir de id_aluno > apos_id
+        limite:  máximo de linhas nesta chamada
+        gzip=1:  baixa o arquivo comprimido (.csv.gz/.ndjson.gz)
+    """
+    definicao = FONTES_EXPORTACAO.get(fonte)
+    if definicao is None:
+        return jsonify({'erro': True, 'mensagem': f'Fonte desconhecida: {fonte}'}), 404
+
+    apos_id = request.args.get('apos_id', type=int)
+    limite = request.args.get('limite', type=int)
+    if limite is not None and limite < 1:
+        return jsonify({'erro': True, 'mensagem': 'limite deve ser maior que zero'}), 400
+    filtros = {coluna: request.args[coluna]
+               for coluna in definicao.filtros_permitidos if request.args.get(coluna)}
+
+    return exportar_texto(
+        mysql.connection, definicao, formato, f'exportacao_{fonte}',
+        filtros=filtros, apos_id=apos_id, limite=limite, comprimir=request.args.get('gzip') == '1'
+    )
+
+# ---------------------------------------------------------------------- #
+# PDFs em lote (todos os alunos ativos num ZIP)
+# ---------------------------------------------------------------------- #
+
+def gerar_zip_pdfs_ativos(tipo, renderizador_lote=None, ao_progredir=None):
+    """
+    Gera os bytes de um ZIP com o relatório PDF de cada aluno ativo
+
+    As respostas vêm da view numa única consulta; os PDFs já presentes no
+    cache em disco são reaproveitados e os demais são convertidos em paralelo
+    pelos processos do Renderizador. O ZIP termina com um resumo.txt com a vazão.
+
+    Args:
+        tipo: 'pei', 'pedi' ou 'guide'
+        renderizador_lote: Renderizador a usar (padrão: o compartilhado do app)
+        ao_progredir: chamada com o objeto Vazao após cada PDF
+    """
+    view, template, _, _ = RELATORIOS_PDF[tipo]
+    renderizador_lote = renderizador_lote or renderizador
+
     cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM tbl_cad_alunos WHERE status_aluno = 'Inativo'")
-    alunos = cur.fetchall()
-    colunas = [desc[0] for desc in cur.description]
+    cur.execute(f"""
+        SELECT v.*
+        FROM {view} v
+        JOIN tbl_cad_alunos a ON a.id_aluno = v.id_aluno
+        WHERE a.status_aluno = 'Ativo'
+        ORDER BY v.nome_aluno, v.id_aluno
+    """)
+    linhas = cur.fetchall()
     cur.close()
 
-    if not alunos:
-        return "Nenhum aluno inativo encontrado.", 404
+    # A view pode repetir o aluno; as rotas individuais usam a primeira linha
+    vistos = set()
+    linhas = [l for l in linhas if not (l['id_aluno'] in vistos or vistos.add(l['id_aluno']))]
+
+    versao = cache_pdf.versao_template(app.jinja_env, template)
+    vazao = Vazao(len(linhas))
+
+    def itens():
+        for linha in linhas:
+            chave = cache_pdf.chave(tipo, linha, versao)
+            conteudo = cache_pdf.ler(tipo, linha['id_aluno'], chave)
+            trabalho = None if conteudo is not None else trabalho_pdf(tipo, linha)
+            yield (linha, chave, conteudo), trabalho
+
+    def entradas():
+        for (linha, chave, conteudo), pdf, erro in converter_em_paralelo(itens(), renderizador_lote):
+            nome_aluno_limpo = (linha.get('nome_aluno') or 'Aluno').replace(' ', '_').replace('/', '_')
+            nome = f"{tipo.upper()}/{nome_aluno_limpo}_{linha['id_aluno']}.pdf"
+            if conteudo is not None:
+                vazao.em_cache += 1
+            elif pdf is not None:
+                conteudo = pdf
+                vazao.gerados += 1
+                cache_pdf.guardar(tipo, linha['id_aluno'], chave, pdf)
+            else:
+                vazao.falhas.append((nome, erro or 'erro na conversão do PDF'))
+                continue
+            yield nome, conteudo
+            if ao_progredir is not None:
+                ao_progredir(vazao)
 
-    df = pd.DataFrame(alunos, columns=colunas)
+        resumo = vazao.resumo()
+        print(f"PDFs em lote ({tipo}, {renderizador_lote.processos} processos):\n{resumo}")
+        yield 'resumo.txt', resumo.encode('utf-8')
 
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Alunos Inativos')
-    output.seek(0)
+    return zip_em_stream(entradas())
 
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='alunos_inativos.xlsx'
+
+@app.route('/pdfs_lote/<any(pei, pedi, guide):tipo>.zip', methods=['GET'])
+@acesso_requerido('Master', 'Pleno')
+def pdfs_lote(tipo):
+    """
+    ZIP com os PDFs de todos os alunos ativos
+
+    Até JOBS_PDF_BATCH_THRESHOLD alunos o ZIP é enviado em streaming na própria
+    requisição; acima disso (ou com ?assincrono=1) vai para a fila de tarefas.
+    """
+    limiar = app.config['JOBS_PDF_BATCH_THRESHOLD']
+    if request.args.get('assincrono') == '1' or (limiar > 0 and get_total_ativos() > limiar):
+        id_tarefa = fila_tarefas.enfileirar('pdfs_lote', {'tipo': tipo}, usuario=session.get('email'))
+        return redirect(url_for('status_tarefa', id_tarefa=id_tarefa))
+
+    return Response(
+        stream_with_context(gerar_zip_pdfs_ativos(tipo)),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename=relatorios_{tipo}_ativos.zip',
+            'X-Accel-Buffering': 'no',
+        }
     )
 
 
+@app.cli.command('pdfs-lote')
+@click.argument('tipo', type=click.Choice(sorted(RELATORIOS_PDF)))
+@click.option('--saida', default=None, help='Arquivo ZIP (padrão: relatorios_<tipo>_ativos.zip)')
+@click.option('--processos', default=None, type=int, help='Processos de conversão (padrão: núcleos)')
+def pdfs_lote_cli(tipo, saida, processos):
+    """Gera o ZIP com os PDFs de todos os alunos ativos"""
+    saida = saida or f'relatorios_{tipo}_ativos.zip'
+    renderizador_cli = Renderizador(processos, tempo_ocioso=0) if processos else renderizador
+    try:
+        with app.test_request_context():
+            with open(saida, 'wb') as f:
+                for bloco in gerar_zip_pdfs_ativos(tipo, renderizador_cli):
+                    f.write(bloco)
+    finally:
+        renderizador_cli.encerrar()
+    print(f"ZIP gravado em {saida}")
+
+
+# ---------------------------------------------------------------------- #
+# Tarefas em segundo plano (executadas no processo `flask tarefas-worker`)
+# ---------------------------------------------------------------------- #
+
+@fila_tarefas.registrar('excel')
+def tarefa_excel(tarefa):
+    """Gera uma das planilhas de EXPORTACOES_EXCEL direto no diretório de artefatos"""
+    fonte, filtros, aba, nome_download = EXPORTACOES_EXCEL[tarefa.parametros['exportacao']]
+    definicao = FONTES_EXPORTACAO[fonte]
+
+    estimativa = estimar_linhas(mysql.connection, definicao) or 0
+    sql, params = definicao.consulta(filtros)
+    cursor = abrir_cursor_servidor(mysql.connection, sql, params)
+
+    def ao_progredir(linhas):
+        # A estimativa ignora filtros: o progresso nunca passa de 99% antes do fim
+        fracao = min(linhas / estimativa, 0.99) if estimativa else 0.0
+        tarefa.progresso(fracao, f'{linhas} linhas gravadas')
+
+    caminho = tarefa.arquivo('xlsx')
+    try:
+        with open(caminho, 'wb') as destino:
+            arquivo = gerar_xlsx(cursor, aba, destino=destino, ao_progredir=ao_progredir)
+    finally:
+        cursor.close()
+
+    if arquivo is None:
+        os.remove(caminho)
+        tarefa.progresso(1.0, 'Nenhum dado para exportar.')
+        return None
+    return {'artefato': caminho, 'nome_download': nome_download, 'mimetype': MIMETYPE_XLSX}
+
+
+@fila_tarefas.registrar('pdf_guide')
+def tarefa_pdf_guide(tarefa):
+    """Renderiza o PDF GUIDE de um aluno (reaproveitando o cache de PDFs)"""
+    cur = mysql.connection.cursor()
+    cur.execute("SELECT * FROM vw_quest_guide WHERE id_aluno = %s", (tarefa.parametros['id_aluno'],))
+    respostas = cur.fetchone()
+    cur.close()
+    if not respostas:
+        raise ValueError('Nenhum registro GUIDE encontrado para este aluno.')
+
+    tarefa.progresso(0.1, 'Renderizando PDF')
+    chave = cache_pdf.chave('guide', respostas, cache_pdf.versao_template(app.jinja_env, 'relatorio_pdf_guide.html'))
+    caminho = tarefa.arquivo('pdf')
+    # ler() devolve None também se o arquivo for apagado no meio (invalidar/LRU)
+    conteudo = cache_pdf.ler('guide', respostas['id_aluno'], chave)
+    if conteudo is None:
+        conteudo = html_para_pdf(*trabalho_pdf('guide', respostas))
+        cache_pdf.guardar('guide', respostas['id_aluno'], chave, conteudo)
+    with open(caminho, 'wb') as f:
+        f.write(conteudo)
+
+    nome_aluno_limpo = respostas['nome_aluno'].replace(' ', '_').replace('/', '_')
+    return {'artefato': caminho, 'nome_download': f"relatorio_guide_{nome_aluno_limpo}.pdf",
+            'mimetype': 'application/pdf'}
+
+
+@fila_tarefas.registrar('pdfs_lote')
+def tarefa_pdfs_lote(tarefa):
+    """ZIP com os PDFs de todos os alunos ativos (ver gerar_zip_pdfs_ativos)"""
+    tipo = tarefa.parametros['tipo']
+
+    def ao_progredir(vazao):
+        feitos = vazao.gerados + vazao.em_cache + len(vazao.falhas)
+        tarefa.progresso(feitos / vazao.total if vazao.total else 0.0,
+                         f'{feitos}/{vazao.total} PDFs ({vazao.pdfs_por_segundo:.1f} PDFs/s)')
+
+    caminho = tarefa.arquivo('zip')
+    with open(caminho, 'wb') as f:
+        for bloco in gerar_zip_pdfs_ativos(tipo, ao_progredir=ao_progredir):
+            f.write(bloco)
+    return {'artefato': caminho, 'nome_download': f'relatorios_{tipo}_ativos.zip',
+            'mimetype': 'application/zip'}
+
+
+def _tarefa_do_usuario(id_tarefa):
+    """Tarefa visível para o usuário logado (Master vê todas), ou None"""
+    tarefa = fila_tarefas.obter(id_tarefa)
+    if tarefa is None:
+        return None
+    if session.get('tipo_acesso') != 'Master' and tarefa['usuario'] not in (None, session.get('email')):
+        return None
+    return tarefa
+
+
+def _tarefa_json(tarefa):
+    dados = {chave: tarefa[chave] for chave in ('id', 'tipo', 'status', 'progresso', 'mensagem', 'erro')}
+    for chave in ('criada_em', 'iniciada_em', 'concluida_em'):
+        dados[chave] = datetime.fromtimestamp(tarefa[chave]).isoformat() if tarefa[chave] else None
+    dados['url_status'] = url_for('status_tarefa', id_tarefa=tarefa['id'])
+    if tarefa['status'] == CONCLUIDA and tarefa['artefato']:
+        dados['url_download'] = url_for('download_tarefa', id_tarefa=tarefa['id'])
+    return dados
+
+
+@app.route('/tarefas/<tipo>', methods=['POST'])
+@acesso_requerido('Master', 'Pleno', 'Junior')
+def enviar_tarefa(tipo):
+    """
+    Enfileira uma tarefa e responde 202 com a URL de acompanhamento
+
+    Tipos:
+        excel:     exportacao=pei|pedi|guide|alunos_ativos|alunos_inativos
+        pdf_guide: id_aluno=<id> (Master e Pleno)
+        pdfs_lote: tipo=pei|pedi|guide (Master e Pleno)
+    """
+    dados = request.get_json(silent=True) or request.form
+    if tipo == 'excel':
+        if dados.get('exportacao') not in EXPORTACOES_EXCEL:
+            return jsonify({'erro': True, 'mensagem': 'exportacao inválida'}), 400
+        parametros = {'exportacao': dados['exportacao']}
+    elif tipo in ('pdf_guide', 'pdfs_lote'):
+        if session.get('tipo_acesso') not in ('Master', 'Pleno'):
+            return jsonify({'erro': True, 'mensagem': 'Acesso não autorizado'}), 403
+        if tipo == 'pdfs_lote':
+            if dados.get('tipo') not in RELATORIOS_PDF:
+                return jsonify({'erro': True, 'mensagem': 'tipo de relatório inválido'}), 400
+            parametros = {'tipo': dados['tipo']}
+        else:
+            try:
+                parametros = {'id_aluno': int(dados.get('id_aluno'))}
+            except (TypeError, ValueError):
+                return jsonify({'erro': True, 'mensagem': 'id_aluno inválido'}), 400
+    else:
+        return jsonify({'erro': True, 'mensagem': f'Tipo de tarefa desconhecido: {tipo}'}), 404
+
+    id_tarefa = fila_tarefas.enfileirar(tipo, parametros, usuario=session.get('email'))
+    resposta = jsonify(_tarefa_json(fila_tarefas.obter(id_tarefa)))
+    resposta.status_code = 202
+    resposta.headers['Location'] = url_for('status_tarefa', id_tarefa=id_tarefa)
+    return resposta
+
+
+@app.route('/tarefas/<id_tarefa>', methods=['GET'])
+@acesso_requerido('Master', 'Pleno', 'Junior')
+def status_tarefa(id_tarefa):
+    """Status da tarefa: JSON para clientes de API, página com atualização automática no navegador"""
+    tarefa = _tarefa_do_usuario(id_tarefa)
+    quer_json = request.args.get('formato') == 'json' or \
+        request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+    if tarefa is None:
+        if quer_json:
+            return jsonify({'erro': True, 'mensagem': 'Tarefa não encontrada'}), 404
+        flash('Tarefa não encontrada ou expirada.', 'danger')
+        return redirect(url_for('home'))
+
+    if quer_json:
+        return jsonify(_tarefa_json(tarefa))
+    return render_template('tarefa_status.html', tarefa=_tarefa_json(tarefa))
+
+
+@app.route('/tarefas/<id_tarefa>/download', methods=['GET'])
+@acesso_requerido('Master', 'Pleno', 'Junior')
+def download_tarefa(id_tarefa):
+    tarefa = _tarefa_do_usuario(id_tarefa)
+    if tarefa is None or tarefa['status'] != CONCLUIDA or not tarefa['artefato']:
+        return "Arquivo não disponível.", 404
+    if not os.path.exists(tarefa['artefato']):
+        return "Arquivo expirado.", 410
+    return send_file(tarefa['artefato'], mimetype=tarefa['mimetype'], as_attachment=True,
+                     download_name=tarefa['nome_download'])
+
+
+@app.route('/tarefas_status')
+@acesso_requerido('Master')
+def tarefas_status():
+    """Quantidade de tarefas por status na fila"""
+    return jsonify(fila_tarefas.metricas())
+
+
+@app.cli.command('tarefas-worker')
+@click.option('--processos', default=None, type=int, help='Processos filhos (padrão: JOBS_WORKERS)')
+@click.option('--intervalo', default=1.0, type=float, help='Segundos entre consultas à fila')
+def tarefas_worker(processos, intervalo):
+    """Executa as tarefas em segundo plano (PDFs e planilhas grandes)"""
+    processos = processos or app.config['JOBS_WORKERS']
+    print(f"Worker de tarefas: {processos} processo(s), fila em {fila_tarefas.caminho_banco}")
+    fila_tarefas.executar_trabalhador(processos=processos, intervalo=intervalo)
+
+
+@app.cli.command('importar-respostas')
+@click.argument('tipo', type=click.Choice(sorted(questionarios.QUESTIONARIOS)))
+@click.argument('arquivo', type=click.File('rb'))
+@click.option('--lote', default=None, type=int, help='Linhas por transação (padrão: INGESTAO_BATCH_SIZE)')
+def importar_respostas_cli(tipo, arquivo, lote):
+    """Importa respostas PEI/PEDI/GUIDE de um arquivo NDJSON (.gz aceito; - = stdin)"""
+    if lote:
+        app.config['INGESTAO_BATCH_SIZE'] = lote
+    linhas = gzip.GzipFile(fileobj=arquivo) if arquivo.name.endswith('.gz') else arquivo
+    relatorio = importar_respostas(tipo, linhas).como_dict()
+    print(f"Importação {tipo.upper()}: {relatorio['gravadas']}/{relatorio['linhas']} linha(s) gravada(s) "
+          f"em {relatorio['segundos']:.2f}s, {relatorio['com_erro']} com erro")
+    print(f"{relatorio['linhas_por_segundo'] or 0} linha(s)/s em {relatorio['lotes']} transação(ões)")
+    for erro in relatorio['erros']:
+        print(f"  - linha {erro['linha']}: {'; '.join(erro['erros'])}")
+    if relatorio['erros_omitidos']:
+        print(f"  ... e mais {relatorio['erros_omitidos']} linha(s) com erro")
+
+
+@app.cli.command('importar-alunos')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--simular', is_flag=True, help='Só valida e lista conflitos, sem gravar')
+@click.option('--encoding', default='utf-8-sig', help='Codificação do CSV (ex.: cp1252)')
+def importar_alunos_cli(arquivo, simular, encoding):
+    """Cadastra alunos a partir de uma planilha .xlsx ou .csv"""
+    with open(arquivo, 'rb') as f:
+        relatorio = importar_planilha_alunos(f, arquivo, simular, encoding).como_dict()
+    acao = 'seriam cadastrados' if simular else 'cadastrado(s)'
+    print(f"{relatorio['linhas']} linha(s) lida(s), {relatorio['inseridos']} aluno(s) {acao} "
+          f"em {relatorio['segundos']:.2f}s")
+    for conflito in relatorio['conflitos']:
+        print(f"  - linha {conflito['linha']}: CPF {conflito['cpf']}: {conflito['motivo']}")
+    for erro in relatorio['erros']:
+        print(f"  - linha {erro['linha']}: {'; '.join(erro['erros'])}")
+    omitidos = (relatorio['total_conflitos'] - len(relatorio['conflitos'])
+                + relatorio['total_erros'] - len(relatorio['erros']))
+    if omitidos:
+        print(f"  ... e mais {omitidos} linha(s) com problema")
+
+
+@app.cli.command('resumo-guide-reconstruir')
+def resumo_guide_reconstruir():
+    """Recalcula tbl_resumo_guide a partir das views vw_boletim_*"""
+    resumo_guide.garantir_tabela(mysql.connection)
+    gravadas, removidas = resumo_guide.reconstruir(mysql.connection)
+    versoes.incrementar('dashboard')
+    print(f"Resumo GUIDE: {gravadas} aluno(s) gravado(s), {removidas} removido(s)")
+
+
+@app.cli.command('contadores-alunos-reconciliar')
+def contadores_alunos_reconciliar():
+    """Recalcula tbl_contadores_alunos a partir de tbl_cad_alunos"""
+    contadores_alunos.garantir_tabela(mysql.connection)
+    divergencias = contadores_alunos.reconciliar(mysql.connection)
+    for status, anterior, correto in divergencias:
+        print(f"  {status or '(sem status)'}: {anterior} -> {correto}")
+    print(f"Contadores de alunos: {len(divergencias)} divergência(s) corrigida(s)")
+
+
+@app.cli.command('cpf-alunos-preencher')
+def cpf_alunos_preencher():
+    """Preenche tbl_cad_alunos.cpf_normalizado e lista CPFs duplicados"""
+    cpf_alunos.garantir_coluna(mysql.connection)
+    preenchidos, duplicados = cpf_alunos.preencher(mysql.connection)
+    versoes.incrementar('alunos')
+    print(f"CPF normalizado: {preenchidos} aluno(s) preenchido(s)")
+    if duplicados:
+        print(f"{len(duplicados)} aluno(s) com CPF já usado por outro cadastro (corrija manualmente):")
+        for id_aluno, cpf in duplicados:
+            print(f"  - id_aluno {id_aluno}: {cpf}")
+
+
+@app.cli.command('anexos-migrar')
+@click.option('--lote', type=int, default=20, show_default=True, help='Relatórios lidos por transação')
+def anexos_migrar(lote):
+    """Move os anexos de tbl_rel_ava_anterior.anexo_doc (BLOB) para ANEXOS_DIR"""
+    anexos.garantir_esquema(mysql.connection)
+    migrados, movidos, repetidos = anexos.migrar(mysql.connection, armazem_anexos, lote)
+    print(f"Anexos: {migrados} relatório(s) migrado(s), {movidos / (1024 * 1024):.1f}MB movidos, "
+          f"{repetidos} conteúdo(s) já existente(s) no disco")
+    if migrados:
+        print("Para devolver o espaço ao disco do MySQL: OPTIMIZE TABLE tbl_rel_ava_anterior;")
+
+
+@app.cli.command('anexos-limpar')
+def anexos_limpar():
+    """Apaga de ANEXOS_DIR os arquivos que nenhum relatório referencia e os uploads em blocos parados"""
+    anexos.garantir_esquema(mysql.connection)
+    removidos = anexos.limpar(mysql.connection, armazem_anexos)
+    expirados = area_uploads.limpar_expirados()
+    print(f"Anexos: {removidos} arquivo(s) sem relatório apagado(s), {expirados} upload(s) em blocos expirado(s)")
+
+
+@app.cli.command('suporte-evidencias-migrar')
+def suporte_evidencias_migrar():
+    """Move as evidências dos chamados de app/static/uploads para SUPORTE_EVIDENCIA_DIR"""
+    listagem_chamados.garantir_esquema(mysql.connection)
+    evidencias_suporte.garantir_tabela(mysql.connection)
+    migrados, ausentes = evidencias_suporte.migrar(mysql.connection, armazem_evidencias,
+                                                   os.path.join(_DIR_APP, 'static', 'uploads'))
+    print(f"Evidências: {migrados} chamado(s) migrado(s), {len(ausentes)} arquivo(s) não encontrado(s)")
+    for nome in ausentes:
+        print(f"  - {nome}")
+
+
+@app.cli.command('suporte-evidencias-limpar')
+def suporte_evidencias_limpar():
+    """Recalcula os contadores e apaga de SUPORTE_EVIDENCIA_DIR as evidências sem chamado"""
+    listagem_chamados.garantir_esquema(mysql.connection)
+    evidencias_suporte.garantir_tabela(mysql.connection)
+    corrigidos = evidencias_suporte.reconciliar(mysql.connection)
+    removidos = evidencias_suporte.limpar(mysql.connection, armazem_evidencias)
+    print(f"Evidências: {corrigidos} contador(es) corrigido(s), {removidos} arquivo(s) sem chamado apagado(s)")
+
+
 @app.template_filter('grade_class')
 def grade_class_filter(nota):
     """Filtro Jinja para aplicar classes de estilo conforme a nota"""
@@ -2065,91 +2407,33 @@ def grade_class_filter(nota):
     else:
         return 'grade-needs-improvement'
 
+def calcular_dados_dashboard():
+    """Monta o payload do dashboard a partir de tbl_resumo_guide"""
+    # === RESUMO POR ALUNO (tbl_resumo_guide, mantida por quest_guide) ===
+    resumo_guide.garantir_tabela(mysql.connection)
+    linhas = resumo_guide.carregar(mysql.connection)
+
+    # === Médias, distribuições e classes de nota (NumPy, uma passada) ===
+    return estatisticas_guide.calcular(linhas)
+
+
 @app.route('/dashboard')
 @acesso_requerido('Master', 'Pleno')
 def dashboard():
-    """Rota para exibir o dashboard com dados dos alunos"""
-    cursor = None
+    """
+    Rota para exibir o dashboard com dados dos alunos
+
+    O payload fica em cache por DASHBOARD_CACHE_TTL segundos em cada worker e
+    é descartado quando quest_guide grava respostas (versão 'dashboard').
+    Master pode forçar o recálculo em todos os workers com ?atualizar=1.
+    """
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        
-        
-        # === BUSCAR DADOS DAS VIEWS ===
-        cursor.execute("SELECT id_aluno, nome_aluno, ROUND(COALESCE(media_autocuidado,0),1) as media_autocuidado FROM u799109175_db_funcae.vw_boletim_autocuidado;")
-        dados_autocuidado = {r['id_aluno']: (r['nome_aluno'], float(r['media_autocuidado'] or 0.0)) for r in cursor.fetchall()}
-        
-        cursor.execute("SELECT id_aluno, nome_aluno, ROUND(COALESCE(media_linguagem,0),1) as media_linguagem FROM u799109175_db_funcae.vw_boletim_linguagem;")
-        dados_linguagem = {r['id_aluno']: (r['nome_aluno'], float(r['media_linguagem'] or 0.0)) for r in cursor.fetchall()}
-        
-        cursor.execute("SELECT id_aluno, nome_aluno, ROUND(COALESCE(media_socializacao,0),1) as media_socializacao FROM u799109175_db_funcae.vw_boletim_socializacao;")
-        dados_socializacao = {r['id_aluno']: (r['nome_aluno'], float(r['media_socializacao'] or 0.0)) for r in cursor.fetchall()}
-        
-        cursor.execute("SELECT id_aluno, nome_aluno, ROUND(COALESCE(media_motrocidade,0),1) as media_motrocidade FROM u799109175_db_funcae.vw_boletim_motrocidade;")
-        dados_motrocidade = {r['id_aluno']: (r['nome_aluno'], float(r['media_motrocidade'] or 0.0)) for r in cursor.fetchall()}
-        
-        cursor.execute("SELECT id_aluno, nome_aluno, ROUND(COALESCE(media_motrocidade_global,0),1) as media_motrocidade_global FROM u799109175_db_funcae.vw_boletim_motrocidade_global;")
-        dados_motrocidade_global = {r['id_aluno']: (r['nome_aluno'], float(r['media_motrocidade_global'] or 0.0)) for r in cursor.fetchall()}
-    
-        # === Montagem dos alunos ===
-        alunos = []
-        todas_notas = {
-            'autocuidado': [],
-            'linguagem': [],
-            'socializacao': [],
-            'motrocidade': [],
-            'motrocidade_global': []
-        }
-        
-        all_ids = set(dados_autocuidado.keys()) \
-                | set(dados_linguagem.keys()) \
-                | set(dados_socializacao.keys()) \
-                | set(dados_motrocidade.keys()) \
-                | set(dados_motrocidade_global.keys())
-        
-        for aluno_id in all_ids:
-            nome_aluno = next(
-                (d[aluno_id][0] for d in [
-                    dados_autocuidado, dados_linguagem, dados_socializacao,
-                    dados_motrocidade, dados_motrocidade_global
-                ] if aluno_id in d),
-                "Aluno não identificado"
-            )
-            
-            # CORREÇÃO: Usar os nomes corretos das variáveis
-            auto = dados_autocuidado.get(aluno_id, (None, 0.0))[1]
-            ling = dados_linguagem.get(aluno_id, (None, 0.0))[1]
-            soc = dados_socializacao.get(aluno_id, (None, 0.0))[1]
-            motr = dados_motrocidade.get(aluno_id, (None, 0.0))[1]
-            motr_g = dados_motrocidade_global.get(aluno_id, (None, 0.0))[1]
-            
-            notas_validas = [n for n in [auto, ling, soc, motr, motr_g] if n > 0]
-            media_geral = round(sum(notas_validas) / len(notas_validas), 1) if notas_validas else 0.0
-            
-            alunos.append({
-                "id": aluno_id,
-                "nome": nome_aluno,
-                "autocuidado": auto,          # CORRIGIDO
-                "linguagem": ling,            # CORRIGIDO
-                "socializacao": soc,          # CORRIGIDO
-                "motrocidade": motr,          # CORRIGIDO
-                "motrocidade_global": motr_g, # CORRIGIDO
-                "media_geral": media_geral
-            })
-            
-            todas_notas['autocuidado'].append(auto)
-            todas_notas['linguagem'].append(ling)
-            todas_notas['socializacao'].append(soc)
-            todas_notas['motrocidade'].append(motr)
-            todas_notas['motrocidade_global'].append(motr_g)
-        
-        # === Cálculo das médias gerais ===
-        medias = {k: round(sum(v) / len(v), 1) if v else 0.0 for k, v in todas_notas.items()}
-        
-        data = {
-            "medias": medias,
-            "total_alunos": len(alunos),
-            "alunos": sorted(alunos, key=lambda x: x['nome'])
-        }
+        forcar = request.args.get('atualizar') == '1' and session.get('tipo_acesso') == 'Master'
+        if forcar:
+            versoes.incrementar('dashboard')
+        data = cache_dashboard.obter_ou_calcular(
+            'dashboard', versoes.atual('dashboard'), calcular_dados_dashboard, forcar=forcar
+        )
         
         print("Resumo enviado ao template -> total_alunos:", data['total_alunos'], "medias:", data['medias'])
         
@@ -2168,10 +2452,13 @@ def dashboard():
         }
         
         return render_template("dashboard.html", data={"medias": medias_vazias, "alunos": [], "total_alunos": 0})
-        
-    finally:
-        if cursor:
-            cursor.close()
+
+
+@app.route('/dashboard_cache_status')
+@acesso_requerido('Master')
+def dashboard_cache_status():
+    """Acertos/falhas do cache do dashboard neste worker"""
+    return jsonify({'pid': os.getpid(), 'cache': cache_dashboard.metricas()})
 
 
 # ADICIONE esta função de filtro personalizado ANTES das rotas
@@ -2193,7 +2480,15 @@ def grade_class(grade):
 
 @app.route('/suport', methods=['GET', 'POST'])
 @acesso_requerido('Master', 'Pleno', 'Junior')
+@recebe_uploads(armazem_evidencias.receptor)
 def suport():
+    """
+    Abertura de chamados e listagem paginada (?apos=/?antes=) e filtrável
+    (?tipo=&data_de=&data_ate=&usuario=); com ?formato=json devolve só a página.
+    """
+    # DDL antes da transação do INSERT (ALTER TABLE faz commit implícito)
+    chave = listagem_chamados.garantir_esquema(mysql.connection)
+    evidencias_suporte.garantir_tabela(mysql.connection)
     cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
     try:
         if request.method == 'POST':
@@ -2204,52 +2499,102 @@ def suport():
 
             # Captura do arquivo
             evidencia_file = request.files.get('evidencia')
-            evidencia_nome = None
-
-            if evidencia_file and evidencia_file.filename != '':
-                # Salvar o arquivo em uma pasta local
-                from werkzeug.utils import secure_filename
-                import os
+            evidencia = None
 
-                upload_folder = os.path.join(app.root_path, 'static', 'uploads')
-                os.makedirs(upload_folder, exist_ok=True)
+            evidencia_recusada = False
 
-                evidencia_nome = secure_filename(evidencia_file.filename)
-                evidencia_file.save(os.path.join(upload_folder, evidencia_nome))
+            if evidencia_file and evidencia_file.filename != '':
+                # Já gravado no armazém durante o upload: só renomeia para o hash (ou descarta se repetido)
+                try:
+                    recebido = uploads.receber(evidencia_file.stream, armazem_evidencias.diretorio,
+                                               armazem_evidencias.tamanho_max, armazem_evidencias.assinaturas)
+                    sha256, tamanho, _ = armazem_evidencias.adotar(recebido)
+                    evidencia = (secure_filename(evidencia_file.filename) or 'evidencia', sha256, tamanho,
+                                 recebido.tipo or 'application/octet-stream')
+                except TipoNaoPermitido:
+                    evidencia_recusada = True
+                    flash('⚠️ Tipo de arquivo não permitido. Envie uma imagem ou PDF.', 'danger')
+                except UploadRecusado as e:
+                    evidencia_recusada = True
+                    flash(f'⚠️ {e}', 'danger')
 
             # Validação mínima
             if not all([tipo, data_registro, nome_usuario, descricao]):
                 flash('⚠️ Por favor, preencha todos os campos obrigatórios.', 'danger')
-            else:
+            elif not evidencia_recusada:
+                evidencia_nome, sha256, tamanho, tipo_evidencia = evidencia or (None, None, None, None)
                 try:
                     cursor.execute("""
-                        INSERT INTO u799109175_db_funcae.tbl_chamados_suport
-                        (tipo, data_registro, nome_usuario, evidencia, descricao)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (tipo, data_registro, nome_usuario, evidencia_nome, descricao))
+                        INSERT INTO tbl_chamados_suport
+                        (tipo, data_registro, nome_usuario, evidencia, evidencia_sha256, descricao)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, (tipo, data_registro, nome_usuario, evidencia_nome, sha256, descricao))
+                    if sha256:
+                        evidencias_suporte.registrar(cursor, sha256, tamanho, tipo_evidencia)
                     mysql.connection.commit()
                     flash('✅ Ocorrência registrada com sucesso.', 'success')
+                    # Post/Redirect/Get: recarregar a página não abre o chamado de novo
+                    return redirect(url_for('suport'))
                 except Exception as e:
                     mysql.connection.rollback()
                     print(f'❌ Erro ao inserir chamado: {e}')
                     flash('Erro ao salvar ocorrência. Tente novamente mais tarde.', 'danger')
 
-        # sempre carregar ocorrências para exibir na tela
+        filtros = listagem_chamados.filtros_da_requisicao(request.args)
+        por_pagina = listagem_chamados.por_pagina_da_requisicao(request.args)
         try:
-            cursor.execute("""
-                SELECT * 
-                FROM u799109175_db_funcae.tbl_chamados_suport
-                ORDER BY data_criacao DESC
-            """)
-            chamados = cursor.fetchall()
+            resultado = listagem_chamados.pagina(
+                cursor, chave, filtros,
+                apos=request.args.get('apos'), antes=request.args.get('antes'),
+                por_pagina=por_pagina
+            )
         except Exception as e:
             print(f'Erro ao carregar chamados: {e}')
-            chamados = []
+            resultado = {'chamados': [], 'proximo': None, 'anterior': None}
 
-        return render_template('suport.html', chamados=chamados)
+        if request.args.get('formato') == 'json':
+            return jsonify({
+                'chamados': [listagem_chamados.chamado_json(c) for c in resultado['chamados']],
+                'proximo': resultado['proximo'],
+                'anterior': resultado['anterior'],
+                'por_pagina': por_pagina,
+                'filtros': filtros,
+            })
 
+        return render_template(
+            'suport.html',
+            chamados=resultado['chamados'],
+            proximo=resultado['proximo'],
+            anterior=resultado['anterior'],
+            filtros=filtros,
+            por_pagina=por_pagina,
+            tipos=listagem_chamados.TIPOS,
+            evidencia_max_mb=app.config['SUPORTE_EVIDENCIA_MAX_MB']
+        )
+
+    finally:
+        cursor.close()
+
+
+@app.route('/suport/evidencias/<sha256>')
+@acesso_requerido('Master', 'Pleno', 'Junior')
+def evidencia_suporte(sha256):
+    """Evidência de um chamado pelo hash (?nome= é o nome sugerido no download)"""
+    if not re.fullmatch(r'[0-9a-f]{64}', sha256):
+        abort(404)
+    evidencias_suporte.garantir_tabela(mysql.connection)
+    cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        mimetype = evidencias_suporte.tipo(cursor, sha256)
     finally:
         cursor.close()
+    caminho = armazem_evidencias.caminho(sha256)
+    if mimetype is None or not os.path.exists(caminho):
+        abort(404)
+    # O conteúdo de um hash nunca muda: cache longo e 304 para If-None-Match
+    return send_file(caminho, mimetype=mimetype,
+                     download_name=secure_filename(request.args.get('nome', '')) or sha256,
+                     etag=sha256, conditional=True, max_age=365 * 24 * 3600)
     
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
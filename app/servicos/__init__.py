@@ -0,0 +1,3 @@
+"""
+Serviços de infraestrutura do NeuroEduca (banco, cache, exportações, relatórios)
+"""
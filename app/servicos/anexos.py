@@ -0,0 +1,251 @@
+"""
+Armazenamento dos anexos das avaliações em disco, endereçado por conteúdo
+
+Os PDFs enviados em relatorio_avaliacao ficavam inteiros em
+tbl_rel_ava_anterior.anexo_doc (BLOB), inflando a tabela, o buffer pool e os
+backups. Aqui cada arquivo é gravado uma única vez em
+<diretorio>/<aa>/<bb>/<sha256>, onde aa e bb são os primeiros caracteres do
+hash; a tabela guarda só os metadados (tem_anexo, anexo_sha256,
+anexo_tamanho, anexo_nome, anexo_tipo), que a listagem lê sem tocar no BLOB.
+Envios repetidos do mesmo arquivo apontam para o mesmo conteúdo.
+
+O upload chega em blocos num temporário dentro do próprio diretório, com o
+hash calculado no caminho (servicos.uploads), e depois é renomeado de forma
+atômica; nada fica inteiro em memória. Os BLOBs já existentes são movidos com:
+    flask --app app/app.py anexos-migrar
+"""
+
+import io
+import os
+import re
+import time
+
+from servicos.esquema import garantir_colunas, garantir_indices
+from servicos.uploads import ArquivoRecebido, receber
+
+# Um arquivo recém-gravado ou reaproveitado não é removido antes disso, para não
+# apagá-lo entre o upload e o INSERT de quem acabou de referenciá-lo
+CARENCIA_REMOCAO = 3600
+
+COLUNAS = (
+    ('tem_anexo', 'TINYINT(1) NOT NULL DEFAULT 0'),
+    ('anexo_sha256', 'CHAR(64) NULL'),
+    ('anexo_tamanho', 'BIGINT NULL'),
+    ('anexo_nome', 'VARCHAR(255) NULL'),
+    ('anexo_tipo', 'VARCHAR(100) NULL'),
+)
+INDICES = (('idx_rel_ava_anexo_sha256', 'anexo_sha256'),)
+
+_HASH_VALIDO = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ArmazemAnexos:
+    """
+    Args:
+        diretorio: raiz do armazenamento (criada se não existir)
+        tamanho_max: limite por arquivo em bytes (None = sem limite)
+        assinaturas: prefixos aceitos no conteúdo (ver servicos.uploads)
+    """
+
+    def __init__(self, diretorio, tamanho_max=None, assinaturas=None):
+        self.diretorio = diretorio
+        self.tamanho_max = tamanho_max
+        self.assinaturas = assinaturas
+
+    def caminho(self, sha256):
+        """Caminho do conteúdo com esse hash (ValueError se o hash for inválido)"""
+        if not _HASH_VALIDO.match(sha256 or ''):
+            raise ValueError(f"Hash de anexo inválido: {sha256!r}")
+        return os.path.join(self.diretorio, sha256[:2], sha256[2:4], sha256)
+
+    def receptor(self):
+        """Destino do multipart para request.fabrica_uploads (temporário dentro do armazém)"""
+        return ArquivoRecebido(self.diretorio, self.tamanho_max, self.assinaturas)
+
+    def adotar(self, recebido):
+        """
+        Move um ArquivoRecebido para o lugar do seu hash (ou o descarta se já existe)
+
+        Raises:
+            UploadRecusado: se o arquivo foi recusado na recepção
+
+        Returns:
+            (sha256, tamanho em bytes, novo): novo é False se o conteúdo já existia
+        """
+        recebido.concluir()
+        if recebido.erro is not None:
+            raise recebido.erro
+        caminho = self.caminho(recebido.sha256)
+        novo = not os.path.exists(caminho)
+        if novo:
+            recebido.mover_para(caminho)
+        else:
+            os.utime(caminho)  # reaproveitado: renova a carência de remoção
+            recebido.descartar()
+        return recebido.sha256, recebido.tamanho, novo
+
+    def adotar_caminho(self, caminho_temporario, sha256):
+        """
+        adotar() para um arquivo já fechado e com hash calculado (uploads em blocos)
+
+        Returns:
+            True se o conteúdo é novo no armazém
+        """
+        caminho = self.caminho(sha256)
+        if os.path.exists(caminho):
+            os.utime(caminho)
+            os.unlink(caminho_temporario)
+            return False
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        os.replace(caminho_temporario, caminho)
+        os.utime(caminho)
+        return True
+
+    def guardar(self, origem, limitar=True):
+        """
+        Grava o conteúdo de um arquivo aberto (lido em blocos)
+
+        Args:
+            limitar: aplica tamanho_max e assinaturas (a migração dos BLOBs não aplica)
+
+        Raises:
+            UploadRecusado: acima do limite ou tipo não aceito (nada é gravado)
+        """
+        if limitar:
+            recebido = receber(origem, self.diretorio, self.tamanho_max, self.assinaturas)
+        else:
+            recebido = receber(origem, self.diretorio)
+        return self.adotar(recebido)
+
+    def guardar_bytes(self, conteudo):
+        """guardar() para conteúdo já em memória (migração dos BLOBs, sem limite)"""
+        return self.guardar(io.BytesIO(bytes(conteudo)), limitar=False)
+
+    def remover(self, sha256, carencia=CARENCIA_REMOCAO):
+        """
+        Apaga o conteúdo se não foi gravado/reaproveitado nos últimos `carencia` s
+
+        Quem chama deve ter conferido que nenhuma linha referencia mais o hash.
+
+        Returns:
+            True se o arquivo foi apagado
+        """
+        caminho = self.caminho(sha256)
+        try:
+            if time.time() - os.path.getmtime(caminho) < carencia:
+                return False
+            os.unlink(caminho)
+            return True
+        except OSError:
+            return False
+
+    def hashes(self):
+        """Gera os hashes de todos os arquivos guardados"""
+        for _, _, arquivos in os.walk(self.diretorio):
+            for nome in arquivos:
+                if _HASH_VALIDO.match(nome):
+                    yield nome
+
+
+def garantir_esquema(conexao):
+    """Colunas de metadados (e índice do hash) em tbl_rel_ava_anterior"""
+    criadas = garantir_colunas(conexao, 'tbl_rel_ava_anterior', COLUNAS)
+    garantir_indices(conexao, 'tbl_rel_ava_anterior', INDICES)
+    if 'tem_anexo' in criadas:
+        # Relatórios anteriores às colunas: marca os que têm BLOB e guarda o tamanho
+        cursor = conexao.cursor()
+        try:
+            cursor.execute("""
+                UPDATE tbl_rel_ava_anterior
+                SET tem_anexo = 1, anexo_tamanho = COALESCE(anexo_tamanho, LENGTH(anexo_doc))
+                WHERE anexo_doc IS NOT NULL OR anexo_sha256 IS NOT NULL
+            """)
+            conexao.commit()
+        finally:
+            cursor.close()
+
+
+def referenciado(cursor, sha256):
+    """True se algum relatório ainda aponta para esse conteúdo"""
+    cursor.execute("SELECT 1 FROM tbl_rel_ava_anterior WHERE anexo_sha256 = %s LIMIT 1", (sha256,))
+    return cursor.fetchone() is not None
+
+
+def vincular(cursor, id_relatorio, sha256, tamanho, nome, tipo='application/pdf'):
+    """
+    Troca o anexo de um relatório existente (na transação do cursor)
+
+    Returns:
+        (aluno_id, hash do anexo anterior ou None), ou None se o relatório não existe
+    """
+    cursor.execute("""
+        SELECT aluno_id, anexo_sha256 FROM tbl_rel_ava_anterior WHERE id_relatorio = %s FOR UPDATE
+    """, (id_relatorio,))
+    linha = cursor.fetchone()
+    if linha is None:
+        return None
+    cursor.execute("""
+        UPDATE tbl_rel_ava_anterior
+        SET tem_anexo = 1, anexo_sha256 = %s, anexo_tamanho = %s, anexo_nome = %s, anexo_tipo = %s,
+            anexo_doc = NULL
+        WHERE id_relatorio = %s
+    """, (sha256, tamanho, nome, tipo, id_relatorio))
+    return linha['aluno_id'], linha['anexo_sha256']
+
+
+def migrar(conexao, armazem, lote=20):
+    """
+    Move os BLOBs de anexo_doc para o armazenamento e zera a coluna
+
+    Lê `lote` relatórios por vez (os BLOBs podem ter até 10MB cada) e
+    confirma cada lote, então pode ser interrompida e retomada.
+
+    Returns:
+        (relatórios migrados, bytes movidos, conteúdos que já existiam no disco)
+    """
+    migrados = movidos = repetidos = 0
+    while True:
+        cursor = conexao.cursor()
+        try:
+            cursor.execute("""
+                SELECT id_relatorio, anexo_doc FROM tbl_rel_ava_anterior
+                WHERE anexo_doc IS NOT NULL AND anexo_sha256 IS NULL
+                ORDER BY id_relatorio
+                LIMIT %s
+            """, (lote,))
+            linhas = cursor.fetchall()
+            if not linhas:
+                break
+            for linha in linhas:
+                sha256, tamanho, novo = armazem.guardar_bytes(linha['anexo_doc'])
+                repetidos += not novo
+                cursor.execute("""
+                    UPDATE tbl_rel_ava_anterior
+                    SET anexo_sha256 = %s, anexo_tamanho = %s, anexo_tipo = %s, anexo_doc = NULL
+                    WHERE id_relatorio = %s
+                """, (sha256, tamanho, 'application/pdf', linha['id_relatorio']))
+                migrados += 1
+                movidos += tamanho
+            conexao.commit()
+        except Exception:
+            conexao.rollback()
+            raise
+        finally:
+            cursor.close()
+    return migrados, movidos, repetidos
+
+
+def limpar(conexao, armazem, carencia=CARENCIA_REMOCAO):
+    """
+    Apaga do disco os conteúdos que nenhum relatório referencia
+
+    Returns:
+        quantidade de arquivos apagados
+    """
+    cursor = conexao.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT anexo_sha256 FROM tbl_rel_ava_anterior WHERE anexo_sha256 IS NOT NULL")
+        em_uso = {linha['anexo_sha256'] for linha in cursor.fetchall()}
+    finally:
+        cursor.close()
+    return sum(armazem.remover(sha256, carencia) for sha256 in set(armazem.hashes()) - em_uso)
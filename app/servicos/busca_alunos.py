@@ -0,0 +1,446 @@
+"""
+Índice em memória para a busca de alunos por nome, matrícula ou CPF
+
+Cada worker mantém um índice de prefixos: uma lista ordenada de
+(chave, nome, id_aluno) com cada palavra do nome sem acentos/maiúsculas, a
+matrícula e o CPF normalizado, mais uma cópia só com os alunos ativos (o
+filtro padrão não descarta nada durante a busca).
+
+Um termo só é localizado com bisect e a faixa é percorrida até juntar
+`limite` alunos, em ordem da palavra encontrada e, dentro dela, do nome.
+
+Com vários termos, cada aluno tem uma posição (um bit), atribuída em ordem
+de nome na carga, e cada prefixo largo (LARGURA_MASCARA alunos ou mais, ex.:
+'a', 'ma', 'silva') tem a máscara dos alunos com alguma chave começando por
+ele. Os termos largos viram um AND de inteiros (microssegundos mesmo com
+100 mil alunos); os estreitos, a interseção dos seus conjuntos de ids, no
+máximo LARGURA_MASCARA cada, conferida contra a máscara. Sem termo estreito,
+os primeiros bits da máscara já são os primeiros nomes. O trabalho por busca
+tem teto e não depende de quão comuns os termos são (p95 abaixo de 0,5 ms
+com 100 mil cadastros, ver benchmarks/bench_busca_alunos.py). Os resultados
+saem em ordem de nome.
+
+O índice é carregado numa thread (ver sincronizar_em_segundo_plano()) e
+depois atualizado de forma incremental: quando a versão compartilhada
+'alunos' muda (ver servicos.versoes), só as linhas com atualizado_em recente
+são relidas do banco. Enquanto isso as buscas usam o índice atual; antes da
+primeira carga respondem vazio, marcadas como carregando.
+"""
+
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from itertools import accumulate
+
+from servicos import cpf_alunos
+from servicos.esquema import garantir_colunas, garantir_indices
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+# Releitura sobreposta: pega gravações cuja transação começou antes da última sincronização
+MARGEM_SINCRONIA = 60
+# Sem mudança de versão (ex.: diretório de versões indisponível), ressincroniza mesmo assim
+INTERVALO_MAXIMO = 60
+# Depois de uma sincronização que falhou, as buscas não disparam outra antes disso
+ESPERA_APOS_FALHA = 10
+# Prefixo com ao menos isso de alunos ganha máscara; abaixo, o conjunto de ids basta
+LARGURA_MASCARA = 1000
+# Alunos novos/renomeados fora da ordem de nome das posições antes de renumerar tudo
+REORDENAR_APOS = 2000
+
+COLUNAS = (
+    ('atualizado_em', "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"),
+)
+INDICES = (('idx_cad_alunos_atualizado_em', 'atualizado_em'),)
+
+CONSULTA = """
+    SELECT id_aluno, nome_aluno, matricula_aluno, cpf_normalizado, status_aluno
+    FROM tbl_cad_alunos
+"""
+
+_NAO_ZERO = re.compile(rb'[^\x00]')
+
+
+def normalizar(texto):
+    """Minúsculas sem acentos (ex.: 'JOÃO' -> 'joao')"""
+    decomposto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def _ativo(status):
+    return (status or '').strip().upper() == 'ATIVO'
+
+
+def _registro(linha):
+    """(nome, matrícula, status, chaves, nome normalizado) de uma linha do banco"""
+    nome_normalizado = normalizar(linha['nome_aluno'])
+    chaves = set(nome_normalizado.split())
+    if linha.get('matricula_aluno') is not None:
+        chaves.add(normalizar(linha['matricula_aluno']))
+    if linha.get('cpf_normalizado'):
+        chaves.add(linha['cpf_normalizado'])
+    return (
+        linha['nome_aluno'], linha.get('matricula_aluno'), linha.get('status_aluno'),
+        tuple(sorted(chaves)), nome_normalizado,
+    )
+
+
+def _marcar(bits, posicoes):
+    for posicao in posicoes:
+        bits[posicao >> 3] |= 1 << (posicao & 7)
+
+
+def _posicoes(mascara, limite=None):
+    """Posições dos bits ligados de `mascara`, em ordem (só as `limite` primeiras)"""
+    dados = mascara.to_bytes((mascara.bit_length() + 7) // 8, 'little')
+    posicoes = []
+    for achado in _NAO_ZERO.finditer(dados):
+        base, byte = achado.start() * 8, dados[achado.start()]
+        while byte:
+            bit = byte & -byte
+            posicoes.append(base + bit.bit_length() - 1)
+            byte ^= bit
+        if limite is not None and len(posicoes) >= limite:
+            return posicoes[:limite]
+    return posicoes
+
+
+def _mascaras(chaves, ids, posicoes, tamanho):
+    """
+    Máscara de cada prefixo largo das `chaves` (ordenadas)
+
+    Desce só pelos prefixos largos; cada id é marcado uma vez por chave, no
+    prefixo largo mais longo que a contém, e os mais curtos juntam as máscaras
+    dos filhos com OR. Um prefixo com um único filho largo e nada mais (ex.:
+    'silv' -> 'silva') reaproveita a máscara do filho.
+    """
+    acumulado = [0, *accumulate(len(ids[chave]) for chave in chaves)]
+    mascaras = {}
+
+    def descer(prefixo, inicio, fim):
+        tamanho_prefixo = len(prefixo)
+        bits, filhos = None, []
+        i = inicio
+        while i < fim:
+            chave = chaves[i]
+            if len(chave) == tamanho_prefixo:
+                j = i + 1
+            else:
+                filho = chave[:tamanho_prefixo + 1]
+                j = bisect_left(chaves, filho + '\uffff', i, fim)
+                if acumulado[j] - acumulado[i] >= LARGURA_MASCARA:
+                    filhos.append(descer(filho, i, j))
+                    i = j
+                    continue
+            if bits is None:
+                bits = bytearray(tamanho)
+            for estreita in chaves[i:j]:
+                for id_aluno in ids[estreita]:
+                    posicao = posicoes[id_aluno]
+                    bits[posicao >> 3] |= 1 << (posicao & 7)
+            i = j
+        if bits is None and len(filhos) == 1:
+            mascara = filhos[0]
+        else:
+            mascara = int.from_bytes(bits, 'little') if bits is not None else 0
+            for mascara_filho in filhos:
+                mascara |= mascara_filho
+        if prefixo:
+            mascaras[prefixo] = mascara
+        return mascara
+
+    descer('', 0, len(chaves))
+    return mascaras
+
+
+class IndiceAlunos:
+    """Índice de prefixos dos alunos de tbl_cad_alunos (um por processo)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lock_sincronia = threading.Lock()
+        self._alunos = {}    # id_aluno -> _registro()
+        self._entradas = []  # [(chave, nome normalizado, id_aluno)] ordenada
+        self._entradas_ativas = []  # idem, só alunos ativos
+        self._chaves = []    # chaves distintas, ordenadas
+        self._ids = {}       # chave -> {id_aluno}
+        self._posicoes = {}  # id_aluno -> bit nas máscaras
+        self._por_posicao = []  # bit -> id_aluno
+        self._mascaras = {}  # prefixo largo -> máscara dos alunos com chave nele
+        self._mascara_ativos = 0
+        self._fora_de_ordem = 0  # bits de alunos novos/renomeados desde a carga
+        self._quantos_fora = 0
+        self._versao = None
+        self._marca = None   # NOW() do banco na última sincronização
+        self._sincronizado_em = 0.0
+        self._sincronia = None
+        self._falhou_em = None
+        self.sincronizacoes = 0
+
+    @property
+    def carregado(self):
+        return self._marca is not None
+
+    def desatualizado(self, versao):
+        return versao != self._versao or time.monotonic() - self._sincronizado_em >= INTERVALO_MAXIMO
+
+    # ---------- manutenção ----------
+
+    def _construir(self, alunos):
+        """Refaz todas as estruturas a partir de {id_aluno: _registro()}; posições em ordem de nome"""
+        ordem = sorted(alunos, key=lambda id_aluno: (alunos[id_aluno][4], id_aluno))
+        posicoes = {id_aluno: posicao for posicao, id_aluno in enumerate(ordem)}
+        tamanho = (len(ordem) + 7) // 8
+        entradas, entradas_ativas, ids = [], [], {}
+        ativos = bytearray(tamanho)
+        for id_aluno in ordem:
+            registro = alunos[id_aluno]
+            ativo = _ativo(registro[2])
+            if ativo:
+                _marcar(ativos, (posicoes[id_aluno],))
+            for chave in registro[3]:
+                entrada = (chave, registro[4], id_aluno)
+                entradas.append(entrada)
+                ids.setdefault(chave, set()).add(id_aluno)
+                if ativo:
+                    entradas_ativas.append(entrada)
+        entradas.sort()
+        entradas_ativas.sort()
+        chaves = sorted(ids)
+        mascaras = _mascaras(chaves, ids, posicoes, tamanho)
+        with self._lock:
+            self._alunos, self._entradas, self._entradas_ativas = alunos, entradas, entradas_ativas
+            self._chaves, self._ids = chaves, ids
+            self._posicoes, self._por_posicao = posicoes, ordem
+            self._mascaras, self._mascara_ativos = mascaras, int.from_bytes(ativos, 'little')
+            self._fora_de_ordem, self._quantos_fora = 0, 0
+
+    def _prefixos_largos(self, chaves):
+        prefixos = set()
+        for chave in chaves:
+            for tamanho in range(1, len(chave) + 1):
+                if chave[:tamanho] not in self._mascaras:
+                    break
+                prefixos.add(chave[:tamanho])
+        return prefixos
+
+    @staticmethod
+    def _retirar(entradas, entrada):
+        posicao = bisect_left(entradas, entrada)
+        if posicao < len(entradas) and entradas[posicao] == entrada:
+            del entradas[posicao]
+
+    def _remover(self, id_aluno):
+        atual = self._alunos.pop(id_aluno, None)
+        if atual is None:
+            return
+        sem_bit = ~(1 << self._posicoes[id_aluno])
+        self._mascara_ativos &= sem_bit
+        for prefixo in self._prefixos_largos(atual[3]):
+            self._mascaras[prefixo] &= sem_bit
+        ativo = _ativo(atual[2])
+        for chave in atual[3]:
+            entrada = (chave, atual[4], id_aluno)
+            self._retirar(self._entradas, entrada)
+            if ativo:
+                self._retirar(self._entradas_ativas, entrada)
+            self._ids[chave].discard(id_aluno)
+            if not self._ids[chave]:
+                del self._ids[chave]
+                self._retirar(self._chaves, chave)
+
+    def _gravar(self, linha):
+        id_aluno = linha['id_aluno']
+        registro = _registro(linha)
+        anterior = self._alunos.get(id_aluno)
+        self._remover(id_aluno)
+        if id_aluno not in self._posicoes:
+            self._posicoes[id_aluno] = len(self._por_posicao)
+            self._por_posicao.append(id_aluno)
+        bit = 1 << self._posicoes[id_aluno]
+        if (anterior is None or anterior[4] != registro[4]) and not self._fora_de_ordem & bit:
+            self._fora_de_ordem |= bit
+            self._quantos_fora += 1
+        self._alunos[id_aluno] = registro
+        ativo = _ativo(registro[2])
+        if ativo:
+            self._mascara_ativos |= bit
+        for prefixo in self._prefixos_largos(registro[3]):
+            self._mascaras[prefixo] |= bit
+        for chave in registro[3]:
+            entrada = (chave, registro[4], id_aluno)
+            insort(self._entradas, entrada)
+            if ativo:
+                insort(self._entradas_ativas, entrada)
+            if chave not in self._ids:
+                self._ids[chave] = set()
+                insort(self._chaves, chave)
+            self._ids[chave].add(id_aluno)
+
+    def sincronizar(self, conexao, versao):
+        """
+        Traz o índice para a versão `versao` de 'alunos'
+
+        A primeira chamada carrega todos os alunos; as seguintes releem só os
+        alterados desde a última sincronização (menos MARGEM_SINCRONIA). Bloqueia
+        durante a carga: nas requisições use sincronizar_em_segundo_plano().
+        """
+        if not self.desatualizado(versao):
+            return
+        with self._lock_sincronia:
+            if not self.desatualizado(versao):
+                return
+            cursor = conexao.cursor()
+            try:
+                cursor.execute("SELECT NOW() AS agora")
+                agora = cursor.fetchone()['agora']
+                if self._marca is None:
+                    cursor.execute(CONSULTA)
+                    self._construir({linha['id_aluno']: _registro(linha) for linha in cursor.fetchall()})
+                else:
+                    cursor.execute(
+                        CONSULTA + " WHERE atualizado_em >= %s - INTERVAL %s SECOND",
+                        (self._marca, MARGEM_SINCRONIA)
+                    )
+                    alteradas = cursor.fetchall()
+                    with self._lock:
+                        for linha in alteradas:
+                            self._gravar(linha)
+                    if self._quantos_fora > REORDENAR_APOS:
+                        self._construir(dict(self._alunos))
+            finally:
+                cursor.close()
+            self._marca = agora
+            self._versao = versao
+            self._sincronizado_em = time.monotonic()
+            self.sincronizacoes += 1
+
+    def sincronizar_em_segundo_plano(self, sincronizar):
+        """
+        Roda `sincronizar` numa thread, se nenhuma estiver rodando
+
+        Args:
+            sincronizar: função sem argumentos que chama sincronizar() (com a
+                         própria conexão e contexto da aplicação)
+        """
+        with self._lock:
+            if self._sincronia is not None and self._sincronia.is_alive():
+                return
+            if self._falhou_em is not None and time.monotonic() - self._falhou_em < ESPERA_APOS_FALHA:
+                return
+
+            def executar():
+                try:
+                    sincronizar()
+                    self._falhou_em = None
+                except Exception as e:
+                    self._falhou_em = time.monotonic()
+                    print(f"Aviso: falha ao sincronizar o índice de busca de alunos: {e}")
+
+            self._sincronia = threading.Thread(target=executar, name='sincronizar-busca-alunos', daemon=True)
+            self._sincronia.start()
+
+    # ---------- consulta ----------
+
+    def _percorrer(self, entradas, termo, limite):
+        """Um termo: percorre a faixa dele até juntar `limite` alunos"""
+        inicio = bisect_left(entradas, (termo,))
+        fim = bisect_left(entradas, (termo + '\uffff',))
+        vistos = set()
+        ids = []
+        for posicao in range(inicio, fim):
+            id_aluno = entradas[posicao][2]
+            if id_aluno in vistos:
+                continue
+            vistos.add(id_aluno)
+            ids.append(id_aluno)
+            if len(ids) >= limite:
+                break
+        return ids
+
+    def _combinar(self, termos, apenas_ativos, limite):
+        """
+        Vários termos: ids que casam com todos, em ordem de nome
+
+        Os termos largos viram um AND das máscaras; os estreitos, a interseção
+        dos seus ids (cada um com menos de LARGURA_MASCARA alunos), conferida
+        contra a máscara.
+        """
+        mascara = self._mascara_ativos if apenas_ativos else None
+        estreitos = []
+        for termo in termos:
+            largo = self._mascaras.get(termo)
+            if largo is not None:
+                mascara = largo if mascara is None else mascara & largo
+                continue
+            inicio = bisect_left(self._chaves, termo)
+            fim = bisect_left(self._chaves, termo + '\uffff')
+            conjuntos = [self._ids[chave] for chave in self._chaves[inicio:fim]]
+            estreitos.append(conjuntos[0] if len(conjuntos) == 1 else set().union(*conjuntos))
+        if mascara == 0 or any(not ids for ids in estreitos):
+            return []
+
+        if estreitos:
+            estreitos.sort(key=len)
+            candidatos = estreitos[0].intersection(*estreitos[1:])
+            if mascara is not None:
+                dados = mascara.to_bytes((len(self._por_posicao) + 7) // 8, 'little')
+                posicoes = self._posicoes
+                candidatos = [
+                    id_aluno for id_aluno in candidatos
+                    if dados[posicoes[id_aluno] >> 3] >> (posicoes[id_aluno] & 7) & 1
+                ]
+        else:
+            # Os bits em ordem de nome (menos os novos/renomeados, conferidos à parte)
+            extras = mascara & self._fora_de_ordem
+            posicoes = _posicoes(mascara ^ extras, limite)
+            if extras:
+                posicoes += _posicoes(extras)
+            candidatos = [self._por_posicao[posicao] for posicao in posicoes]
+        return heapq.nsmallest(limite, candidatos, key=lambda i: (self._alunos[i][4], i))
+
+    def buscar(self, consulta, limite=LIMITE_PADRAO, apenas_ativos=True):
+        """
+        Alunos cujo nome/matrícula/CPF começa com cada termo da consulta
+
+        Returns:
+            lista de dicts (id_aluno, nome_aluno, matricula_aluno, status_aluno)
+        """
+        termos = list(dict.fromkeys(normalizar(consulta).split()))
+        if not termos:
+            return []
+        with self._lock:
+            if len(termos) == 1:
+                entradas = self._entradas_ativas if apenas_ativos else self._entradas
+                ids = self._percorrer(entradas, termos[0], limite)
+            else:
+                ids = self._combinar(termos, apenas_ativos, limite)
+            resultado = []
+            for id_aluno in ids:
+                nome, matricula, status = self._alunos[id_aluno][:3]
+                resultado.append({
+                    'id_aluno': id_aluno, 'nome_aluno': nome,
+                    'matricula_aluno': matricula, 'status_aluno': status,
+                })
+        return resultado
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'alunos': len(self._alunos),
+                'chaves': len(self._entradas),
+                'chaves_ativas': len(self._entradas_ativas),
+                'mascaras': len(self._mascaras),
+                'fora_de_ordem': self._quantos_fora,
+                'sincronizacoes': self.sincronizacoes,
+            }
+
+
+def garantir_esquema(conexao):
+    """Coluna atualizado_em (com índice) e cpf_normalizado usadas pelo índice"""
+    cpf_alunos.garantir_coluna(conexao)
+    garantir_colunas(conexao, 'tbl_cad_alunos', COLUNAS)
+    garantir_indices(conexao, 'tbl_cad_alunos', INDICES)
@@ -0,0 +1,203 @@
+"""
+Cache em disco dos PDFs gerados (PEI, PEDI, GUIDE e avaliações)
+
+Cada PDF é guardado em <diretorio>/<rota>/<id_dono>/<chave>.pdf, onde a chave
+é um hash dos dados usados na renderização (linha da view) mais a versão do
+template. Se a linha muda, a chave muda; as gravações dos questionários ainda
+chamam invalidar() para apagar na hora as versões antigas do aluno.
+
+O diretório é compartilhado entre os workers do gunicorn. O tamanho total é
+limitado por uma política LRU baseada no mtime: cada acerto "toca" o arquivo
+e, quando uma gravação passa do limite, os arquivos mais antigos são removidos
+até sobrar uma folga (FRACAO_APOS_LIMPEZA).
+
+O total ocupado é mantido em memória (somado a cada gravação, descontado nas
+remoções); o diretório só é percorrido para medir de novo quando o total
+passa do limite ou fica velho (outros workers também gravam).
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Incrementar quando mudar o código de renderização (CSS fixo, opções do motor)
+VERSAO_RENDERIZACAO = '1'
+
+# Segundos até o total em memória ser medido de novo no disco
+VALIDADE_TOTAL = 300
+# Ao passar do limite, remove até sobrar esta fração dele (folga para as próximas gravações)
+FRACAO_APOS_LIMPEZA = 0.9
+
+
+class CachePDF:
+    """
+    Args:
+        diretorio: raiz do cache (criada se não existir)
+        tamanho_max: limite total em bytes antes de remover os menos usados
+        ativo: False desliga leitura e gravação (obter() sempre falha)
+    """
+
+    def __init__(self, diretorio, tamanho_max, ativo=True):
+        self.diretorio = diretorio
+        self.tamanho_max = tamanho_max
+        self.ativo = ativo
+        self._versoes_template = {}
+        self._lock = threading.Lock()
+        self._total = None  # bytes ocupados (None = medir no disco)
+        self._medido_em = 0.0
+
+    # ------------------------------------------------------------------ #
+    # Chaves
+    # ------------------------------------------------------------------ #
+
+    def versao_template(self, jinja_env, nome):
+        """Hash do código-fonte do template (calculado uma vez por processo)"""
+        versao = self._versoes_template.get(nome)
+        if versao is None:
+            fonte, _, _ = jinja_env.loader.get_source(jinja_env, nome)
+            versao = hashlib.sha1(fonte.encode('utf-8')).hexdigest()[:12]
+            self._versoes_template[nome] = versao
+        return versao
+
+    @staticmethod
+    def chave(rota, dados, versao_template):
+        """Impressão digital de rota + linha do banco + versão do template"""
+        h = hashlib.sha256()
+        h.update(f'{rota}|{versao_template}|{VERSAO_RENDERIZACAO}'.encode('utf-8'))
+        for campo in sorted(dados):
+            valor = dados[campo]
+            h.update(b'\x1f' + campo.encode('utf-8') + b'=')
+            if isinstance(valor, (bytes, bytearray)):
+                h.update(valor)
+            else:
+                h.update(repr(valor).encode('utf-8'))
+        return h.hexdigest()
+
+    # ------------------------------------------------------------------ #
+    # Leitura / gravação
+    # ------------------------------------------------------------------ #
+
+    def _pasta(self, rota, id_dono):
+        """Pasta do dono, ou None se o id não for numérico (nada é cacheado)"""
+        try:
+            return os.path.join(self.diretorio, rota, str(int(id_dono)))
+        except (TypeError, ValueError):
+            return None
+
+    def obter(self, rota, id_dono, chave):
+        """Caminho do PDF em cache (marcado como usado agora) ou None"""
+        pasta = self._pasta(rota, id_dono)
+        if not self.ativo or pasta is None:
+            return None
+        caminho = os.path.join(pasta, chave + '.pdf')
+        try:
+            os.utime(caminho)
+        except OSError:
+            return None
+        return caminho
+
+    def ler(self, rota, id_dono, chave):
+        """Bytes do PDF em cache, ou None (também se for removido entre obter e ler)"""
+        caminho = self.obter(rota, id_dono, chave)
+        if caminho is None:
+            return None
+        try:
+            with open(caminho, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def guardar(self, rota, id_dono, chave, conteudo):
+        """
+        Grava o PDF de forma atômica e aplica o limite de tamanho
+
+        Returns:
+            caminho gravado, ou None se o cache estiver desligado ou o disco falhar
+        """
+        pasta = self._pasta(rota, id_dono)
+        if not self.ativo or pasta is None:
+            return None
+        caminho = os.path.join(pasta, chave + '.pdf')
+        temporario = None
+        try:
+            os.makedirs(pasta, exist_ok=True)
+            fd, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(conteudo)
+            anterior = self._tamanho(caminho)
+            os.replace(temporario, caminho)
+        except OSError as e:
+            print(f"Aviso: falha ao gravar PDF no cache ({caminho}): {e}")
+            # Ex.: disco cheio no write(); o .tmp não seria removido pela LRU
+            if temporario is not None:
+                try:
+                    os.remove(temporario)
+                except OSError:
+                    pass
+            return None
+
+        self._somar(len(conteudo) - anterior)
+        self._aplicar_limite(manter=caminho)
+        return caminho
+
+    def invalidar(self, rota, id_dono):
+        """Remove todos os PDFs em cache de uma rota para um aluno/registro"""
+        pasta = self._pasta(rota, id_dono)
+        if pasta is not None:
+            removidos = sum(tamanho for _, tamanho, _ in self._listar(pasta))
+            shutil.rmtree(pasta, ignore_errors=True)
+            self._somar(-removidos)
+
+    # ------------------------------------------------------------------ #
+    # Política LRU
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _tamanho(caminho):
+        try:
+            return os.stat(caminho).st_size
+        except OSError:
+            return 0
+
+    def _somar(self, diferenca):
+        with self._lock:
+            if self._total is not None:
+                self._total = max(self._total + diferenca, 0)
+
+    def _listar(self, diretorio=None):
+        for raiz, _, arquivos in os.walk(diretorio or self.diretorio):
+            for nome in arquivos:
+                if not nome.endswith('.pdf'):
+                    continue
+                caminho = os.path.join(raiz, nome)
+                try:
+                    info = os.stat(caminho)
+                except OSError:
+                    continue
+                yield info.st_mtime, info.st_size, caminho
+
+    def _aplicar_limite(self, manter=None):
+        with self._lock:
+            if (self._total is not None and self._total <= self.tamanho_max
+                    and time.monotonic() - self._medido_em < VALIDADE_TOTAL):
+                return
+            entradas = list(self._listar())
+            total = sum(tamanho for _, tamanho, _ in entradas)
+            self._total, self._medido_em = total, time.monotonic()
+            if total <= self.tamanho_max:
+                return
+            alvo = self.tamanho_max * FRACAO_APOS_LIMPEZA
+            for _, tamanho, caminho in sorted(entradas):
+                if caminho == manter:
+                    continue
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    continue
+                total -= tamanho
+                if total <= alvo:
+                    break
+            self._total = total
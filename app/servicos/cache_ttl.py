@@ -0,0 +1,84 @@
+"""
+Cache em memória com TTL e versão, por processo
+
+Cada entrada guarda a versão (ver servicos.versoes) com que foi calculada:
+ela é descartada quando expira ou quando a versão compartilhada muda.
+Contadores de acertos/falhas ficam disponíveis em metricas().
+"""
+
+import threading
+import time
+
+
+class CacheTTL:
+    """
+    Args:
+        ttl: segundos de validade de cada entrada (0 desliga o cache)
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self._calculos = {}
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+        self.recalculos_forcados = 0
+
+    def obter_ou_calcular(self, chave, versao, calcular, forcar=False):
+        """
+        Valor em cache para (chave, versao) ou o resultado de calcular()
+
+        Requisições simultâneas com o cache vazio esperam um único cálculo
+        em vez de repetir a consulta em paralelo.
+        """
+        agora = time.monotonic()
+        if not forcar and self.ttl > 0:
+            with self._lock:
+                entrada = self._entradas.get(chave)
+                if entrada is not None:
+                    versao_entrada, expira_em, valor = entrada
+                    if versao_entrada == versao and agora < expira_em:
+                        self.acertos += 1
+                        return valor
+                    self.invalidacoes += versao_entrada != versao
+                    del self._entradas[chave]
+
+        with self._lock:
+            calculo = self._calculos.get(chave)
+            if calculo is None:
+                calculo = self._calculos[chave] = threading.Lock()
+        with calculo:
+            if not forcar and self.ttl > 0:
+                # Outra thread pode ter calculado enquanto esta esperava
+                with self._lock:
+                    entrada = self._entradas.get(chave)
+                    if entrada is not None and entrada[0] == versao and time.monotonic() < entrada[1]:
+                        self.acertos += 1
+                        return entrada[2]
+
+            valor = calcular()
+            with self._lock:
+                self.falhas += 1
+                self.recalculos_forcados += bool(forcar)
+                if self.ttl > 0:
+                    self._entradas[chave] = (versao, time.monotonic() + self.ttl, valor)
+            return valor
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def metricas(self):
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'ttl': self.ttl,
+                'entradas': len(self._entradas),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'invalidacoes': self.invalidacoes,
+                'recalculos_forcados': self.recalculos_forcados,
+                'taxa_acerto': round(self.acertos / total, 3) if total else None,
+            }
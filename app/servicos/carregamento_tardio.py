@@ -0,0 +1,89 @@
+"""
+Importação tardia das bibliotecas pesadas de relatório
+
+weasyprint, xhtml2pdf, pandas e companhia somam centenas de milissegundos e
+dezenas de MB por worker do gunicorn, mas só as rotas de PDF/Excel usam. Um
+ModuloTardio se comporta como o módulo real, porém só executa o import no
+primeiro acesso a um atributo.
+"""
+
+import importlib
+import threading
+import time
+
+# Bibliotecas carregadas por aquecer_bibliotecas() (PRELOAD_REPORT_LIBS=True)
+BIBLIOTECAS_RELATORIO = (
+    'weasyprint',
+    'weasyprint.text.fonts',
+    'xhtml2pdf.pisa',
+    'pandas',
+    'numpy',
+    'xlsxwriter',
+    'openpyxl',
+    'MySQLdb.cursors',
+)
+
+
+class ModuloTardio:
+    """
+    Proxy que importa `nome` no primeiro acesso a um atributo
+
+    Args:
+        nome: módulo a importar (ex.: 'pandas', 'xhtml2pdf.pisa')
+        submodulos: submódulos acessados como atributo que o pacote não
+                    importa sozinho (ex.: ('cursors',) para MySQLdb)
+    """
+
+    def __init__(self, nome, submodulos=()):
+        self.__dict__['_nome'] = nome
+        self.__dict__['_submodulos'] = tuple(submodulos)
+        self.__dict__['_modulo'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _carregar(self):
+        modulo = self.__dict__['_modulo']
+        if modulo is None:
+            with self.__dict__['_lock']:
+                modulo = self.__dict__['_modulo']
+                if modulo is None:
+                    modulo = importlib.import_module(self.__dict__['_nome'])
+                    for sub in self.__dict__['_submodulos']:
+                        importlib.import_module(f"{self.__dict__['_nome']}.{sub}")
+                    self.__dict__['_modulo'] = modulo
+        return modulo
+
+    @property
+    def carregado(self):
+        return self.__dict__['_modulo'] is not None
+
+    def __getattr__(self, atributo):
+        return getattr(self._carregar(), atributo)
+
+    def __setattr__(self, atributo, valor):
+        setattr(self._carregar(), atributo, valor)
+
+    def __repr__(self):
+        estado = 'carregado' if self.carregado else 'não carregado'
+        return f"<ModuloTardio '{self.__dict__['_nome']}' ({estado})>"
+
+
+def aquecer_bibliotecas(nomes=BIBLIOTECAS_RELATORIO):
+    """
+    Importa antecipadamente as bibliotecas de relatório
+
+    Com `gunicorn --preload` o custo é pago uma vez no processo mestre e as
+    páginas são compartilhadas com os workers (copy-on-write).
+
+    Returns:
+        dict nome -> segundos gastos no import (0.0 se já estava carregado)
+    """
+    tempos = {}
+    for nome in nomes:
+        inicio = time.perf_counter()
+        try:
+            importlib.import_module(nome)
+        except ImportError as e:
+            print(f"Aviso: não foi possível pré-carregar {nome}: {e}")
+            continue
+        tempos[nome] = round(time.perf_counter() - inicio, 4)
+    return tempos
@@ -0,0 +1,147 @@
+"""
+Contadores de alunos por status (tbl_contadores_alunos)
+
+/home e /baixa_alunos contavam ativos/inativos varrendo tbl_cad_alunos
+inteira a cada acesso, com TRIM/UPPER/LOWER na coluna (o que impede o uso de
+índice). Aqui cada status normalizado ('ATIVO', 'INATIVO', ...) tem uma linha
+com o total: as rotas que inserem alunos ou mudam o status ajustam os
+contadores no mesmo cursor/transação da gravação, e as páginas leem só
+essas poucas linhas.
+
+A tabela é criada e populada no primeiro uso. Para corrigir divergências
+(ex.: alunos alterados direto no banco):
+    flask --app app/app.py contadores-alunos-reconciliar
+"""
+
+import threading
+
+ATIVO = 'ATIVO'
+INATIVO = 'INATIVO'
+
+DDL = """
+    CREATE TABLE IF NOT EXISTS tbl_contadores_alunos (
+        status VARCHAR(50) NOT NULL PRIMARY KEY,
+        total INT NOT NULL DEFAULT 0,
+        atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+"""
+
+AJUSTE = """
+    INSERT INTO tbl_contadores_alunos (status, total) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+"""
+
+_tabela_verificada = False
+_lock = threading.Lock()
+
+
+def normalizar(status):
+    """Chave do contador para um status_aluno (mesma regra do TRIM(UPPER()) antigo)"""
+    return (status or '').strip().upper()
+
+
+def garantir_tabela(conexao):
+    """
+    Cria a tabela (e a popula a partir de tbl_cad_alunos) se ainda não existir
+
+    DDL faz commit implícito no MySQL: chame antes de abrir a transação de
+    gravação. A verificação roda uma vez por processo.
+    """
+    global _tabela_verificada
+    if _tabela_verificada:
+        return
+    with _lock:
+        if _tabela_verificada:
+            return
+        cursor = conexao.cursor()
+        try:
+            cursor.execute("SHOW TABLES LIKE 'tbl_contadores_alunos'")
+            existia = cursor.fetchone() is not None
+            if not existia:
+                cursor.execute(DDL)
+        finally:
+            cursor.close()
+        if not existia:
+            reconciliar(conexao)
+        _tabela_verificada = True
+
+
+def ajustar(cursor, status, delta):
+    """Soma `delta` ao contador de `status` (no cursor da transação corrente)"""
+    if delta:
+        cursor.execute(AJUSTE, (normalizar(status), delta))
+
+
+def mudar_status(cursor, anterior, novo, quantidade=1):
+    """Move `quantidade` alunos do contador `anterior` para o `novo`"""
+    if normalizar(anterior) != normalizar(novo):
+        ajustar(cursor, anterior, -quantidade)
+        ajustar(cursor, novo, quantidade)
+
+
+def status_atuais(cursor, coluna, valor):
+    """
+    Status atuais dos alunos com `coluna` = valor, travando as linhas
+    (SELECT ... FOR UPDATE) até o fim da transação
+
+    Chame antes do UPDATE para saber de qual contador cada aluno sai.
+    `coluna` vem do código ('id_aluno' ou 'matricula_aluno'), nunca do usuário.
+    """
+    cursor.execute(
+        f"SELECT status_aluno FROM tbl_cad_alunos WHERE {coluna} = %s FOR UPDATE", (valor,)
+    )
+    return [linha['status_aluno'] for linha in cursor.fetchall()]
+
+
+def carregar(conexao):
+    """{status normalizado: total}"""
+    cursor = conexao.cursor()
+    try:
+        cursor.execute("SELECT status, total FROM tbl_contadores_alunos")
+        return {linha['status']: int(linha['total']) for linha in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def totais(conexao):
+    """(total de alunos, ativos, inativos)"""
+    contadores = carregar(conexao)
+    return sum(contadores.values()), contadores.get(ATIVO, 0), contadores.get(INATIVO, 0)
+
+
+def reconciliar(conexao):
+    """
+    Recalcula os contadores a partir de tbl_cad_alunos
+
+    Returns:
+        lista de (status, valor anterior, valor correto) que divergiam
+    """
+    cursor = conexao.cursor()
+    try:
+        cursor.execute("SELECT status, total FROM tbl_contadores_alunos FOR UPDATE")
+        anteriores = {linha['status']: int(linha['total']) for linha in cursor.fetchall()}
+        cursor.execute("""
+            SELECT UPPER(TRIM(COALESCE(status_aluno, ''))) AS status, COUNT(*) AS total
+            FROM tbl_cad_alunos
+            GROUP BY UPPER(TRIM(COALESCE(status_aluno, '')))
+        """)
+        corretos = {linha['status']: int(linha['total']) for linha in cursor.fetchall()}
+
+        divergencias = [
+            (status, anteriores.get(status, 0), corretos.get(status, 0))
+            for status in sorted(set(anteriores) | set(corretos))
+            if anteriores.get(status, 0) != corretos.get(status, 0)
+        ]
+        for status, _, total in divergencias:
+            cursor.execute(
+                "INSERT INTO tbl_contadores_alunos (status, total) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE total = VALUES(total)",
+                (status, total)
+            )
+        conexao.commit()
+    except Exception:
+        conexao.rollback()
+        raise
+    finally:
+        cursor.close()
+    return divergencias
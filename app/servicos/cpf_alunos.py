@@ -0,0 +1,137 @@
+"""
+CPF normalizado (só dígitos) de tbl_cad_alunos
+
+buscar_aluno comparava REPLACE(REPLACE(REPLACE(cpf_aluno, ...))) com o CPF
+digitado, o que obriga o MySQL a varrer a tabela inteira a cada busca. A
+coluna cpf_normalizado guarda os dígitos do CPF com índice único: cad_aluno
+e atualizar_aluno a preenchem junto com cpf_aluno e a busca vira uma
+consulta por igualdade no índice.
+
+A coluna e o índice são criados no primeiro uso e os alunos existentes são
+preenchidos nesse momento. Para repetir o preenchimento (ex.: alunos
+inseridos direto no banco):
+    flask --app app/app.py cpf-alunos-preencher
+"""
+
+import threading
+
+from servicos.esquema import garantir_indices
+
+INDICE = 'uq_cad_alunos_cpf_normalizado'
+INDICES = ((INDICE, 'cpf_normalizado', True),)
+TAMANHO_LOTE = 500
+ERRO_DUPLICADO = 1062
+
+COLUNAS_BUSCA = """
+    id_aluno, matricula_aluno, nome_aluno,
+    dt_nascimento, cpf_aluno, genero, whatsapp,
+    endereco_aluno, tipo_responsavel, nome_pai, nome_mae,
+    patologia, tipo_educacao, contato, nome_escola, turma,
+    coordenador_pedagogico, profissional_AEE, cod_cid,
+    equipe_multidisciplinar, status_aluno, observacoes
+"""
+
+_coluna_verificada = False
+_lock = threading.Lock()
+
+
+def normalizar(cpf):
+    """Dígitos do CPF, ou None se não houver nenhum (NULL não conflita no índice único)"""
+    digitos = ''.join(filter(str.isdigit, cpf or ''))
+    return digitos or None
+
+
+def cpf_duplicado(erro):
+    """True se `erro` é a violação do índice único de cpf_normalizado"""
+    args = getattr(erro, 'args', ())
+    return bool(args) and args[0] == ERRO_DUPLICADO and INDICE in str(erro)
+
+
+def garantir_coluna(conexao):
+    """
+    Cria cpf_normalizado e seu índice único se ainda não existirem
+
+    ALTER TABLE faz commit implícito no MySQL: chame antes de abrir a
+    transação de gravação. A verificação roda uma vez por processo.
+    """
+    global _coluna_verificada
+    if _coluna_verificada:
+        return
+    with _lock:
+        if _coluna_verificada:
+            return
+        cursor = conexao.cursor()
+        try:
+            cursor.execute("SHOW COLUMNS FROM tbl_cad_alunos LIKE 'cpf_normalizado'")
+            existia = cursor.fetchone() is not None
+            if not existia:
+                print("Criando coluna cpf_normalizado em tbl_cad_alunos...")
+                cursor.execute(
+                    "ALTER TABLE tbl_cad_alunos ADD COLUMN cpf_normalizado VARCHAR(20) NULL AFTER cpf_aluno"
+                )
+        finally:
+            cursor.close()
+        if not existia:
+            preencher(conexao)
+        garantir_indices(conexao, 'tbl_cad_alunos', INDICES)
+        _coluna_verificada = True
+
+
+def preencher(conexao):
+    """
+    Preenche cpf_normalizado dos alunos que ainda não o têm
+
+    Quando dois cadastros têm o mesmo CPF, só o de menor id_aluno recebe o
+    valor (o índice é único); os demais ficam de fora e são devolvidos para
+    correção manual.
+
+    Returns:
+        (quantidade preenchida, lista de (id_aluno, cpf_aluno) duplicados)
+    """
+    cursor = conexao.cursor()
+    try:
+        cursor.execute("SELECT cpf_normalizado FROM tbl_cad_alunos WHERE cpf_normalizado IS NOT NULL")
+        usados = {linha['cpf_normalizado'] for linha in cursor.fetchall()}
+        cursor.execute("""
+            SELECT id_aluno, cpf_aluno FROM tbl_cad_alunos
+            WHERE cpf_normalizado IS NULL AND cpf_aluno IS NOT NULL
+            ORDER BY id_aluno
+        """)
+        atualizacoes, duplicados = [], []
+        for linha in cursor.fetchall():
+            cpf = normalizar(linha['cpf_aluno'])
+            if cpf is None:
+                continue
+            if cpf in usados:
+                duplicados.append((linha['id_aluno'], linha['cpf_aluno']))
+                continue
+            usados.add(cpf)
+            atualizacoes.append((cpf, linha['id_aluno']))
+
+        for inicio in range(0, len(atualizacoes), TAMANHO_LOTE):
+            cursor.executemany(
+                "UPDATE tbl_cad_alunos SET cpf_normalizado = %s WHERE id_aluno = %s",
+                atualizacoes[inicio:inicio + TAMANHO_LOTE]
+            )
+        conexao.commit()
+    except Exception:
+        conexao.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(atualizacoes), duplicados
+
+
+def buscar(cursor, cpf_normalizado):
+    """Cadastro do aluno com esse CPF (dict pronto para JSON) ou None"""
+    cursor.execute(
+        f"SELECT {COLUNAS_BUSCA} FROM tbl_cad_alunos WHERE cpf_normalizado = %s",
+        (cpf_normalizado,)
+    )
+    aluno = cursor.fetchone()
+    if aluno is None:
+        return None
+    aluno = dict(aluno)
+    if hasattr(aluno.get('dt_nascimento'), 'strftime'):
+        aluno['dt_nascimento'] = aluno['dt_nascimento'].strftime('%Y-%m-%d')
+    return aluno
@@ -0,0 +1,110 @@
+"""
+Colunas e índices criados pelo próprio app nas tabelas existentes do banco
+
+O esquema base (tbl_cad_alunos etc.) é criado fora do app; as colunas e os
+índices de que as consultas novas dependem são conferidos no
+information_schema e criados se faltarem, uma vez por processo.
+"""
+
+import threading
+
+_verificados = set()
+_lock = threading.Lock()
+_chaves = {}
+
+
+def garantir_indices(conexao, tabela, indices, tolerante=False):
+    """
+    Cria os índices de `tabela` que ainda não existem
+
+    Args:
+        indices: sequência de (nome, colunas) ou (nome, colunas, unico), ex.:
+                 ('idx_cad_alunos_nome', 'nome_aluno, id_aluno')
+        tolerante: índice que o banco recusar (ex.: coluna TEXT de tabela
+                   criada fora do app) só é registrado no log, sem erro
+
+    ALTER TABLE faz commit implícito no MySQL: chame antes de abrir a
+    transação de gravação.
+    """
+    chave = (tabela, tuple(indices))
+    if chave in _verificados:
+        return
+    with _lock:
+        if chave in _verificados:
+            return
+        cursor = conexao.cursor()
+        try:
+            cursor.execute("""
+                SELECT DISTINCT INDEX_NAME AS nome FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            """, (tabela,))
+            existentes = {linha['nome'] for linha in cursor.fetchall()}
+            for nome, colunas, *unico in indices:
+                if nome not in existentes:
+                    print(f"Criando índice {nome} em {tabela}...")
+                    tipo = 'UNIQUE INDEX' if unico and unico[0] else 'INDEX'
+                    try:
+                        cursor.execute(f"ALTER TABLE {tabela} ADD {tipo} {nome} ({colunas})")
+                    except Exception as e:
+                        if not tolerante:
+                            raise
+                        print(f"Índice {nome} não criado em {tabela}: {e}")
+        finally:
+            cursor.close()
+        _verificados.add(chave)
+
+
+def garantir_colunas(conexao, tabela, colunas):
+    """
+    Adiciona as colunas de `tabela` que ainda não existem
+
+    Args:
+        colunas: sequência de (nome, definição), ex.:
+                 ('atualizado_em', 'TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP')
+
+    Returns:
+        nomes das colunas criadas nesta chamada (para quem precisa preenchê-las)
+    """
+    chave = (tabela, tuple(colunas))
+    if chave in _verificados:
+        return []
+    criadas = []
+    with _lock:
+        if chave in _verificados:
+            return []
+        cursor = conexao.cursor()
+        try:
+            cursor.execute("""
+                SELECT COLUMN_NAME AS nome FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            """, (tabela,))
+            existentes = {linha['nome'] for linha in cursor.fetchall()}
+            for nome, definicao in colunas:
+                if nome not in existentes:
+                    print(f"Criando coluna {nome} em {tabela}...")
+                    cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {nome} {definicao}")
+                    criadas.append(nome)
+        finally:
+            cursor.close()
+        _verificados.add(chave)
+    return criadas
+
+
+def chave_primaria(conexao, tabela):
+    """Nome da (primeira) coluna da chave primária de `tabela`, ou None se não houver"""
+    if tabela not in _chaves:
+        cursor = conexao.cursor()
+        try:
+            cursor.execute("""
+                SELECT COLUMN_NAME AS nome FROM information_schema.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY'
+                ORDER BY ORDINAL_POSITION
+                LIMIT 1
+            """, (tabela,))
+            linha = cursor.fetchone()
+        finally:
+            cursor.close()
+        if linha is None:
+            return None
+        _chaves[tabela] = linha['nome']
+    return _chaves[tabela]
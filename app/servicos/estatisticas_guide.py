@@ -0,0 +1,99 @@
+"""
+Estatísticas do dashboard GUIDE calculadas com NumPy
+
+As linhas de tbl_resumo_guide (ver resumo_guide) viram uma matriz
+alunos x domínios e tudo o que o dashboard mostra sai dela em operações
+vetorizadas: média geral de cada aluno, média/mediana/percentis/desvio de
+cada domínio, distribuição por faixa de nota e a classe CSS de cada célula
+(mesmas faixas do filtro grade_class), que antes era calculada nota a nota
+durante a renderização.
+
+O resultado contém só tipos nativos do Python, pronto para o cache do
+dashboard e para o `tojson` do template.
+"""
+
+import numpy as np
+
+from servicos.resumo_guide import COLUNAS_MEDIAS, DOMINIOS
+
+# Limites inferiores das faixas (mesmos do filtro grade_class) e a classe de cada faixa
+LIMITES_FAIXAS = (5.0, 7.0, 9.0)
+CLASSES_FAIXAS = ('grade-needs-improvement', 'grade-average', 'grade-good', 'grade-excellent')
+PERCENTIS = (25, 75, 90)
+
+NOMES_DOMINIOS = tuple(dominio for dominio, _ in DOMINIOS)
+
+
+def _arredondar(valores):
+    return np.round(valores, 1).tolist()
+
+
+def calcular(linhas):
+    """
+    Monta o payload do dashboard a partir das linhas de resumo_guide.carregar()
+
+    Returns:
+        dict com medias, total_alunos, alunos (com classes por célula),
+        estatisticas e distribuicao por domínio
+    """
+    total = len(linhas)
+    notas = np.array(
+        [[r[coluna] for coluna in COLUNAS_MEDIAS] for r in linhas], dtype=np.float64
+    ).reshape(total, len(COLUNAS_MEDIAS))
+
+    # Média geral por aluno: só domínios avaliados (nota > 0), em décimos inteiros
+    # e arredondada meio para cima, exatamente como resumo_guide.media_geral
+    avaliadas = notas > 0
+    quantidade = avaliadas.sum(axis=1)
+    soma = np.where(avaliadas, np.rint(notas * 10).astype(np.int64), 0).sum(axis=1)
+    divisor = np.maximum(quantidade, 1)
+    media_geral = np.where(quantidade > 0, (2 * soma + divisor) // (2 * divisor), 0) / 10
+
+    # Faixa de cada célula (0..3) para as notas dos domínios e para a média geral
+    faixas = np.digitize(np.column_stack((notas, media_geral)), LIMITES_FAIXAS)
+    classes = np.asarray(CLASSES_FAIXAS)[faixas].tolist()
+    contagens = [np.bincount(faixas[:, i], minlength=len(CLASSES_FAIXAS)).tolist()
+                 for i in range(len(NOMES_DOMINIOS))]
+
+    if total:
+        medias = _arredondar(notas.mean(axis=0))
+        medianas = _arredondar(np.median(notas, axis=0))
+        desvios = _arredondar(notas.std(axis=0))
+        minimos = _arredondar(notas.min(axis=0))
+        maximos = _arredondar(notas.max(axis=0))
+        percentis = np.round(np.percentile(notas, PERCENTIS, axis=0), 1).tolist()
+    else:
+        vazio = [0.0] * len(NOMES_DOMINIOS)
+        medias = medianas = desvios = minimos = maximos = vazio
+        percentis = [vazio] * len(PERCENTIS)
+
+    estatisticas = {}
+    distribuicao = {}
+    for i, dominio in enumerate(NOMES_DOMINIOS):
+        estatisticas[dominio] = {
+            'media': medias[i],
+            'mediana': medianas[i],
+            'desvio_padrao': desvios[i],
+            'minimo': minimos[i],
+            'maximo': maximos[i],
+            **{f'p{p}': percentis[j][i] for j, p in enumerate(PERCENTIS)},
+        }
+        distribuicao[dominio] = dict(zip(CLASSES_FAIXAS, contagens[i]))
+
+    valores = notas.tolist()
+    medias_gerais = media_geral.tolist()
+    alunos = []
+    for k, r in enumerate(linhas):
+        aluno = {"id": r['id_aluno'], "nome": r['nome_aluno']}
+        aluno.update(zip(NOMES_DOMINIOS, valores[k]))
+        aluno["media_geral"] = medias_gerais[k]
+        aluno["classes"] = dict(zip(NOMES_DOMINIOS + ('media_geral',), classes[k]))
+        alunos.append(aluno)
+
+    return {
+        "medias": dict(zip(NOMES_DOMINIOS, medias)),
+        "total_alunos": total,
+        "alunos": alunos,  # mesma ordem das linhas (por nome)
+        "estatisticas": estatisticas,
+        "distribuicao": distribuicao,
+    }
@@ -0,0 +1,156 @@
+"""
+Evidências dos chamados de suporte, endereçadas por conteúdo
+
+As evidências iam para app/static/uploads com o nome enviado
+(secure_filename): o mesmo print de tela era guardado de novo a cada
+chamado e arquivos com o mesmo nome se sobrescreviam. Agora o conteúdo fica
+no armazém em SUPORTE_EVIDENCIA_DIR (servicos.anexos.ArmazemAnexos, um
+arquivo por SHA-256), o chamado guarda o nome original e evidencia_sha256,
+e tbl_evidencias_suporte guarda tipo, tamanho e quantos chamados usam cada
+conteúdo.
+
+O contador é incrementado na mesma transação do INSERT do chamado; arquivos
+com contador zero (ou sem linha, de um INSERT que falhou) são apagados por:
+    flask --app app/app.py suporte-evidencias-limpar
+As evidências antigas de static/uploads são movidas com
+`suporte-evidencias-migrar`.
+"""
+
+import os
+
+from servicos.uploads import TIPOS_POR_ASSINATURA
+
+_tabela_criada = False
+
+
+def garantir_tabela(conexao):
+    """Cria tbl_evidencias_suporte (uma vez por processo)"""
+    global _tabela_criada
+    if _tabela_criada:
+        return
+    cursor = conexao.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tbl_evidencias_suporte (
+                sha256 CHAR(64) NOT NULL PRIMARY KEY,
+                tamanho BIGINT NOT NULL,
+                tipo VARCHAR(100) NOT NULL,
+                referencias INT NOT NULL DEFAULT 0,
+                criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    finally:
+        cursor.close()
+    _tabela_criada = True
+
+
+def registrar(cursor, sha256, tamanho, tipo):
+    """Mais um chamado usando esse conteúdo (na transação do INSERT do chamado)"""
+    cursor.execute("""
+        INSERT INTO tbl_evidencias_suporte (sha256, tamanho, tipo, referencias)
+        VALUES (%s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE referencias = referencias + 1
+    """, (sha256, tamanho, tipo))
+
+
+def tipo(cursor, sha256):
+    """Mimetype da evidência em uso, ou None se não existe/não é referenciada"""
+    cursor.execute("SELECT tipo FROM tbl_evidencias_suporte WHERE sha256 = %s AND referencias > 0", (sha256,))
+    linha = cursor.fetchone()
+    return linha['tipo'] if linha else None
+
+
+def _tipo_pelo_conteudo(caminho):
+    with open(caminho, 'rb') as arquivo:
+        inicio = arquivo.read(16)
+    return next((t for a, t in TIPOS_POR_ASSINATURA.items() if inicio.startswith(a)), 'application/octet-stream')
+
+
+def migrar(conexao, armazem, pasta_antiga):
+    """
+    Move as evidências de static/uploads (pelo nome) para o armazém
+
+    Cada nome é migrado numa transação (todos os chamados que o usam); o
+    arquivo antigo só é apagado depois do commit.
+
+    Returns:
+        (chamados migrados, nomes sem arquivo em pasta_antiga)
+    """
+    cursor = conexao.cursor()
+    try:
+        cursor.execute("""
+            SELECT DISTINCT evidencia FROM tbl_chamados_suport
+            WHERE evidencia IS NOT NULL AND evidencia <> '' AND evidencia_sha256 IS NULL
+        """)
+        nomes = [linha['evidencia'] for linha in cursor.fetchall()]
+        migrados, ausentes = 0, []
+        for nome in nomes:
+            caminho = os.path.join(pasta_antiga, os.path.basename(nome))
+            if not os.path.isfile(caminho):
+                ausentes.append(nome)
+                continue
+            with open(caminho, 'rb') as arquivo:
+                sha256, tamanho, _ = armazem.guardar(arquivo, limitar=False)
+            try:
+                cursor.execute("""
+                    UPDATE tbl_chamados_suport SET evidencia_sha256 = %s
+                    WHERE evidencia = %s AND evidencia_sha256 IS NULL
+                """, (sha256, nome))
+                quantidade = cursor.rowcount
+                cursor.execute("""
+                    INSERT INTO tbl_evidencias_suporte (sha256, tamanho, tipo, referencias)
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE referencias = referencias + VALUES(referencias)
+                """, (sha256, tamanho, _tipo_pelo_conteudo(armazem.caminho(sha256)), quantidade))
+                conexao.commit()
+            except Exception:
+                conexao.rollback()
+                raise
+            migrados += quantidade
+            os.unlink(caminho)
+        return migrados, ausentes
+    finally:
+        cursor.close()
+
+
+def reconciliar(conexao):
+    """Recalcula os contadores a partir dos chamados; devolve quantos mudaram"""
+    cursor = conexao.cursor()
+    try:
+        cursor.execute("""
+            UPDATE tbl_evidencias_suporte e
+            LEFT JOIN (
+                SELECT evidencia_sha256, COUNT(*) AS total FROM tbl_chamados_suport
+                WHERE evidencia_sha256 IS NOT NULL GROUP BY evidencia_sha256
+            ) c ON c.evidencia_sha256 = e.sha256
+            SET e.referencias = COALESCE(c.total, 0)
+            WHERE e.referencias <> COALESCE(c.total, 0)
+        """)
+        alterados = cursor.rowcount
+        conexao.commit()
+        return alterados
+    finally:
+        cursor.close()
+
+
+def limpar(conexao, armazem):
+    """
+    Apaga os conteúdos sem chamado (contador zero ou sem linha na tabela)
+
+    Returns:
+        quantidade de arquivos apagados
+    """
+    cursor = conexao.cursor()
+    try:
+        cursor.execute("SELECT sha256 FROM tbl_evidencias_suporte WHERE referencias > 0")
+        em_uso = {linha['sha256'] for linha in cursor.fetchall()}
+        removidos = []
+        for sha256 in set(armazem.hashes()) - em_uso:
+            if armazem.remover(sha256):
+                removidos.append(sha256)
+        for sha256 in removidos:
+            cursor.execute("DELETE FROM tbl_evidencias_suporte WHERE sha256 = %s AND referencias <= 0", (sha256,))
+        conexao.commit()
+        return len(removidos)
+    finally:
+        cursor.close()
@@ -0,0 +1,328 @@
+"""
+Exportações em streaming (Excel, CSV e NDJSON) para o NeuroEduca
+
+As rotas antigas faziam fetchall() -> DataFrame -> BytesIO, mantendo três
+cópias dos dados em memória. Aqui as linhas vêm de um cursor do lado do
+servidor (SSCursor) em lotes: o Excel é gravado pelo xlsxwriter em modo
+constant_memory num arquivo temporário; CSV e NDJSON saem direto de um
+gerador, opcionalmente comprimidos com gzip.
+"""
+
+import csv
+import datetime
+import decimal
+import io
+import json
+import tempfile
+import zlib
+
+from flask import Response, send_file, stream_with_context
+
+from servicos.questionarios import GUIDE, PEDI, PEI
+
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+TAMANHO_LOTE = 2000                      # linhas por fetchmany()
+LIMITE_MEMORIA_ARQUIVO = 8 * 1024 * 1024  # acima disso o arquivo temporário vai para disco
+MAX_LINHAS_ABA = 1048576 - 1             # limite do formato xlsx, descontando o cabeçalho
+
+# Projeções das views de questionário (mesma ordem das planilhas), derivadas do registro
+COLUNAS_PEI = PEI.colunas_exportacao
+COLUNAS_PEDI = PEDI.colunas_exportacao
+COLUNAS_GUIDE = GUIDE.colunas_exportacao
+
+
+class FonteExportacao:
+    """
+    Tabela ou view exportável
+
+    Args:
+        tabela: tabela/view de origem
+        colunas: projeção (None = SELECT *)
+        filtros_permitidos: colunas aceitas como filtro de igualdade via query string
+        chave: coluna numérica usada na paginação por keyset (`chave > apos_id`)
+        tabela_base: tabela que ancora a view, usada em estimar_linhas()
+    """
+
+    def __init__(self, tabela, colunas=None, filtros_permitidos=(), chave='id_aluno', tabela_base=None):
+        self.tabela = tabela
+        self.colunas = colunas
+        self.filtros_permitidos = tuple(filtros_permitidos)
+        self.chave = chave
+        self.tabela_base = tabela_base or tabela
+
+    def consulta(self, filtros=None, apos_id=None, limite=None, ordenar=False):
+        """Monta (sql, params); só aceita filtros declarados em filtros_permitidos"""
+        projecao = ', '.join(self.colunas) if self.colunas else '*'
+        condicoes, params = [], []
+        for coluna, valor in (filtros or {}).items():
+            if coluna not in self.filtros_permitidos:
+                raise ValueError(f"Filtro não permitido: {coluna}")
+            condicoes.append(f"{coluna} = %s")
+            params.append(valor)
+        if apos_id is not None:
+            condicoes.append(f"{self.chave} > %s")
+            params.append(apos_id)
+
+        sql = f"SELECT {projecao} FROM {self.tabela}"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        if ordenar or apos_id is not None:
+            sql += f" ORDER BY {self.chave}"
+        if limite is not None:
+            sql += " LIMIT %s"
+            params.append(limite)
+        return sql, tuple(params)
+
+
+FONTES_EXPORTACAO = {
+    **{q.nome: FonteExportacao(q.view, q.colunas_exportacao, tabela_base=q.tabela_base)
+       for q in (PEI, PEDI, GUIDE)},
+    'alunos': FonteExportacao('tbl_cad_alunos', filtros_permitidos=('status_aluno',)),
+}
+
+
+def estimar_linhas(conexao, fonte):
+    """
+    Estimativa barata do tamanho de uma exportação (sem COUNT(*) na view)
+
+    Usa TABLE_ROWS do information_schema para a tabela base da fonte. No
+    InnoDB o valor é aproximado e ignora filtros, o que basta para decidir
+    se a exportação vai para a fila de tarefas.
+
+    Returns:
+        número estimado de linhas, ou None se a tabela não for encontrada
+    """
+    cursor = conexao.cursor()
+    try:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (fonte.tabela_base,)
+        )
+        linha = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not linha:
+        return None
+    valor = linha['TABLE_ROWS'] if isinstance(linha, dict) else linha[0]
+    return int(valor) if valor is not None else None
+
+
+def linhas_em_lotes(cursor, tamanho_lote=TAMANHO_LOTE):
+    """Gera listas de linhas do cursor sem carregar o resultado inteiro"""
+    while True:
+        lote = cursor.fetchmany(tamanho_lote)
+        if not lote:
+            break
+        yield lote
+
+
+def abrir_cursor_servidor(conexao, sql, params=None):
+    """Executa `sql` num SSCursor (resultado lido do servidor sob demanda)"""
+    from MySQLdb.cursors import SSCursor
+
+    cursor = conexao.cursor(SSCursor)
+    cursor.execute(sql, params)
+    return cursor
+
+
+def gerar_xlsx(cursor, aba, tamanho_lote=TAMANHO_LOTE, destino=None, ao_progredir=None):
+    """
+    Grava o resultado de um cursor já executado num xlsx temporário
+
+    Args:
+        cursor: cursor executado que retorne tuplas (ex.: SSCursor)
+        aba: nome da planilha; se passar de 1.048.575 linhas cria "aba (2)", ...
+        destino: arquivo binário aberto para gravar no lugar do temporário
+        ao_progredir: chamada com o total de linhas gravadas após cada lote
+
+    Returns:
+        o arquivo (temporário ou destino) posicionado no início, ou None se
+        não houver linhas
+    """
+    import xlsxwriter
+
+    colunas = [desc[0] for desc in cursor.description]
+    lotes = linhas_em_lotes(cursor, tamanho_lote)
+    primeiro_lote = next(lotes, None)
+    if primeiro_lote is None:
+        return None
+
+    # Colunas binárias (BLOB) viram texto; o restante vai direto para o xlsxwriter
+    colunas_binarias = [i for i, valor in enumerate(primeiro_lote[0])
+                        if isinstance(valor, (bytes, bytearray))]
+
+    arquivo = destino if destino is not None else tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_ARQUIVO)
+    workbook = xlsxwriter.Workbook(arquivo, {
+        'constant_memory': True,
+        'default_date_format': 'dd/mm/yyyy',
+        # Textos digitados pelos usuários não devem virar fórmulas nem links
+        # (o xlsx aceita no máximo 65.530 links por planilha)
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+    })
+    cabecalho = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+
+    num_aba = 0
+    total = 0
+    planilha = None
+    linha_atual = MAX_LINHAS_ABA + 1
+
+    def lotes_completos():
+        yield primeiro_lote
+        yield from lotes
+
+    try:
+        for lote in lotes_completos():
+            for linha in lote:
+                if linha_atual > MAX_LINHAS_ABA:
+                    num_aba += 1
+                    planilha = workbook.add_worksheet(aba if num_aba == 1 else f'{aba} ({num_aba})')
+                    planilha.write_row(0, 0, colunas, cabecalho)
+                    linha_atual = 1
+                if colunas_binarias:
+                    linha = list(linha)
+                    for i in colunas_binarias:
+                        if linha[i] is not None:
+                            linha[i] = bytes(linha[i]).decode('utf-8', errors='replace')
+                planilha.write_row(linha_atual, 0, linha)
+                linha_atual += 1
+            total += len(lote)
+            if ao_progredir is not None:
+                ao_progredir(total)
+        workbook.close()
+    except Exception:
+        if destino is None:
+            arquivo.close()
+        raise
+
+    arquivo.seek(0)
+    return arquivo
+
+
+def exportar_xlsx(conexao, sql, params, aba, nome_download, tamanho_lote=TAMANHO_LOTE):
+    """
+    Monta a resposta de download de um xlsx gerado em streaming
+
+    Returns:
+        Response do Flask, ou None se a consulta não retornou linhas
+    """
+    cursor = abrir_cursor_servidor(conexao, sql, params)
+    try:
+        arquivo = gerar_xlsx(cursor, aba, tamanho_lote)
+    finally:
+        cursor.close()
+
+    if arquivo is None:
+        return None
+
+    return send_file(
+        arquivo,
+        mimetype=MIMETYPE_XLSX,
+        as_attachment=True,
+        download_name=nome_download
+    )
+
+
+# ---------------------------------------------------------------------- #
+# CSV / NDJSON
+# ---------------------------------------------------------------------- #
+
+MIMETYPES_TEXTO = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime.date, datetime.datetime, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, decimal.Decimal):
+        return float(valor)
+    if isinstance(valor, (bytes, bytearray)):
+        return bytes(valor).decode('utf-8', errors='replace')
+    return str(valor)
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (bytes, bytearray)):
+        return bytes(valor).decode('utf-8', errors='replace')
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def gerar_csv(cursor, tamanho_lote=TAMANHO_LOTE):
+    """Gera blocos de texto CSV (cabeçalho + um bloco por lote do cursor)"""
+    colunas = [desc[0] for desc in cursor.description]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(colunas)
+    for lote in linhas_em_lotes(cursor, tamanho_lote):
+        escritor.writerows([_valor_csv(v) for v in linha] for linha in lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gerar_ndjson(cursor, tamanho_lote=TAMANHO_LOTE):
+    """Gera blocos NDJSON: um objeto JSON por linha do resultado"""
+    colunas = [desc[0] for desc in cursor.description]
+    for lote in linhas_em_lotes(cursor, tamanho_lote):
+        yield ''.join(
+            json.dumps(dict(zip(colunas, linha)), ensure_ascii=False, default=_valor_json) + '\n'
+            for linha in lote
+        )
+
+
+def comprimir_gzip(blocos, nivel=6):
+    """Comprime incrementalmente um gerador de blocos de texto em gzip"""
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # wbits=31 -> cabeçalho gzip
+    for bloco in blocos:
+        dados = compressor.compress(bloco.encode('utf-8'))
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+
+def exportar_texto(conexao, fonte, formato, nome_base, filtros=None, apos_id=None,
+                   limite=None, comprimir=False, tamanho_lote=TAMANHO_LOTE):
+    """
+    Resposta em streaming CSV/NDJSON de uma FonteExportacao
+
+    Com `comprimir` o download é um arquivo .gz de verdade (application/gzip,
+    sem Content-Encoding): o navegador não descomprime e salva o que recebeu.
+
+    As linhas saem ordenadas pela chave da fonte (id_aluno). Para retomar um
+    download interrompido, descarte as linhas do último id recebido (podem
+    estar incompletas) e repita a chamada com `apos_id` igual ao id anterior.
+    """
+    sql, params = fonte.consulta(filtros, apos_id, limite, ordenar=True)
+    cursor = abrir_cursor_servidor(conexao, sql, params)
+
+    geradores = {'csv': gerar_csv, 'ndjson': gerar_ndjson}
+
+    def gerar():
+        try:
+            blocos = geradores[formato](cursor, tamanho_lote)
+            if comprimir:
+                yield from comprimir_gzip(blocos)
+            else:
+                for bloco in blocos:
+                    yield bloco.encode('utf-8')
+        finally:
+            cursor.close()
+
+    nome_arquivo = f'{nome_base}.{formato}' + ('.gz' if comprimir else '')
+    headers = {
+        'Content-Disposition': f'attachment; filename={nome_arquivo}',
+        'X-Keyset-Coluna': fonte.chave,
+        'X-Accel-Buffering': 'no',  # nginx repassa os blocos sem bufferizar
+    }
+    mimetype = 'application/gzip' if comprimir else MIMETYPES_TEXTO[formato]
+    return Response(stream_with_context(gerar()), mimetype=mimetype, headers=headers)
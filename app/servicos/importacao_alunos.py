@@ -0,0 +1,382 @@
+"""
+Importação em massa de alunos a partir de planilhas (XLSX ou CSV)
+
+Para cadastrar os alunos de uma escola parceira sem digitar um a um em
+cad_aluno. A planilha é lida como gerador (openpyxl em modo read_only, ou
+csv) e processada em lotes de TAMANHO_LOTE linhas:
+    - CPF e data de nascimento são normalizados e validados de uma vez por
+      lote, com pandas/NumPy (dígitos verificadores calculados em matriz);
+    - os CPFs do lote são conferidos no banco com um único SELECT ... IN
+      sobre cpf_normalizado (índice único, ver cpf_alunos) e contra os CPFs
+      já vistos no próprio arquivo;
+    - as linhas válidas entram com um executemany por lote, numa transação
+      que também ajusta os contadores de status (ver contadores_alunos).
+
+No modo simulação nada é gravado: o relatório mostra o que seria inserido,
+os conflitos de CPF e as linhas com erro.
+
+A primeira linha da planilha é o cabeçalho, com os nomes dos campos de
+cad_aluno (nome_aluno, dt_nascimento, cpf_aluno, ...) ou apelidos comuns
+(nome, cpf, data_nascimento, status, ...); maiúsculas e acentos são ignorados.
+"""
+
+import csv
+import io
+import re
+import time
+from datetime import date
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from servicos import contadores_alunos, cpf_alunos
+from servicos.busca_alunos import normalizar
+
+TAMANHO_LOTE = 500
+MAX_ITENS_RELATORIO = 1000
+DATA_MINIMA = pd.Timestamp('1900-01-01')
+STATUS_VALIDOS = ('Ativo', 'Inativo', 'Outros')
+
+# Colunas gravadas (mesma ordem do INSERT de cad_aluno, sem cpf_normalizado)
+COLUNAS = (
+    'nome_aluno', 'dt_nascimento', 'cpf_aluno', 'tipo_rede_social', 'rede_social', 'genero',
+    'whatsapp', 'endereco_aluno', 'tipo_responsavel', 'nome_pai', 'nome_mae', 'patologia',
+    'tipo_educacao', 'contato', 'nome_escola', 'turma', 'coordenador_pedagogico',
+    'profissional_AEE', 'cod_cid', 'equipe_multidisciplinar', 'status_aluno', 'observacoes',
+)
+OBRIGATORIAS = ('nome_aluno', 'dt_nascimento', 'cpf_aluno')
+
+APELIDOS = {
+    'nome': 'nome_aluno', 'aluno': 'nome_aluno', 'nome_do_aluno': 'nome_aluno',
+    'cpf': 'cpf_aluno', 'cpf_do_aluno': 'cpf_aluno',
+    'nascimento': 'dt_nascimento', 'data_nascimento': 'dt_nascimento',
+    'data_de_nascimento': 'dt_nascimento',
+    'status': 'status_aluno', 'escola': 'nome_escola', 'endereco': 'endereco_aluno',
+    'cid': 'cod_cid', 'responsavel': 'tipo_responsavel', 'pai': 'nome_pai', 'mae': 'nome_mae',
+}
+
+INSERT = f"""
+    INSERT INTO tbl_cad_alunos ({', '.join(COLUNAS)}, cpf_normalizado)
+    VALUES ({', '.join(['%s'] * (len(COLUNAS) + 1))})
+"""
+
+
+def _chave_cabecalho(texto):
+    return re.sub(r'[^a-z0-9]+', '_', normalizar(texto)).strip('_')
+
+
+_COLUNAS_POR_CHAVE = {_chave_cabecalho(c): c for c in COLUNAS}
+_COLUNAS_POR_CHAVE.update(APELIDOS)
+
+
+def mapear_cabecalho(cabecalho):
+    """
+    {posição: coluna} a partir da linha de cabeçalho
+
+    Raises:
+        ValueError: se faltar alguma coluna obrigatória
+    """
+    mapa = {}
+    for posicao, titulo in enumerate(cabecalho):
+        coluna = _COLUNAS_POR_CHAVE.get(_chave_cabecalho(titulo or ''))
+        if coluna and coluna not in mapa.values():
+            mapa[posicao] = coluna
+    faltando = [c for c in OBRIGATORIAS if c not in mapa.values()]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(faltando)}")
+    return mapa
+
+
+# ---------------------------------------------------------------------- #
+# Leitura
+# ---------------------------------------------------------------------- #
+
+def _registros(linhas, primeira_linha=1):
+    """Gera (número da linha, {coluna: valor}) pulando linhas vazias"""
+    linhas = iter(linhas)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        raise ValueError("Planilha vazia")
+    mapa = mapear_cabecalho(cabecalho)
+    for numero, linha in enumerate(linhas, start=primeira_linha + 1):
+        if not any(v not in (None, '') for v in linha):
+            continue
+        yield numero, {coluna: linha[p] if p < len(linha) else None for p, coluna in mapa.items()}
+
+
+def ler_xlsx(arquivo):
+    """Registros da primeira aba de um xlsx (openpyxl read_only: uma linha por vez)"""
+    import openpyxl
+
+    livro = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        yield from _registros(livro.active.iter_rows(values_only=True))
+    finally:
+        livro.close()
+
+
+def ler_csv(arquivo, encoding='utf-8-sig'):
+    """Registros de um CSV binário (separador ; , ou tab detectado no cabeçalho)"""
+    texto = io.TextIOWrapper(arquivo, encoding=encoding, newline='')
+    primeira = texto.readline()
+    try:
+        separador = csv.Sniffer().sniff(primeira, delimiters=';,\t').delimiter
+    except csv.Error:
+        separador = ';'
+    yield from _registros(csv.reader(chain([primeira], texto), delimiter=separador))
+
+
+def ler_planilha(arquivo, nome_arquivo, encoding='utf-8-sig'):
+    """
+    Registros da planilha conforme a extensão do arquivo
+
+    Raises:
+        ValueError: formato não suportado
+    """
+    extensao = nome_arquivo.rsplit('.', 1)[-1].lower() if '.' in nome_arquivo else ''
+    if extensao in ('xlsx', 'xlsm'):
+        return ler_xlsx(arquivo)
+    if extensao in ('csv', 'txt'):
+        return ler_csv(arquivo, encoding)
+    raise ValueError("Formato não suportado: envie um arquivo .xlsx ou .csv")
+
+
+# ---------------------------------------------------------------------- #
+# Normalização e validação (por lote)
+# ---------------------------------------------------------------------- #
+
+def _texto(valor):
+    """Célula como texto sem espaços nas pontas (None se vazia)"""
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    texto = str(valor).strip()
+    return texto or None
+
+
+def _cpf_em_texto(valor):
+    # CPF digitado como número no Excel perde os zeros à esquerda; volta com a
+    # máscara usada no formulário de cad_aluno
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        d = str(int(valor)).zfill(11)
+        return f'{d[:3]}.{d[3:6]}.{d[6:9]}-{d[9:]}'
+    return valor
+
+
+def cpfs_validos(digitos):
+    """
+    Máscara booleana dos CPFs válidos (11 dígitos e verificadores corretos)
+
+    Args:
+        digitos: Series de textos só com dígitos (ou NA)
+    """
+    validos = np.zeros(len(digitos), dtype=bool)
+    onze = digitos.str.len().eq(11).fillna(False).to_numpy(dtype=bool)
+    if onze.any():
+        matriz = np.frombuffer(''.join(digitos[onze]).encode('ascii'), dtype=np.uint8)
+        matriz = matriz.reshape(-1, 11).astype(np.int64) - ord('0')
+        dv1 = (matriz[:, :9] @ np.arange(10, 1, -1)) * 10 % 11 % 10
+        dv2 = (matriz[:, :10] @ np.arange(11, 1, -1)) * 10 % 11 % 10
+        repetidos = (matriz == matriz[:, :1]).all(axis=1)
+        validos[onze] = (dv1 == matriz[:, 9]) & (dv2 == matriz[:, 10]) & ~repetidos
+    return validos
+
+
+def datas_nascimento(valores):
+    """
+    Series de Timestamps (NaT se inválida) a partir de células de data
+
+    Aceita datas do Excel e textos dd/mm/aaaa ou aaaa-mm-dd; rejeita datas
+    futuras e anteriores a 1900.
+    """
+    texto = valores.astype('string').str.strip()
+    brasileiras = pd.to_datetime(texto, format='%d/%m/%Y', errors='coerce')
+    iso = pd.to_datetime(texto.str.slice(0, 10), format='%Y-%m-%d', errors='coerce')
+    datas = brasileiras.fillna(iso)
+    fora = (datas < DATA_MINIMA) | (datas > pd.Timestamp(date.today()))
+    return datas.mask(fora)
+
+
+def preparar_lote(registros):
+    """
+    Normaliza e valida um lote de registros da planilha
+
+    Returns:
+        lista de (número da linha, valores, cpf normalizado, erros) na ordem recebida
+    """
+    cpfs = pd.Series([_cpf_em_texto(r.get('cpf_aluno')) for _, r in registros], dtype=object)
+    digitos = cpfs.astype('string').str.replace(r'[^0-9]', '', regex=True).replace('', pd.NA)
+    cpf_ok = cpfs_validos(digitos)
+    datas = datas_nascimento(pd.Series([r.get('dt_nascimento') for _, r in registros], dtype=object))
+
+    resultado = []
+    for i, (numero, registro) in enumerate(registros):
+        valores = {coluna: _texto(registro.get(coluna)) for coluna in COLUNAS}
+        valores['cpf_aluno'] = _texto(cpfs.iat[i])
+        erros = []
+        if not valores['nome_aluno']:
+            erros.append("Nome do aluno não informado")
+        if valores['cpf_aluno'] is None:
+            erros.append("CPF não informado")
+        elif not cpf_ok[i]:
+            erros.append(f"CPF inválido: {valores['cpf_aluno']}")
+        if pd.isna(datas.iloc[i]):
+            if valores['dt_nascimento'] is None:
+                erros.append("Data de nascimento não informada")
+            else:
+                erros.append(f"Data de nascimento inválida: {valores['dt_nascimento']}")
+        else:
+            valores['dt_nascimento'] = datas.iloc[i].date()
+        status = (valores['status_aluno'] or 'Ativo').capitalize()
+        if status not in STATUS_VALIDOS:
+            erros.append(f"Status inválido: {valores['status_aluno']}")
+        valores['status_aluno'] = status
+        cpf = digitos.iloc[i] if cpf_ok[i] else None
+        resultado.append((numero, valores, cpf, erros))
+    return resultado
+
+
+# ---------------------------------------------------------------------- #
+# Gravação
+# ---------------------------------------------------------------------- #
+
+class Relatorio:
+    """Resultado da importação (ou da simulação)"""
+
+    def __init__(self, simulacao, max_itens=MAX_ITENS_RELATORIO):
+        self.simulacao = simulacao
+        self.max_itens = max_itens
+        self.linhas = 0
+        self.inseridos = 0
+        self.total_conflitos = 0
+        self.total_erros = 0
+        self.conflitos = []  # {'linha', 'cpf', 'motivo'}
+        self.erros = []      # {'linha', 'erros'}
+        self._inicio = time.perf_counter()
+        self.segundos = 0.0
+
+    def conflito(self, numero, cpf, motivo):
+        self.total_conflitos += 1
+        if len(self.conflitos) < self.max_itens:
+            self.conflitos.append({'linha': numero, 'cpf': cpf, 'motivo': motivo})
+
+    def erro(self, numero, mensagens):
+        self.total_erros += 1
+        if len(self.erros) < self.max_itens:
+            self.erros.append({'linha': numero, 'erros': list(mensagens)})
+
+    def concluir(self):
+        self.segundos = time.perf_counter() - self._inicio
+        self.conflitos.sort(key=lambda c: c['linha'])
+        self.erros.sort(key=lambda e: e['linha'])
+        return self
+
+    def como_dict(self):
+        return {
+            'simulacao': self.simulacao,
+            'linhas': self.linhas,
+            'inseridos': self.inseridos,
+            'conflitos': self.conflitos,
+            'total_conflitos': self.total_conflitos,
+            'erros': self.erros,
+            'total_erros': self.total_erros,
+            'segundos': round(self.segundos, 3),
+            'linhas_por_segundo': round(self.linhas / self.segundos, 1) if self.segundos else None,
+        }
+
+
+def _cpfs_cadastrados(cursor, cpfs):
+    """{cpf_normalizado: id_aluno} dos CPFs já cadastrados (um SELECT ... IN)"""
+    if not cpfs:
+        return {}
+    marcadores = ', '.join(['%s'] * len(cpfs))
+    cursor.execute(
+        f"SELECT cpf_normalizado, id_aluno FROM tbl_cad_alunos WHERE cpf_normalizado IN ({marcadores})",
+        tuple(cpfs)
+    )
+    return {linha['cpf_normalizado']: linha['id_aluno'] for linha in cursor.fetchall()}
+
+
+def _inserir(conexao, cursor, prontos, relatorio):
+    """Insere [(numero, valores, cpf)] numa transação; em conflito de CPF, linha a linha"""
+    try:
+        cursor.executemany(INSERT, [tuple(v[c] for c in COLUNAS) + (cpf,) for _, v, cpf in prontos])
+        for status, quantidade in _contagem_status(prontos).items():
+            contadores_alunos.ajustar(cursor, status, quantidade)
+        conexao.commit()
+        relatorio.inseridos += len(prontos)
+    except Exception as e:
+        conexao.rollback()
+        if len(prontos) > 1:
+            # Outro cadastro com o mesmo CPF entrou no meio: isola a(s) linha(s)
+            for item in prontos:
+                _inserir(conexao, cursor, [item], relatorio)
+        elif cpf_alunos.cpf_duplicado(e):
+            relatorio.conflito(prontos[0][0], prontos[0][1]['cpf_aluno'], "CPF já cadastrado")
+        else:
+            relatorio.erro(prontos[0][0], [f"Erro no banco: {e}"])
+
+
+def _contagem_status(prontos):
+    contagem = {}
+    for _, valores, _ in prontos:
+        contagem[valores['status_aluno']] = contagem.get(valores['status_aluno'], 0) + 1
+    return contagem
+
+
+def _processar_lote(conexao, registros, vistos, relatorio):
+    preparados = preparar_lote(registros)
+    cursor = conexao.cursor()
+    try:
+        cadastrados = _cpfs_cadastrados(
+            cursor, sorted({cpf for _, _, cpf, erros in preparados if cpf and not erros})
+        )
+        prontos = []
+        for numero, valores, cpf, erros in preparados:
+            if erros:
+                relatorio.erro(numero, erros)
+            elif cpf in cadastrados:
+                relatorio.conflito(numero, valores['cpf_aluno'],
+                                   f"CPF já cadastrado (id_aluno {cadastrados[cpf]})")
+            elif cpf in vistos:
+                relatorio.conflito(numero, valores['cpf_aluno'], f"CPF repetido na linha {vistos[cpf]}")
+            else:
+                vistos[cpf] = numero
+                prontos.append((numero, valores, cpf))
+
+        if relatorio.simulacao:
+            relatorio.inseridos += len(prontos)
+        elif prontos:
+            _inserir(conexao, cursor, prontos, relatorio)
+    finally:
+        cursor.close()
+
+
+def importar(conexao, registros, simulacao=False, tamanho_lote=TAMANHO_LOTE,
+             max_itens=MAX_ITENS_RELATORIO):
+    """
+    Importa os registros de ler_planilha() em tbl_cad_alunos
+
+    Cada lote gravado é uma transação própria (um executemany). Chame
+    cpf_alunos.garantir_coluna e contadores_alunos.garantir_tabela antes.
+
+    Args:
+        simulacao: só valida e confere conflitos, sem gravar
+
+    Returns:
+        Relatorio
+    """
+    relatorio = Relatorio(simulacao, max_itens)
+    vistos = {}  # cpf normalizado -> primeira linha do arquivo
+    lote = []
+    for registro in registros:
+        relatorio.linhas += 1
+        lote.append(registro)
+        if len(lote) >= tamanho_lote:
+            _processar_lote(conexao, lote, vistos, relatorio)
+            lote = []
+    if lote:
+        _processar_lote(conexao, lote, vistos, relatorio)
+    return relatorio.concluir()
@@ -0,0 +1,160 @@
+"""
+Importação em massa de respostas de questionário em NDJSON
+
+Cada linha é um objeto JSON no formato de app/resposta_pei_*.json: o id do
+aluno (id_aluno ou aluno_id) e os campos do questionário. Chaves extras
+(nome_aluno, data_envio, ...) são ignoradas.
+
+As linhas são lidas e validadas uma a uma (ver servicos.questionarios), sem
+carregar o arquivo inteiro. As válidas são acumuladas em lotes; cada lote é
+uma transação com um executemany por tabela do questionário. Se um lote
+falhar no banco, ele é desfeito e regravado linha a linha para identificar
+as linhas com problema sem perder as demais.
+"""
+
+import json
+import time
+
+from servicos.questionarios import aluno_id_valido
+
+TAMANHO_LOTE = 500
+MAX_ERROS = 1000
+
+
+class Relatorio:
+    """Resultado da importação: contagens, erros por linha e vazão"""
+
+    def __init__(self, questionario, max_erros=MAX_ERROS):
+        self.questionario = questionario
+        self.max_erros = max_erros
+        self.linhas = 0
+        self.gravadas = 0
+        self.lotes = 0
+        self.total_erros = 0
+        self.erros = []   # [{'linha': n, 'erros': [...]}], no máximo max_erros
+        self.alunos = set()
+        self._inicio = time.perf_counter()
+        self.segundos = 0.0
+
+    def erro(self, numero, mensagens):
+        self.total_erros += 1
+        if len(self.erros) < self.max_erros:
+            self.erros.append({'linha': numero, 'erros': list(mensagens)})
+
+    def concluir(self):
+        self.segundos = time.perf_counter() - self._inicio
+        self.erros.sort(key=lambda e: e['linha'])
+        return self
+
+    def como_dict(self):
+        return {
+            'questionario': self.questionario,
+            'linhas': self.linhas,
+            'gravadas': self.gravadas,
+            'com_erro': self.total_erros,
+            'lotes': self.lotes,
+            'segundos': round(self.segundos, 3),
+            'linhas_por_segundo': round(self.linhas / self.segundos, 1) if self.segundos else None,
+            'erros': self.erros,
+            'erros_omitidos': self.total_erros - len(self.erros),
+        }
+
+
+def _decodificar(linha):
+    """(aluno_id, documento) da linha, ou (None, mensagem de erro)"""
+    if isinstance(linha, bytes):
+        try:
+            linha = linha.decode('utf-8')
+        except UnicodeDecodeError:
+            return None, "Linha não está em UTF-8"
+    try:
+        documento = json.loads(linha)
+    except ValueError as e:
+        return None, f"JSON inválido: {e}"
+    if not isinstance(documento, dict):
+        return None, "Cada linha deve ser um objeto JSON"
+    aluno_id = documento.get('aluno_id', documento.get('id_aluno'))
+    return aluno_id, documento
+
+
+def _alunos_existentes(cursor, ids):
+    marcadores = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"SELECT id_aluno FROM tbl_cad_alunos WHERE id_aluno IN ({marcadores})", tuple(ids))
+    return {linha['id_aluno'] for linha in cursor.fetchall()}
+
+
+def _gravar_lote(conexao, questionario, lote, relatorio, antes_do_commit):
+    """Grava um lote [(numero, aluno_id, valores)] numa transação"""
+    cursor = conexao.cursor()
+    try:
+        existentes = _alunos_existentes(cursor, sorted({aluno_id for _, aluno_id, _ in lote}))
+        validas = []
+        for numero, aluno_id, valores in lote:
+            if aluno_id in existentes:
+                validas.append((numero, aluno_id, valores))
+            else:
+                relatorio.erro(numero, [f"Aluno {aluno_id} não encontrado"])
+        if not validas:
+            return
+
+        try:
+            questionario.gravar(cursor, [(aluno_id, valores) for _, aluno_id, valores in validas])
+            if antes_do_commit is not None:
+                antes_do_commit(cursor, sorted({aluno_id for _, aluno_id, _ in validas}))
+            conexao.commit()
+        except Exception:
+            conexao.rollback()
+            if len(validas) == 1:
+                raise
+            # Isola as linhas problemáticas regravando uma por transação
+            for item in validas:
+                _gravar_lote(conexao, questionario, [item], relatorio, antes_do_commit)
+            return
+
+        relatorio.gravadas += len(validas)
+        relatorio.lotes += 1
+        relatorio.alunos.update(aluno_id for _, aluno_id, _ in validas)
+    except Exception as e:
+        conexao.rollback()
+        for numero, _, _ in lote:
+            relatorio.erro(numero, [f"Erro no banco: {e}"])
+    finally:
+        cursor.close()
+
+
+def importar(conexao, questionario, linhas, tamanho_lote=TAMANHO_LOTE, antes_do_commit=None,
+             max_erros=MAX_ERROS):
+    """
+    Valida e grava as respostas de um iterável de linhas NDJSON
+
+    Args:
+        questionario: Questionario do registro (PEI, PEDI ou GUIDE)
+        linhas: iterável de str/bytes (arquivo aberto, request.stream, ...)
+        antes_do_commit: chamada com (cursor, ids dos alunos) dentro da
+                         transação de cada lote (ex.: atualizar o resumo GUIDE)
+
+    Returns:
+        Relatorio (linhas em branco não contam)
+    """
+    relatorio = Relatorio(questionario.nome, max_erros)
+    lote = []
+    for numero, linha in enumerate(linhas, start=1):
+        if not linha.strip():
+            continue
+        relatorio.linhas += 1
+        aluno_id, documento = _decodificar(linha)
+        if not isinstance(documento, dict):
+            relatorio.erro(numero, [documento])
+            continue
+        valores = questionario.extrair(documento)
+        erros = questionario.validar(aluno_id, valores)
+        if erros:
+            relatorio.erro(numero, erros)
+            continue
+        lote.append((numero, aluno_id_valido(aluno_id), valores))
+        if len(lote) >= tamanho_lote:
+            _gravar_lote(conexao, questionario, lote, relatorio, antes_do_commit)
+            lote = []
+    if lote:
+        _gravar_lote(conexao, questionario, lote, relatorio, antes_do_commit)
+    return relatorio.concluir()
@@ -0,0 +1,89 @@
+"""
+Listagem paginada de alunos para /baixa_alunos
+
+A página carregava tbl_cad_alunos inteira. Aqui a listagem é paginada por
+chave (keyset) em (nome_aluno, id_aluno): cada página continua a partir do
+último aluno da anterior usando o índice, sem OFFSET, então o custo por
+página não cresce com o número de matrículas. Os filtros por nome, status e
+patologia são aplicados no banco.
+
+O cursor e a continuação de página ficam em servicos.paginacao (cursor
+base64 de [nome, id]).
+"""
+
+from servicos import paginacao
+
+POR_PAGINA_PADRAO = 50
+POR_PAGINA_MAXIMO = 200
+STATUS_VALIDOS = ('Ativo', 'Inativo')
+
+COLUNAS = "id_aluno, matricula_aluno, nome_aluno, dt_nascimento, idade, patologia, status_aluno"
+
+# (status_aluno, ...) atende o filtro por status sem perder a ordem por nome
+INDICES = (
+    ('idx_cad_alunos_nome', 'nome_aluno, id_aluno'),
+    ('idx_cad_alunos_status_nome', 'status_aluno, nome_aluno, id_aluno'),
+)
+
+
+def filtros_da_requisicao(valores):
+    """Filtros aceitos (nome, status, patologia) a partir de request.args/request.form"""
+    status = (valores.get('status') or '').strip().capitalize()
+    return {
+        'nome': (valores.get('nome') or '').strip(),
+        'status': status if status in STATUS_VALIDOS else '',
+        'patologia': (valores.get('patologia') or '').strip(),
+    }
+
+
+def por_pagina_da_requisicao(valores):
+    return paginacao.por_pagina_da_requisicao(valores, POR_PAGINA_PADRAO, POR_PAGINA_MAXIMO)
+
+
+def _condicoes(filtros):
+    condicoes, parametros = [], []
+    if filtros.get('status'):
+        condicoes.append("status_aluno = %s")
+        parametros.append(filtros['status'])
+    if filtros.get('nome'):
+        condicoes.append("nome_aluno LIKE %s")
+        parametros.append(f"%{paginacao.escapar_like(filtros['nome'])}%")
+    if filtros.get('patologia'):
+        condicoes.append("patologia LIKE %s")
+        parametros.append(f"%{paginacao.escapar_like(filtros['patologia'])}%")
+    return condicoes, parametros
+
+
+def pagina(cursor, filtros, apos=None, antes=None, por_pagina=POR_PAGINA_PADRAO):
+    """
+    Uma página de alunos ordenada por (nome_aluno, id_aluno)
+
+    Args:
+        apos: cursor da página seguinte (alunos depois dele)
+        antes: cursor da página anterior (alunos antes dele)
+
+    Returns:
+        dict com alunos, proximo e anterior (cursores ou None)
+    """
+    condicoes, parametros = _condicoes(filtros)
+    alunos, proximo, anterior = paginacao.pagina(
+        cursor, f"SELECT {COLUNAS} FROM tbl_cad_alunos", condicoes, parametros,
+        ('nome_aluno', 'id_aluno'), apos=apos, antes=antes, por_pagina=por_pagina
+    )
+    return {'alunos': alunos, 'proximo': proximo, 'anterior': anterior}
+
+
+def ids_filtrados(cursor, filtros):
+    """Ids de todos os alunos que atendem os filtros (seleção "todos" em baixa_lote)"""
+    condicoes, parametros = _condicoes(filtros)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    cursor.execute(f"SELECT id_aluno FROM tbl_cad_alunos {where} ORDER BY nome_aluno, id_aluno", parametros)
+    return [linha['id_aluno'] for linha in cursor.fetchall()]
+
+
+def aluno_json(aluno):
+    """Linha da listagem em tipos serializáveis"""
+    dados = dict(aluno)
+    if dados.get('dt_nascimento'):
+        dados['dt_nascimento'] = dados['dt_nascimento'].isoformat()
+    return dados
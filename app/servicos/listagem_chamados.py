@@ -0,0 +1,137 @@
+"""
+Listagem paginada dos chamados de suporte para /suport
+
+A página fazia SELECT * em tbl_chamados_suport inteira a cada acesso (e a
+cada chamado aberto). Aqui a listagem é paginada por chave (keyset) em
+(data_criacao, chave primária), do mais recente para o mais antigo, sem
+OFFSET, e filtrável por tipo, período (data_criacao) e usuário (início do
+nome). Só entram as colunas exibidas, a descrição já cortada e a evidência
+como metadados (nome, hash, tipo, tamanho; ver servicos.evidencias_suporte).
+
+A tabela é criada fora do app e o nome da chave primária não é fixo: ele é
+lido do information_schema (e id_chamado é criada se não houver chave).
+
+O cursor e a continuação de página ficam em servicos.paginacao (cursor
+base64 de [data_criacao, id]).
+"""
+
+from datetime import datetime, timedelta
+
+from servicos import paginacao
+from servicos.esquema import chave_primaria, garantir_colunas, garantir_indices
+
+TABELA = 'tbl_chamados_suport'
+POR_PAGINA_PADRAO = 20
+POR_PAGINA_MAXIMO = 100
+TAMANHO_RESUMO = 300  # caracteres da descrição na listagem
+TIPOS = ('Erro Sistema', 'Liberação Senha', 'Resgate Acesso', 'Treinamento', 'Melhoria Sistema',
+         'Outros Não Listado')
+
+
+def garantir_esquema(conexao):
+    """
+    Chave primária, coluna do hash da evidência e índices da listagem
+
+    Returns:
+        nome da coluna da chave primária
+    """
+    chave = chave_primaria(conexao, TABELA)
+    if chave is None:
+        garantir_colunas(conexao, TABELA, (('id_chamado', 'INT NOT NULL AUTO_INCREMENT PRIMARY KEY FIRST'),))
+        chave = 'id_chamado'
+    garantir_colunas(conexao, TABELA, (('evidencia_sha256', 'CHAR(64) NULL'),))
+    # tipo/nome_usuario podem ser TEXT na tabela original: sem índice, a consulta só fica mais lenta
+    garantir_indices(conexao, TABELA, (
+        ('idx_chamados_data', f'data_criacao, {chave}'),
+        ('idx_chamados_tipo_data', f'tipo, data_criacao, {chave}'),
+        ('idx_chamados_usuario_data', f'nome_usuario, data_criacao, {chave}'),
+        ('idx_chamados_evidencia', 'evidencia_sha256'),
+    ), tolerante=True)
+    return chave
+
+
+def filtros_da_requisicao(valores):
+    """Filtros aceitos (tipo, data_de, data_ate, usuario) a partir de request.args"""
+    tipo = (valores.get('tipo') or '').strip()
+    data_de, data_ate = paginacao.data(valores.get('data_de')), paginacao.data(valores.get('data_ate'))
+    return {
+        'tipo': tipo if tipo in TIPOS else '',
+        'data_de': data_de.isoformat() if data_de else '',
+        'data_ate': data_ate.isoformat() if data_ate else '',
+        'usuario': (valores.get('usuario') or '').strip()[:100],
+    }
+
+
+def por_pagina_da_requisicao(valores):
+    return paginacao.por_pagina_da_requisicao(valores, POR_PAGINA_PADRAO, POR_PAGINA_MAXIMO)
+
+
+def _condicoes(filtros):
+    condicoes, parametros = [], []
+    if filtros.get('tipo'):
+        condicoes.append("c.tipo = %s")
+        parametros.append(filtros['tipo'])
+    if filtros.get('data_de'):
+        condicoes.append("c.data_criacao >= %s")
+        parametros.append(filtros['data_de'])
+    if filtros.get('data_ate'):
+        # Inclui o dia inteiro de data_ate
+        condicoes.append("c.data_criacao < %s")
+        parametros.append((datetime.fromisoformat(filtros['data_ate']) + timedelta(days=1)).date().isoformat())
+    if filtros.get('usuario'):
+        condicoes.append("c.nome_usuario LIKE %s")
+        parametros.append(f"{paginacao.escapar_like(filtros['usuario'])}%")
+    return condicoes, parametros
+
+
+def pagina(cursor, chave, filtros, apos=None, antes=None, por_pagina=POR_PAGINA_PADRAO):
+    """
+    Uma página de chamados ordenada por (data_criacao, chave) decrescente
+
+    Args:
+        chave: coluna da chave primária (de garantir_esquema)
+        apos: cursor da página seguinte (chamados mais antigos que ele)
+        antes: cursor da página anterior (chamados mais recentes que ele)
+
+    Returns:
+        dict com chamados, proximo e anterior (cursores ou None)
+    """
+    condicoes, parametros = _condicoes(filtros)
+    chamados, proximo, anterior = paginacao.pagina(
+        cursor, f"""
+        SELECT c.{chave} AS id, c.tipo, c.data_registro, c.data_criacao, c.nome_usuario,
+               LEFT(c.descricao, {TAMANHO_RESUMO}) AS descricao, CHAR_LENGTH(c.descricao) AS tamanho_descricao,
+               c.evidencia AS evidencia_nome, c.evidencia_sha256,
+               e.tipo AS evidencia_tipo, e.tamanho AS evidencia_tamanho
+        FROM {TABELA} c
+        LEFT JOIN tbl_evidencias_suporte e ON e.sha256 = c.evidencia_sha256
+        """, condicoes, parametros, ('c.data_criacao', f'c.{chave}'), campos=('data_criacao', 'id'),
+        apos=apos, antes=antes, por_pagina=por_pagina, decrescente=True,
+        validar=datetime.fromisoformat, montar=_compactar
+    )
+    return {'chamados': chamados, 'proximo': proximo, 'anterior': anterior}
+
+
+def _compactar(linha):
+    """Linha da consulta -> chamado com a evidência agrupada (ou None)"""
+    chamado = {chave: linha[chave] for chave in
+               ('id', 'tipo', 'data_registro', 'data_criacao', 'nome_usuario', 'descricao')}
+    chamado['descricao_cortada'] = (linha['tamanho_descricao'] or 0) > TAMANHO_RESUMO
+    chamado['evidencia'] = None
+    if linha['evidencia_nome'] or linha['evidencia_sha256']:
+        chamado['evidencia'] = {
+            'nome': linha['evidencia_nome'],
+            'sha256': linha['evidencia_sha256'],
+            'tipo': linha['evidencia_tipo'],
+            'tamanho': linha['evidencia_tamanho'],
+        }
+    return chamado
+
+
+def chamado_json(chamado):
+    """Chamado da listagem em tipos serializáveis"""
+    dados = dict(chamado)
+    for campo in ('data_registro', 'data_criacao'):
+        if hasattr(dados.get(campo), 'isoformat'):
+            dados[campo] = dados[campo].isoformat()
+    return dados
@@ -0,0 +1,103 @@
+"""
+Listagem paginada dos relatórios de avaliação para /listar_relatorios
+
+A rota carregava tbl_rel_ava_anterior inteira e testava anexo_doc (BLOB) em
+cada linha. Aqui só entram colunas de texto e os metadados do anexo
+(tem_anexo, anexo_tamanho, ver servicos.anexos), e a paginação é por chave
+(keyset) em (data_inicio, id_relatorio), do mais recente para o mais antigo,
+sem OFFSET. Os filtros por aluno, questionário e período (data_inicio) usam
+índices que terminam nas mesmas colunas da ordenação.
+
+O cursor e a continuação de página ficam em servicos.paginacao (cursor
+base64 de [data_inicio, id]).
+"""
+
+from datetime import datetime
+
+from servicos import paginacao
+
+POR_PAGINA_PADRAO = 50
+POR_PAGINA_MAXIMO = 200
+QUESTIONARIOS = ('PEI', 'PDI', 'GUIDE', 'OUTROS')
+
+COLUNAS = ("id_relatorio, nome_aluno, data_inicio, data_fim, responsavel_av, questionario, aluno_id, "
+           "tem_anexo, anexo_tamanho, anexo_nome")
+# ver_relatorio e o PDF: tudo menos anexo_doc
+COLUNAS_RELATORIO = COLUNAS + ", relatorio, anexo_sha256, anexo_tipo"
+
+INDICES = (
+    ('idx_rel_ava_data', 'data_inicio, id_relatorio'),
+    ('idx_rel_ava_aluno_data', 'aluno_id, data_inicio, id_relatorio'),
+    ('idx_rel_ava_questionario_data', 'questionario, data_inicio, id_relatorio'),
+)
+
+
+def filtros_da_requisicao(valores):
+    """Filtros aceitos (aluno, questionario, data_de, data_ate) a partir de request.args"""
+    aluno = (valores.get('aluno') or '').strip()
+    questionario = (valores.get('questionario') or '').strip().upper()
+    data_de, data_ate = paginacao.data(valores.get('data_de')), paginacao.data(valores.get('data_ate'))
+    return {
+        'aluno': aluno if aluno.isdigit() else '',
+        'questionario': questionario if questionario in QUESTIONARIOS else '',
+        'data_de': data_de.isoformat() if data_de else '',
+        'data_ate': data_ate.isoformat() if data_ate else '',
+    }
+
+
+def por_pagina_da_requisicao(valores):
+    return paginacao.por_pagina_da_requisicao(valores, POR_PAGINA_PADRAO, POR_PAGINA_MAXIMO)
+
+
+def _condicoes(filtros):
+    condicoes, parametros = [], []
+    if filtros.get('aluno'):
+        condicoes.append("aluno_id = %s")
+        parametros.append(int(filtros['aluno']))
+    if filtros.get('questionario'):
+        condicoes.append("questionario = %s")
+        parametros.append(filtros['questionario'])
+    if filtros.get('data_de'):
+        condicoes.append("data_inicio >= %s")
+        parametros.append(filtros['data_de'])
+    if filtros.get('data_ate'):
+        condicoes.append("data_inicio <= %s")
+        parametros.append(filtros['data_ate'])
+    return condicoes, parametros
+
+
+def pagina(cursor, filtros, apos=None, antes=None, por_pagina=POR_PAGINA_PADRAO):
+    """
+    Uma página de relatórios ordenada por (data_inicio, id_relatorio) decrescente
+
+    Args:
+        apos: cursor da página seguinte (relatórios mais antigos que ele)
+        antes: cursor da página anterior (relatórios mais recentes que ele)
+
+    Returns:
+        dict com relatorios, proximo e anterior (cursores ou None)
+    """
+    condicoes, parametros = _condicoes(filtros)
+    relatorios, proximo, anterior = paginacao.pagina(
+        cursor, f"SELECT {COLUNAS} FROM tbl_rel_ava_anterior", condicoes, parametros,
+        ('data_inicio', 'id_relatorio'), apos=apos, antes=antes, por_pagina=por_pagina,
+        decrescente=True, validar=datetime.fromisoformat
+    )
+    return {'relatorios': relatorios, 'proximo': proximo, 'anterior': anterior}
+
+
+def carregar(cursor, id_relatorio):
+    """Um relatório sem o BLOB do anexo (None se não existir)"""
+    cursor.execute(f"SELECT {COLUNAS_RELATORIO} FROM tbl_rel_ava_anterior WHERE id_relatorio = %s",
+                   (id_relatorio,))
+    return cursor.fetchone()
+
+
+def relatorio_json(relatorio):
+    """Linha da listagem em tipos serializáveis"""
+    dados = dict(relatorio)
+    for campo in ('data_inicio', 'data_fim'):
+        if dados.get(campo):
+            dados[campo] = dados[campo].isoformat()
+    dados['tem_anexo'] = bool(dados.get('tem_anexo'))
+    return dados
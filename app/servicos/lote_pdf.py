@@ -0,0 +1,133 @@
+"""
+Geração em lote de PDFs (todos os alunos ativos) empacotados num ZIP
+
+O HTML de cada aluno é renderizado no processo do Flask (Jinja é rápido e
+precisa do app); a conversão HTML -> PDF, que domina o tempo, é distribuída
+entre os processos aquecidos de um Renderizador (render_pdf), por padrão um
+por núcleo. O ZIP é escrito em streaming: cada PDF pronto vira bytes
+enviados ao cliente (ou gravados em arquivo) sem montar o pacote inteiro em
+memória.
+"""
+
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from servicos.render_pdf import html_para_pdf
+
+
+def processos_padrao():
+    """Um processo por núcleo disponível para este processo"""
+    try:
+        return max(len(os.sched_getaffinity(0)), 1)
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def converter_em_paralelo(itens, renderizador, janela=None):
+    """
+    Converte HTML em PDF em paralelo, devolvendo os resultados conforme ficam prontos
+
+    Args:
+        itens: iterável de (chave, trabalho), onde trabalho é a tupla de
+               argumentos de html_para_pdf (motor, html, css, hints) ou None
+               quando não há nada a converter (ex.: PDF já em cache)
+        renderizador: render_pdf.Renderizador cujos processos fazem a conversão
+        janela: máximo de conversões submetidas e ainda não consumidas
+                (limita o HTML/PDF retido em memória; padrão: 2x processos)
+
+    Yields:
+        (chave, pdf, erro): pdf é None se trabalho era None ou se a conversão falhou
+    """
+    janela = janela or renderizador.processos * 2
+
+    with renderizador.reservar() as pool:
+        pendentes = {}
+
+        def concluir(futuros):
+            for futuro in futuros:
+                chave = pendentes.pop(futuro)
+                erro = futuro.exception()
+                yield chave, (None if erro else futuro.result()), erro
+
+        for chave, trabalho in itens:
+            if trabalho is None:
+                yield chave, None, None
+                continue
+            if len(pendentes) >= janela:
+                prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                yield from concluir(prontos)
+            pendentes[pool.submit(html_para_pdf, *trabalho)] = chave
+
+        while pendentes:
+            prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            yield from concluir(prontos)
+
+
+class _BufferZip(io.RawIOBase):
+    """Destino não posicionável do ZipFile; os bytes gravados são drenados pelo gerador"""
+
+    def __init__(self):
+        self._blocos = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._blocos.append(bytes(dados))
+        return len(dados)
+
+    def drenar(self):
+        dados = b''.join(self._blocos)
+        self._blocos.clear()
+        return dados
+
+
+def zip_em_stream(entradas):
+    """
+    Gera os bytes de um ZIP a partir de (nome, conteudo) sem precisar de seek
+
+    PDFs já são comprimidos internamente, então as entradas são armazenadas
+    sem nova compressão (ZIP_STORED), o que mantém o empacotamento barato.
+    """
+    buffer = _BufferZip()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as arquivo_zip:
+        for nome, conteudo in entradas:
+            arquivo_zip.writestr(nome, conteudo)
+            dados = buffer.drenar()
+            if dados:
+                yield dados
+    yield buffer.drenar()
+
+
+class Vazao:
+    """Contador de PDFs gerados por segundo"""
+
+    def __init__(self, total):
+        self.total = total
+        self.gerados = 0
+        self.em_cache = 0
+        self.falhas = []
+        self.inicio = time.perf_counter()
+
+    @property
+    def decorrido(self):
+        return time.perf_counter() - self.inicio
+
+    @property
+    def pdfs_por_segundo(self):
+        return (self.gerados + self.em_cache) / self.decorrido if self.decorrido else 0.0
+
+    def resumo(self):
+        linhas = [
+            f"Alunos: {self.total}",
+            f"PDFs gerados: {self.gerados}",
+            f"PDFs reaproveitados do cache: {self.em_cache}",
+            f"Falhas: {len(self.falhas)}",
+            f"Tempo: {self.decorrido:.1f}s",
+            f"Vazão: {self.pdfs_por_segundo:.2f} PDFs/s",
+        ]
+        linhas += [f"  - {nome}: {erro}" for nome, erro in self.falhas]
+        return '\n'.join(linhas) + '\n'
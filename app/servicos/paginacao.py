@@ -0,0 +1,145 @@
+"""
+Paginação por chave (keyset) das listagens
+
+As listagens (listagem_alunos, listagem_relatorios, listagem_chamados)
+ordenam por (coluna, chave primária) e continuam a partir do último item
+da página anterior, sem OFFSET. O cursor de página é opaco para o cliente
+(base64 de [valor, id]; valor NULL vira null). Cada listagem só monta o SELECT, os filtros e o
+formato das linhas; o cursor, a condição de continuação, a ordem e a
+inversão ao voltar ficam aqui.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+
+def por_pagina_da_requisicao(valores, padrao, maximo):
+    """?por_pagina= limitado a [1, maximo] (padrao se ausente/inválido)"""
+    try:
+        por_pagina = int(valores.get('por_pagina') or padrao)
+    except ValueError:
+        por_pagina = padrao
+    return min(max(por_pagina, 1), maximo)
+
+
+def escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def data(texto):
+    """Data 'AAAA-MM-DD' de um filtro, ou None"""
+    try:
+        return datetime.strptime((texto or '').strip(), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def codificar_cursor(valor, id_item):
+    if valor is not None and not isinstance(valor, str):
+        valor = str(valor)
+    bruto = json.dumps([valor, id_item], ensure_ascii=False)
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token, validar=None):
+    """
+    (valor, id) do cursor, ou None se ausente/inválido (volta à primeira página)
+
+    O valor pode ser None (a linha da borda tinha a coluna NULL).
+
+    Args:
+        validar: função que recusa o valor com ValueError, ex.:
+                 datetime.fromisoformat (o texto vai direto como parâmetro)
+    """
+    if not token:
+        return None
+    try:
+        valor, id_item = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if valor is not None:
+            valor = str(valor)
+            if validar is not None:
+                validar(valor)
+        return valor, int(id_item)
+    except (ValueError, TypeError):
+        return None
+
+
+def _continuacao(coluna, chave, valor, id_item, crescente):
+    """
+    Condição "depois de (valor, id_item)" na ordem da consulta, e os parâmetros
+
+    O MySQL põe os NULL antes de tudo em ASC e depois de tudo em DESC: numa
+    borda NULL só seguem os NULL de id maior/menor (e, em ASC, todos os não
+    NULL); numa borda com valor, em DESC, os NULL vêm depois.
+    """
+    operador = '>' if crescente else '<'
+    if valor is None:
+        condicao = f"({coluna} IS NULL AND {chave} {operador} %s)"
+        if crescente:
+            condicao = f"({condicao} OR {coluna} IS NOT NULL)"
+        return condicao, [id_item]
+    condicao = f"{coluna} {operador} %s OR ({coluna} = %s AND {chave} {operador} %s)"
+    if not crescente:
+        condicao += f" OR {coluna} IS NULL"
+    return f"({condicao})", [valor, valor, id_item]
+
+
+def pagina(cursor, consulta, condicoes, parametros, colunas, campos=None, apos=None, antes=None,
+           por_pagina=50, decrescente=False, validar=None, montar=None):
+    """
+    Uma página ordenada por `colunas` (valor, chave primária)
+
+    Args:
+        consulta: 'SELECT ... FROM ...' sem WHERE/ORDER BY/LIMIT
+        condicoes, parametros: filtros da listagem (são copiados)
+        colunas: (coluna de ordenação, chave primária) no SQL, ex.:
+                 ('c.data_criacao', 'c.id_chamado')
+        campos: as mesmas duas colunas nas linhas de `montar` (padrão: colunas)
+        apos: cursor da página seguinte
+        antes: cursor da página anterior
+        decrescente: do maior para o menor (mais recente primeiro)
+        validar: ver decodificar_cursor
+        montar: linha da consulta -> item da página
+
+    Returns:
+        (itens, proximo, anterior), com os cursores ou None
+    """
+    campos = campos or colunas
+    condicoes, parametros = list(condicoes), list(parametros)
+    cursor_antes = decodificar_cursor(antes, validar)
+    limite = cursor_antes or decodificar_cursor(apos, validar)
+    voltando = cursor_antes is not None
+
+    # Voltar é percorrer no sentido contrário a partir do cursor e inverter
+    crescente = voltando == decrescente
+    if limite is not None:
+        condicao, valores = _continuacao(*colunas, *limite, crescente)
+        condicoes.append(condicao)
+        parametros += valores
+
+    ordem = 'ASC' if crescente else 'DESC'
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    cursor.execute(f"""
+        {consulta}
+        {where}
+        ORDER BY {colunas[0]} {ordem}, {colunas[1]} {ordem}
+        LIMIT %s
+    """, (*parametros, por_pagina + 1))
+    linhas = cursor.fetchall()
+    itens = [montar(linha) for linha in linhas] if montar else list(linhas)
+
+    def cursor_de(item):
+        return codificar_cursor(item[campos[0]], item[campos[1]])
+
+    ha_mais = len(itens) > por_pagina
+    itens = itens[:por_pagina]
+    if voltando:
+        itens.reverse()
+        anterior = cursor_de(itens[0]) if ha_mais else None
+        proximo = cursor_de(itens[-1]) if itens else None
+    else:
+        anterior = cursor_de(itens[0]) if limite is not None and itens else None
+        proximo = cursor_de(itens[-1]) if ha_mais else None
+
+    return itens, proximo, anterior
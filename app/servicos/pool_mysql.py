@@ -0,0 +1,291 @@
+"""
+Pool de conexões MySQL para o NeuroEduca
+
+Substitui o flask_mysqldb, que abre uma conexão nova (TCP + autenticação) a
+cada requisição. O objeto PoolMySQL expõe o mesmo atributo `connection`, então
+as rotas continuam usando `mysql.connection.cursor()`, `commit()` e
+`rollback()` sem alterações: a conexão é retirada do pool no primeiro acesso
+dentro da requisição e devolvida no teardown do contexto da aplicação.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from flask import g
+
+
+class PoolEsgotadoError(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo de espera configurado"""
+
+
+class _ConexaoOciosa:
+    __slots__ = ('conexao', 'devolvida_em')
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.devolvida_em = time.monotonic()
+
+
+class PoolConexoes:
+    """
+    Pool thread-safe de conexões MySQLdb
+
+    Args:
+        fabrica: função sem argumentos que abre uma conexão nova
+        tamanho_min: conexões mantidas abertas mesmo ociosas
+        tamanho_max: limite de conexões abertas (ociosas + em uso)
+        tempo_espera: segundos aguardando uma conexão livre antes de falhar
+        tempo_ocioso: conexões ociosas além do mínimo são fechadas após esse tempo
+        intervalo_ping: só faz ping na retirada se a conexão ficou ociosa por
+                        mais que esse tempo (0 = ping em toda retirada)
+    """
+
+    def __init__(self, fabrica, tamanho_min=1, tamanho_max=4, tempo_espera=10.0,
+                 tempo_ocioso=300, intervalo_ping=5):
+        if tamanho_max < 1 or tamanho_min < 0 or tamanho_min > tamanho_max:
+            raise ValueError(f"Tamanho de pool inválido: min={tamanho_min}, max={tamanho_max}")
+
+        self._fabrica = fabrica
+        self.tamanho_min = tamanho_min
+        self.tamanho_max = tamanho_max
+        self.tempo_espera = tempo_espera
+        self.tempo_ocioso = tempo_ocioso
+        self.intervalo_ping = intervalo_ping
+
+        self._condicao = threading.Condition()
+        self._ociosas = deque()
+        self._abertas = 0
+        self._pid = os.getpid()
+
+        self._metricas = {
+            'retiradas': 0,
+            'conexoes_criadas': 0,
+            'reconexoes': 0,
+            'conexoes_recolhidas': 0,
+            'esgotamentos': 0,
+            'espera_total_ms': 0.0,
+            'espera_max_ms': 0.0,
+        }
+
+    # ------------------------------------------------------------------ #
+    # Retirada / devolução
+    # ------------------------------------------------------------------ #
+
+    def retirar(self):
+        """Retorna uma conexão saudável, aguardando se o pool estiver cheio"""
+        self._verificar_fork()
+        inicio = time.monotonic()
+        limite = inicio + self.tempo_espera
+
+        with self._condicao:
+            while True:
+                if self._ociosas:
+                    item = self._ociosas.pop()  # LIFO: a mais recente tende a estar viva
+                    break
+                if self._abertas < self.tamanho_max:
+                    self._abertas += 1
+                    item = None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._metricas['esgotamentos'] += 1
+                    raise PoolEsgotadoError(
+                        f"Nenhuma conexão livre após {self.tempo_espera:.1f}s "
+                        f"({self._abertas}/{self.tamanho_max} em uso)"
+                    )
+                self._condicao.wait(restante)
+
+            espera_ms = (time.monotonic() - inicio) * 1000
+            self._metricas['retiradas'] += 1
+            self._metricas['espera_total_ms'] += espera_ms
+            self._metricas['espera_max_ms'] = max(self._metricas['espera_max_ms'], espera_ms)
+
+        try:
+            if item is None:
+                return self._criar()
+            return self._validar(item)
+        except Exception:
+            # A vaga reservada volta para o pool se a conexão não puder ser aberta
+            with self._condicao:
+                self._abertas -= 1
+                self._condicao.notify()
+            raise
+
+    def devolver(self, conexao, descartar=False):
+        """Devolve a conexão ao pool, encerrando qualquer transação pendente"""
+        if os.getpid() != self._pid:
+            return
+
+        if not descartar:
+            try:
+                # Sem isso a próxima requisição herdaria o snapshot da transação
+                # de leitura aberta (REPEATABLE READ) e veria dados antigos
+                conexao.rollback()
+            except Exception:
+                descartar = True
+
+        with self._condicao:
+            if descartar:
+                self._abertas -= 1
+                self._fechar(conexao)
+            else:
+                self._ociosas.append(_ConexaoOciosa(conexao))
+            self._recolher_ociosas()
+            self._condicao.notify()
+
+    # ------------------------------------------------------------------ #
+    # Manutenção
+    # ------------------------------------------------------------------ #
+
+    def _criar(self):
+        conexao = self._fabrica()
+        with self._condicao:
+            self._metricas['conexoes_criadas'] += 1
+        return conexao
+
+    def _validar(self, item):
+        """Ping na retirada; reconecta se o servidor derrubou a conexão ociosa"""
+        if time.monotonic() - item.devolvida_em < self.intervalo_ping:
+            return item.conexao
+        try:
+            item.conexao.ping()
+            return item.conexao
+        except Exception:
+            self._fechar(item.conexao)
+            with self._condicao:
+                self._metricas['reconexoes'] += 1
+            return self._criar()
+
+    def _recolher_ociosas(self):
+        """Fecha conexões ociosas há mais de `tempo_ocioso` acima do mínimo (chamar com o lock)"""
+        agora = time.monotonic()
+        # As mais antigas ficam no início da deque
+        while (self._ociosas and self._abertas > self.tamanho_min
+               and agora - self._ociosas[0].devolvida_em > self.tempo_ocioso):
+            item = self._ociosas.popleft()
+            self._abertas -= 1
+            self._metricas['conexoes_recolhidas'] += 1
+            self._fechar(item.conexao)
+
+    def _verificar_fork(self):
+        """Conexões herdadas de outro processo (fork do gunicorn) não podem ser reusadas"""
+        if os.getpid() == self._pid:
+            return
+        with self._condicao:
+            if os.getpid() != self._pid:
+                self._ociosas.clear()
+                self._abertas = 0
+                self._pid = os.getpid()
+
+    @staticmethod
+    def _fechar(conexao):
+        try:
+            conexao.close()
+        except Exception:
+            pass
+
+    def fechar_todas(self):
+        with self._condicao:
+            while self._ociosas:
+                item = self._ociosas.popleft()
+                self._abertas -= 1
+                self._fechar(item.conexao)
+
+    def metricas(self):
+        with self._condicao:
+            dados = dict(self._metricas)
+            dados['abertas'] = self._abertas
+            dados['ociosas'] = len(self._ociosas)
+            dados['em_uso'] = self._abertas - len(self._ociosas)
+            dados['tamanho_min'] = self.tamanho_min
+            dados['tamanho_max'] = self.tamanho_max
+        retiradas = dados['retiradas'] or 1
+        dados['espera_media_ms'] = round(dados['espera_total_ms'] / retiradas, 3)
+        dados['espera_total_ms'] = round(dados['espera_total_ms'], 3)
+        dados['espera_max_ms'] = round(dados['espera_max_ms'], 3)
+        return dados
+
+
+class PoolMySQL:
+    """
+    Integração do PoolConexoes com o Flask, compatível com flask_mysqldb.MySQL
+
+    Lê as mesmas chaves MYSQL_* do app.config, além de:
+        MYSQL_POOL_MIN_SIZE, MYSQL_POOL_MAX_SIZE, MYSQL_POOL_TIMEOUT,
+        MYSQL_POOL_IDLE_TIMEOUT, MYSQL_POOL_PING_INTERVAL
+    """
+
+    def __init__(self, app=None):
+        self.pool = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MYSQL_HOST', 'localhost')
+        app.config.setdefault('MYSQL_USER', None)
+        app.config.setdefault('MYSQL_PASSWORD', None)
+        app.config.setdefault('MYSQL_DB', None)
+        app.config.setdefault('MYSQL_PORT', 3306)
+        app.config.setdefault('MYSQL_UNIX_SOCKET', None)
+        app.config.setdefault('MYSQL_CONNECT_TIMEOUT', 10)
+        app.config.setdefault('MYSQL_CHARSET', 'utf8')
+        app.config.setdefault('MYSQL_CURSORCLASS', None)
+        app.config.setdefault('MYSQL_POOL_MIN_SIZE', 1)
+        app.config.setdefault('MYSQL_POOL_MAX_SIZE', 4)
+        app.config.setdefault('MYSQL_POOL_TIMEOUT', 10.0)
+        app.config.setdefault('MYSQL_POOL_IDLE_TIMEOUT', 300)
+        app.config.setdefault('MYSQL_POOL_PING_INTERVAL', 5)
+
+        config = app.config
+        self.pool = PoolConexoes(
+            fabrica=lambda: self._conectar(config),
+            tamanho_min=int(config['MYSQL_POOL_MIN_SIZE']),
+            tamanho_max=int(config['MYSQL_POOL_MAX_SIZE']),
+            tempo_espera=float(config['MYSQL_POOL_TIMEOUT']),
+            tempo_ocioso=float(config['MYSQL_POOL_IDLE_TIMEOUT']),
+            intervalo_ping=float(config['MYSQL_POOL_PING_INTERVAL']),
+        )
+        app.extensions['mysql_pool'] = self
+        app.teardown_appcontext(self.teardown)
+
+    @staticmethod
+    def _conectar(config):
+        import MySQLdb
+        from MySQLdb import cursors
+
+        kwargs = {
+            'host': config['MYSQL_HOST'],
+            'port': int(config['MYSQL_PORT']),
+            'connect_timeout': int(config['MYSQL_CONNECT_TIMEOUT']),
+            'charset': config['MYSQL_CHARSET'],
+        }
+        if config['MYSQL_USER']:
+            kwargs['user'] = config['MYSQL_USER']
+        if config['MYSQL_PASSWORD']:
+            kwargs['password'] = config['MYSQL_PASSWORD']
+        if config['MYSQL_DB']:
+            kwargs['database'] = config['MYSQL_DB']
+        if config['MYSQL_UNIX_SOCKET']:
+            kwargs['unix_socket'] = config['MYSQL_UNIX_SOCKET']
+        if config['MYSQL_CURSORCLASS']:
+            kwargs['cursorclass'] = getattr(cursors, config['MYSQL_CURSORCLASS'])
+        return MySQLdb.connect(**kwargs)
+
+    @property
+    def connection(self):
+        """Conexão da requisição atual (retirada do pool no primeiro acesso)"""
+        conexao = g.get('_mysql_pool_conexao')
+        if conexao is None:
+            conexao = self.pool.retirar()
+            g._mysql_pool_conexao = conexao
+        return conexao
+
+    def teardown(self, exception):
+        conexao = g.pop('_mysql_pool_conexao', None)
+        if conexao is not None:
+            self.pool.devolver(conexao)
+
+    def metricas(self):
+        return self.pool.metricas()
@@ -0,0 +1,278 @@
+"""
+Registro declarativo dos questionários PEI, PEDI e GUIDE
+
+Cada questionário é uma lista de seções; cada seção é uma tabela com seus
+campos. A partir dessa descrição são montados, uma única vez na importação:
+    - o INSERT de cada tabela (aluno_id + campos, na ordem declarada);
+    - a extração dos valores de um formulário (request.form) ou de um dict JSON;
+    - a validação (campos obrigatórios e opções dos <select> dos templates);
+    - a projeção das views vw_quest_* usada nas exportações (ver exportacao).
+
+Gravar um questionário é um executemany por seção com o INSERT pronto;
+incluir um campo é acrescentar um Campo na seção (e a coluna na tabela/view),
+sem SQL escrito à mão.
+"""
+
+from itertools import chain
+
+# Colunas do aluno que abrem as views vw_quest_*
+COLUNAS_ALUNO = ('id_aluno', 'matricula_aluno', 'nome_aluno', 'idade')
+
+# Opções dos <select> dos templates quest_*.html
+SIM_NAO_PARCIAL = ('Sim', 'Não', 'Parcial')
+SIM_NAO_DESCONHECIDO = ('Sim', 'Não', 'Desconhecido')
+SIM_NAO_VARIAVEL = ('Sim', 'Não', 'Variável')
+SIM_NAO_OCASIONALMENTE = ('Sim', 'Não', 'Ocasionalmente')
+NIVEIS_SOCIALIZACAO = ('Alta', 'Moderada', 'Baixa')
+APOIOS = (
+    'Locomoção', 'Comunicação', 'Alimentação', 'Higiene',
+    'Organização de materiais', 'Uso de tecnologias assistidas',
+)
+FREQUENCIAS = ('Semanal', 'Quinzenal', 'Mensal', 'Trimestral', 'Semestral', 'Anual')
+NIVEIS_PEDI = ('Faz Sozinho', 'Com Supervisão leve', 'Ajuda Parcial', 'Ajuda Total', 'Não Realiza')
+NIVEIS_GUIDE = ('Realiza', 'As vezes', 'Não Realiza')
+
+
+class Campo:
+    """
+    Campo de um questionário (nome do input = nome da coluna)
+
+    Args:
+        opcoes: valores aceitos (None = texto livre)
+        obrigatorio: o formulário exige o campo
+        multiplo: <select multiple>; os valores são gravados separados por vírgula
+    """
+
+    def __init__(self, nome, opcoes=None, obrigatorio=False, multiplo=False):
+        self.nome = nome
+        self.opcoes = frozenset(opcoes) if opcoes is not None else None
+        self.obrigatorio = obrigatorio
+        self.multiplo = multiplo
+
+    def extrair(self, dados):
+        """Valor do campo em `dados` (MultiDict do Flask ou dict vindo de JSON)"""
+        if self.multiplo:
+            if hasattr(dados, 'getlist'):
+                valores = dados.getlist(self.nome)
+            else:
+                valores = dados.get(self.nome)
+                if valores is None or isinstance(valores, str):
+                    return valores or None
+            return ','.join(str(v) for v in valores) if valores else None
+        valor = dados.get(self.nome)
+        if valor is None or isinstance(valor, str):
+            return valor
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            return str(valor)
+        return valor  # tipo inválido: validar() reporta
+
+    def validar(self, valor):
+        """Mensagem de erro ou None"""
+        if valor is None or valor == '':
+            return f"Campo obrigatório: {self.nome}" if self.obrigatorio else None
+        if not isinstance(valor, str):
+            return f"Valor inválido em {self.nome}: esperado texto"
+        if self.opcoes is not None:
+            escolhidos = valor.split(',') if self.multiplo else (valor,)
+            invalidos = [v for v in escolhidos if v not in self.opcoes]
+            if invalidos:
+                return f"Opção inválida em {self.nome}: {', '.join(invalidos)}"
+        return None
+
+
+def opcoes(nomes, valores):
+    """Campos obrigatórios de escolha que compartilham as mesmas opções"""
+    return [Campo(nome, valores, obrigatorio=True) for nome in nomes.split()]
+
+
+def textos(nomes):
+    """Campos de texto livre"""
+    return [Campo(nome) for nome in nomes.split()]
+
+
+class Secao:
+    """
+    Uma tabela do questionário
+
+    Args:
+        id_exportacao: coluna de id da tabela exposta pela view (None se a
+                       view não a expõe)
+    """
+
+    def __init__(self, titulo, tabela, campos, id_exportacao=None):
+        self.titulo = titulo
+        self.tabela = tabela
+        self.campos = tuple(campos)
+        self.id_exportacao = id_exportacao
+        self.colunas = ('aluno_id',) + tuple(c.nome for c in self.campos)
+        self.insert = (
+            f"INSERT INTO {tabela} ({', '.join(self.colunas)}) "
+            f"VALUES ({', '.join(['%s'] * len(self.colunas))})"
+        )
+        self.colunas_exportacao = (
+            ((id_exportacao,) if id_exportacao else ()) + tuple(c.nome for c in self.campos)
+        )
+
+    def parametros(self, aluno_id, valores):
+        return (aluno_id,) + tuple(valores.get(c.nome) for c in self.campos)
+
+
+class Questionario:
+    """
+    Questionário completo: seções na ordem das colunas da view
+
+    Args:
+        view: view que junta as seções (vw_quest_*)
+        tabela_base: tabela que ancora a view (estimativa de linhas das exportações)
+    """
+
+    def __init__(self, nome, titulo, view, secoes, tabela_base=None):
+        self.nome = nome
+        self.titulo = titulo
+        self.view = view
+        self.secoes = tuple(secoes)
+        self.tabela_base = tabela_base or self.secoes[0].tabela
+        self.campos = tuple(chain.from_iterable(s.campos for s in self.secoes))
+        nomes = [c.nome for c in self.campos]
+        repetidos = sorted({n for n in nomes if nomes.count(n) > 1})
+        if repetidos:
+            raise ValueError(f"Campos repetidos em {nome}: {', '.join(repetidos)}")
+        self.colunas_exportacao = COLUNAS_ALUNO + tuple(
+            chain.from_iterable(s.colunas_exportacao for s in self.secoes)
+        )
+
+    def extrair(self, dados):
+        """Dict campo -> valor com todos os campos do questionário"""
+        return {campo.nome: campo.extrair(dados) for campo in self.campos}
+
+    def validar(self, aluno_id, valores):
+        """Lista de erros (vazia se as respostas podem ser gravadas)"""
+        erros = []
+        if aluno_id_valido(aluno_id) is None:
+            erros.append("Aluno não informado ou inválido")
+        for campo in self.campos:
+            erro = campo.validar(valores.get(campo.nome))
+            if erro:
+                erros.append(erro)
+        return erros
+
+    def gravar(self, cursor, respostas):
+        """
+        Insere as respostas de um ou mais alunos: um executemany por seção
+
+        Args:
+            respostas: sequência de (aluno_id, valores de extrair())
+
+        Não faz commit: a transação é de quem chama.
+        """
+        respostas = list(respostas)
+        if not respostas:
+            return
+        for secao in self.secoes:
+            cursor.executemany(
+                secao.insert,
+                [secao.parametros(aluno_id, valores) for aluno_id, valores in respostas]
+            )
+
+
+def aluno_id_valido(valor):
+    """id do aluno como int positivo, ou None"""
+    if isinstance(valor, bool):
+        return None
+    try:
+        aluno_id = int(valor)
+    except (TypeError, ValueError):
+        return None
+    return aluno_id if aluno_id > 0 else None
+
+
+PEI = Questionario('pei', 'PEI', 'vw_quest_pei', [
+    Secao('Desenvolvimento Geral', 'tbl_desenvolvimento_geral_pei', [
+        Campo('autonomia', SIM_NAO_PARCIAL, obrigatorio=True),
+        Campo('atraso_desenvolvimento', SIM_NAO_DESCONHECIDO, obrigatorio=True),
+        *textos('questoes_saude talentos'),
+    ], id_exportacao='id_desenvolvimento'),
+    Secao('Habilidades Escolares', 'tbl_habilidades_escolares_pei', [
+        *textos('leitura_escrita numeros_matematica'),
+        Campo('interesse_aulas', SIM_NAO_VARIAVEL, obrigatorio=True),
+        *textos('recursos_aprendizagem barreiras'),
+    ], id_exportacao='id_habilidade'),
+    Secao('Comportamento e Interação', 'tbl_comportamento_interacao_pei', [
+        *textos('comunicacao tipo_linguagem'),
+        Campo('atividades_grupo', SIM_NAO_OCASIONALMENTE, obrigatorio=True),
+        Campo('comp_desaf'),
+        Campo('socializacao', NIVEIS_SOCIALIZACAO, obrigatorio=True),
+    ], id_exportacao='id_comportamento'),
+    Secao('Necessidade de Apoio', 'tbl_necessidades_apoio_pei', [
+        Campo('apoios', APOIOS, multiplo=True),
+        Campo('equipamentos'),
+    ], id_exportacao='id_necessidade'),
+    Secao('Estratégias e Adaptações', 'tbl_estrategias_adaptacoes_pei',
+          textos('estrategias adaptacoes_curriculares materiais_concretos avaliacoes'),
+          id_exportacao='id_estrategia'),
+    Secao('Objetivos', 'tbl_objetivos_pei', textos(
+        'objetivo_cognitivo objetivo_linguagem objetivo_autonomia '
+        'objetivo_interacao objetivo_motor objetivo_comportamento'
+    ), id_exportacao='id_objetivo'),
+    Secao('Outras Informações', 'tbl_outras_informacoes_pei', textos(
+        'historico_escolar consideracoes_familia observacoes_professores comentarios_equipe'
+    ), id_exportacao='id_informe'),
+    Secao('Acompanhamento e Avaliação', 'tbl_acompanhamento_avaliacao', [
+        Campo('frequencia_reavaliacao', FREQUENCIAS, obrigatorio=True),
+        *textos('responsavel_acompanhamento reunioes'),
+    ], id_exportacao='id_acomp_av'),
+], tabela_base='tbl_acompanhamento_avaliacao')
+
+PEDI = Questionario('pedi', 'PEDI', 'vw_quest_pedi', [
+    Secao('Cuidado Pessoal', 'tbl_quest_pedi_cuidadopessoal', [
+        *opcoes(
+            'alimentacao_talher mastigacao ingestao_liquidos cortar_alimentos recurso_comer '
+            'escovacao_dentes higiene_maos papel_higienico enxugase_banho lembrete_higiene '
+            'vestimenta_camisa vestimenta_calca autonomia_ziper_amarras calcados diferencia_frente_verso '
+            'comunicacao_banheiro autonomia_vaso_sanitario acidentes_urina_outros lavar_maos '
+            'supervisao_banheiro', NIVEIS_PEDI
+        ),
+        Campo('observacoes'),
+    ], id_exportacao='id_cuid_pessoal'),
+    Secao('Mobilidade', 'tbl_quest_pedi_mobilidade', [
+        *opcoes(
+            'senta_sozinho levanta_cadeira anda_sozinho abre_portas locomocao_escadas '
+            'locomocao_terrenos usa_transporte empurra_brinquedos corre_pula cadeira_rodas', NIVEIS_PEDI
+        ),
+        Campo('observacoes_mobilidade'),
+    ], id_exportacao='id_mobilidade'),
+    Secao('Função Social', 'tbl_quest_pedi_funcaosocial', [
+        *opcoes(
+            'responde_chamado contato_visual imita_acoes participa_brincadeiras respeita_turnos '
+            'fala_palavras gestos_sinais pede_ajuda compreende_instrucoes expressa_sentimento '
+            'guarda_brinquedo lembra_atividades cumpre_combinado escolhe_roupas demonstra_interesse',
+            NIVEIS_PEDI
+        ),
+        Campo('observacoes_fun_social'),
+    ], id_exportacao='id_func_social'),
+])
+
+GUIDE = Questionario('guide', 'GUIDE', 'vw_quest_guide', [
+    Secao('Socialização', 'tbl_socializacao_guide', [
+        *opcoes('sorri_amigavel contato_visual imita_acoes brinca_com_criancas responde_gestos', NIVEIS_GUIDE),
+        Campo('observacoes_socializacao'),
+    ], id_exportacao='id_social'),
+    Secao('Linguagem', 'tbl_linguagem_guide', [
+        *opcoes('responde_chamado emite_sons usa_gestos nomeia_objetos constroi_frases', NIVEIS_GUIDE),
+        Campo('observacoes_linguagem'),
+    ], id_exportacao='id'),
+    Secao('Autocuidado', 'tbl_autocuidado_guide', [
+        *opcoes('colher_aboca bebe_copos uso_sapatos avisa_banheiro escova_dentes', NIVEIS_GUIDE),
+        Campo('observacoes_autocuidados'),
+    ], id_exportacao='id_auto'),
+    Secao('Motricidade Fina', 'tbl_motricidade_guide', [
+        *opcoes('pega_objetos empilha_blocos encaixa_pecas recorta_papel faz_rabiscos', NIVEIS_GUIDE),
+        Campo('observacoes_motrocidade'),
+    ]),
+    Secao('Motricidade Global', 'tbl_motroc_global_guide', [
+        *opcoes('engatinha anda_semapoio corre_controle sobe_escadas_correto pula_doispes', NIVEIS_GUIDE),
+        Campo('observacao_motroc_glob'),
+    ]),
+])
+
+QUESTIONARIOS = {q.nome: q for q in (PEI, PEDI, GUIDE)}
@@ -0,0 +1,355 @@
+"""
+Conversão de HTML já renderizado em PDF
+
+Os templates Jinja são renderizados no processo do Flask; aqui fica só a
+etapa pesada (layout + PDF), em funções de módulo que podem rodar tanto na
+própria requisição quanto em processos filhos (lote_pdf, fila de tarefas).
+
+Motores:
+    xhtml2pdf   relatórios PEI e PEDI
+    weasyprint  relatórios GUIDE e de avaliação
+
+Cada processo mantém um estado "quente" criado uma única vez: a
+FontConfiguration do WeasyPrint (por thread), as folhas de estilo extras já
+interpretadas e um cache em memória dos recursos externos (imagens de
+app/static/img, logo e CSS do CDN usados pelos templates). Assim o custo de
+cada PDF fica restrito ao template e ao layout.
+"""
+
+import atexit
+import mimetypes
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+from urllib.parse import unquote, urlparse
+
+MOTOR_XHTML2PDF = 'xhtml2pdf'
+MOTOR_WEASYPRINT = 'weasyprint'
+
+DIRETORIO_STATIC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+
+MAX_RECURSO_REMOTO = 5 * 1024 * 1024  # não guarda em memória respostas maiores que isso
+MAX_RECURSOS_REMOTOS = 64
+TIMEOUT_RECURSO_REMOTO = 10
+
+# Página A4 com numeração no rodapé (relatório GUIDE)
+CSS_GUIDE = """
+@page {
+    size: A4;
+    margin: 2cm;
+    @bottom-center {
+        content: "Página " counter(page) " de " counter(pages);
+        font-size: 10px;
+        color: #666;
+    }
+}
+body {
+    font-size: 12px;
+    line-height: 1.4;
+}
+"""
+
+
+class _EstadoRenderizador:
+    """Caches do processo atual (recriados se o processo for copiado por fork)"""
+
+    def __init__(self, diretorio_static):
+        self.pid = os.getpid()
+        self.diretorio_static = os.path.realpath(diretorio_static)
+        self.recursos = {}           # arquivo de static/ -> {'string': bytes, 'mime_type': ...}
+        self.remotos = {}            # url http(s) -> idem, até MAX_RECURSOS_REMOTOS
+        self.arquivos_remotos = {}   # url -> caminho local (xhtml2pdf lê de arquivo)
+        self.diretorio_temporario = None
+        self.lock = threading.Lock()
+        self.por_thread = threading.local()  # FontConfiguration e CSS do WeasyPrint
+
+    def pasta_temporaria(self):
+        if self.diretorio_temporario is None:
+            self.diretorio_temporario = tempfile.mkdtemp(prefix='neuroeduca-render-')
+            atexit.register(shutil.rmtree, self.diretorio_temporario, True)
+        return self.diretorio_temporario
+
+
+_estado = None
+_lock_estado = threading.Lock()
+
+
+def aquecer(diretorio_static=None, motores=(MOTOR_XHTML2PDF, MOTOR_WEASYPRINT)):
+    """
+    Prepara o estado do processo: importa os motores, carrega as imagens de
+    static/img em memória e cria a FontConfiguration da thread atual
+
+    Usado como initializer dos processos do Renderizador; nas rotas é
+    chamado implicitamente no primeiro PDF do worker.
+    """
+    estado = _obter_estado(diretorio_static)
+
+    pasta_img = os.path.join(estado.diretorio_static, 'img')
+    for raiz, _, arquivos in os.walk(pasta_img):
+        for nome in arquivos:
+            _recurso_static(estado, os.path.join(raiz, nome))
+
+    # Um motor ausente não impede o uso do outro; o erro reaparece ao converter
+    if MOTOR_XHTML2PDF in motores:
+        try:
+            from xhtml2pdf import pisa  # noqa: F401
+        except ImportError as e:
+            print(f"Aviso: motor de PDF indisponível: {e}")
+    if MOTOR_WEASYPRINT in motores:
+        try:
+            _weasyprint_da_thread(estado)
+        except ImportError as e:
+            print(f"Aviso: motor de PDF indisponível: {e}")
+    return estado
+
+
+def _obter_estado(diretorio_static=None):
+    global _estado
+    estado = _estado
+    if estado is None or estado.pid != os.getpid():
+        with _lock_estado:
+            estado = _estado
+            if estado is None or estado.pid != os.getpid():
+                estado = _EstadoRenderizador(diretorio_static or DIRETORIO_STATIC)
+                _estado = estado
+    return estado
+
+
+# ---------------------------------------------------------------------- #
+# Recursos externos (imagens, CSS)
+# ---------------------------------------------------------------------- #
+
+def _caminho_static(estado, url):
+    """Arquivo em static/ correspondente à URL (relativa, /static/..., file:// ou http), ou None"""
+    caminho = unquote(urlparse(url).path)
+    if '/static/' in caminho:
+        relativo = caminho.split('/static/', 1)[1]
+    elif caminho.startswith('static/'):
+        relativo = caminho[len('static/'):]
+    else:
+        return None
+    completo = os.path.realpath(os.path.join(estado.diretorio_static, relativo))
+    if not completo.startswith(estado.diretorio_static + os.sep) or not os.path.isfile(completo):
+        return None
+    return completo
+
+
+def _recurso_static(estado, caminho):
+    recurso = estado.recursos.get(caminho)
+    if recurso is None:
+        with open(caminho, 'rb') as f:
+            recurso = {'string': f.read(), 'mime_type': mimetypes.guess_type(caminho)[0]}
+        with estado.lock:
+            estado.recursos[caminho] = recurso
+    return recurso
+
+
+def _guardar_remoto(estado, url, recurso):
+    if len(recurso['string']) > MAX_RECURSO_REMOTO:
+        return
+    with estado.lock:
+        if len(estado.remotos) < MAX_RECURSOS_REMOTOS:
+            estado.remotos[url] = recurso
+
+
+def _buscar_url_weasyprint(url):
+    """url_fetcher do WeasyPrint: static/ e recursos remotos servidos da memória"""
+    estado = _obter_estado()
+    caminho = _caminho_static(estado, url)
+    if caminho is not None:
+        return dict(_recurso_static(estado, caminho))
+
+    recurso = estado.remotos.get(url)
+    if recurso is None:
+        from weasyprint import default_url_fetcher
+
+        resultado = default_url_fetcher(url)
+        if 'file_obj' in resultado:
+            with resultado.pop('file_obj') as arquivo:
+                resultado['string'] = arquivo.read()
+        recurso = {chave: resultado[chave] for chave in ('string', 'mime_type', 'encoding', 'redirected_url')
+                   if resultado.get(chave) is not None}
+        if urlparse(url).scheme in ('http', 'https'):
+            _guardar_remoto(estado, url, recurso)
+    return dict(recurso)
+
+
+def _link_xhtml2pdf(uri, rel):
+    """link_callback do xhtml2pdf: devolve caminhos locais para static/ e cópias dos remotos"""
+    estado = _obter_estado()
+    caminho = _caminho_static(estado, uri)
+    if caminho is not None:
+        return caminho
+    if urlparse(uri).scheme not in ('http', 'https'):
+        return uri
+
+    local = estado.arquivos_remotos.get(uri)
+    if local is None:
+        if len(estado.arquivos_remotos) >= MAX_RECURSOS_REMOTOS:
+            return uri
+        try:
+            with urllib.request.urlopen(uri, timeout=TIMEOUT_RECURSO_REMOTO) as resposta:
+                conteudo = resposta.read(MAX_RECURSO_REMOTO + 1)
+        except OSError:
+            return uri  # o xhtml2pdf tenta por conta própria (e só avisa se falhar)
+        if len(conteudo) > MAX_RECURSO_REMOTO:
+            return uri
+        extensao = os.path.splitext(urlparse(uri).path)[1]
+        with estado.lock:
+            pasta = estado.pasta_temporaria()
+        fd, local = tempfile.mkstemp(suffix=extensao, dir=pasta)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(conteudo)
+        with estado.lock:
+            estado.arquivos_remotos[uri] = local
+    return local
+
+
+# ---------------------------------------------------------------------- #
+# Motores
+# ---------------------------------------------------------------------- #
+
+def _weasyprint_da_thread(estado):
+    """FontConfiguration e cache de CSS da thread (o WeasyPrint não é thread-safe)"""
+    local = estado.por_thread
+    if getattr(local, 'font_config', None) is None:
+        from weasyprint.text.fonts import FontConfiguration
+
+        local.font_config = FontConfiguration()
+        local.folhas = {}
+    return local
+
+
+def _xhtml2pdf(html):
+    from xhtml2pdf import pisa
+
+    pdf = BytesIO()
+    pisa_status = pisa.CreatePDF(html, dest=pdf, link_callback=_link_xhtml2pdf)
+    return None if pisa_status.err else pdf.getvalue()
+
+
+def _weasyprint(html, css=None, presentational_hints=False):
+    from weasyprint import CSS, HTML
+
+    estado = _obter_estado()
+    local = _weasyprint_da_thread(estado)
+
+    stylesheets = None
+    if css:
+        folha = local.folhas.get(css)
+        if folha is None:
+            folha = local.folhas[css] = CSS(string=css, font_config=local.font_config)
+        stylesheets = [folha]
+
+    pdf = BytesIO()
+    HTML(string=html, url_fetcher=_buscar_url_weasyprint).write_pdf(
+        pdf,
+        stylesheets=stylesheets,
+        font_config=local.font_config,
+        presentational_hints=presentational_hints
+    )
+    return pdf.getvalue()
+
+
+def html_para_pdf(motor, html, css=None, presentational_hints=False):
+    """
+    Converte HTML em bytes de PDF
+
+    Args:
+        motor: MOTOR_XHTML2PDF ou MOTOR_WEASYPRINT
+        css: folha de estilo extra (só weasyprint; interpretada uma vez por thread)
+        presentational_hints: respeita atributos HTML de apresentação (só weasyprint)
+
+    Returns:
+        bytes do PDF, ou None se o xhtml2pdf reportar erro
+    """
+    if motor == MOTOR_XHTML2PDF:
+        return _xhtml2pdf(html)
+    if motor == MOTOR_WEASYPRINT:
+        return _weasyprint(html, css, presentational_hints)
+    raise ValueError(f"Motor de PDF desconhecido: {motor}")
+
+
+# ---------------------------------------------------------------------- #
+# Pool persistente de processos aquecidos
+# ---------------------------------------------------------------------- #
+
+class Renderizador:
+    """
+    Pool de processos de renderização que sobrevive entre lotes
+
+    Os processos são criados com spawn (não herdam threads/conexões do worker
+    web) e aquecidos por aquecer() ao iniciar. Depois de `tempo_ocioso`
+    segundos sem uso o pool é encerrado para liberar memória; o próximo lote
+    o recria.
+
+    Args:
+        processos: quantidade de processos
+        tempo_ocioso: segundos sem uso até encerrar (0 = nunca)
+        diretorio_static: pasta static/ servida da memória nos processos
+    """
+
+    def __init__(self, processos, tempo_ocioso=300, diretorio_static=None):
+        self.processos = processos
+        self.tempo_ocioso = tempo_ocioso
+        self.diretorio_static = diretorio_static or DIRETORIO_STATIC
+        self._executor = None
+        self._pid = None
+        self._em_uso = 0
+        self._temporizador = None
+        self._lock = threading.Lock()
+
+    def _criar_executor(self):
+        return ProcessPoolExecutor(
+            self.processos,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=aquecer,
+            initargs=(self.diretorio_static,)
+        )
+
+    @contextmanager
+    def reservar(self):
+        """Entrega o executor, impedindo o encerramento por ociosidade durante o uso"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Processo copiado por fork: o executor herdado pertence ao pai
+                self._executor, self._temporizador, self._em_uso = None, None, 0
+                self._pid = os.getpid()
+            if self._executor is None or getattr(self._executor, '_broken', False):
+                self._executor = self._criar_executor()
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+            self._em_uso += 1
+            executor = self._executor
+        try:
+            yield executor
+        finally:
+            with self._lock:
+                self._em_uso -= 1
+                if self._em_uso == 0 and self.tempo_ocioso > 0 and self._executor is executor:
+                    self._temporizador = threading.Timer(self.tempo_ocioso, self._encerrar_se_ocioso)
+                    self._temporizador.daemon = True
+                    self._temporizador.start()
+
+    def _encerrar_se_ocioso(self):
+        with self._lock:
+            if self._em_uso or self._executor is None:
+                return
+            executor, self._executor, self._temporizador = self._executor, None, None
+        executor.shutdown(wait=False)
+
+    def encerrar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,193 @@
+"""
+Tabela-resumo das notas GUIDE por aluno (tbl_resumo_guide)
+
+O dashboard lia as cinco views vw_boletim_* inteiras a cada acesso e
+juntava os resultados em Python. Aqui cada aluno tem uma linha com as cinco
+médias já arredondadas e a média geral: quest_guide atualiza a linha do
+aluno na mesma transação em que grava as respostas, e o dashboard faz uma
+única leitura ordenada pelo índice (nome_aluno, id_aluno).
+
+A tabela é criada e populada no primeiro uso. Para recalculá-la (ex.: após
+importar respostas direto no banco):
+    flask --app app/app.py resumo-guide-reconstruir
+"""
+
+import threading
+
+# (domínio, view de origem); a view expõe id_aluno, nome_aluno e media_<domínio>
+DOMINIOS = (
+    ('autocuidado', 'vw_boletim_autocuidado'),
+    ('linguagem', 'vw_boletim_linguagem'),
+    ('socializacao', 'vw_boletim_socializacao'),
+    ('motrocidade', 'vw_boletim_motrocidade'),
+    ('motrocidade_global', 'vw_boletim_motrocidade_global'),
+)
+
+NOME_PADRAO = "Aluno não identificado"
+TAMANHO_LOTE = 500
+
+DDL = """
+    CREATE TABLE IF NOT EXISTS tbl_resumo_guide (
+        id_aluno INT NOT NULL PRIMARY KEY,
+        nome_aluno VARCHAR(255) NOT NULL,
+        media_autocuidado DECIMAL(4,1) NOT NULL DEFAULT 0,
+        media_linguagem DECIMAL(4,1) NOT NULL DEFAULT 0,
+        media_socializacao DECIMAL(4,1) NOT NULL DEFAULT 0,
+        media_motrocidade DECIMAL(4,1) NOT NULL DEFAULT 0,
+        media_motrocidade_global DECIMAL(4,1) NOT NULL DEFAULT 0,
+        media_geral DECIMAL(4,1) NOT NULL DEFAULT 0,
+        atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_resumo_guide_nome (nome_aluno, id_aluno)
+    )
+"""
+
+COLUNAS_MEDIAS = tuple(f'media_{dominio}' for dominio, _ in DOMINIOS)
+
+UPSERT = f"""
+    INSERT INTO tbl_resumo_guide (id_aluno, nome_aluno, {', '.join(COLUNAS_MEDIAS)}, media_geral)
+    VALUES (%s, %s, {', '.join(['%s'] * len(COLUNAS_MEDIAS))}, %s)
+    ON DUPLICATE KEY UPDATE
+        nome_aluno = VALUES(nome_aluno),
+        {', '.join(f'{c} = VALUES({c})' for c in COLUNAS_MEDIAS)},
+        media_geral = VALUES(media_geral)
+"""
+
+_tabela_verificada = False
+_lock = threading.Lock()
+
+
+def media_geral(notas):
+    """
+    Média das notas maiores que zero (domínios não avaliados ficam de fora)
+
+    Conta em décimos inteiros e arredonda meio para cima, como o ROUND do
+    MySQL nas views; estatisticas_guide faz a mesma conta com NumPy.
+    """
+    decimos = [round(n * 10) for n in notas if n > 0]
+    if not decimos:
+        return 0.0
+    return ((2 * sum(decimos) + len(decimos)) // (2 * len(decimos))) / 10
+
+
+def garantir_tabela(conexao):
+    """
+    Cria a tabela (e a popula a partir das views) se ainda não existir
+
+    DDL faz commit implícito no MySQL: chame antes de abrir a transação de
+    gravação. A verificação roda uma vez por processo.
+    """
+    global _tabela_verificada
+    if _tabela_verificada:
+        return
+    with _lock:
+        if _tabela_verificada:
+            return
+        cursor = conexao.cursor()
+        try:
+            cursor.execute("SHOW TABLES LIKE 'tbl_resumo_guide'")
+            existia = cursor.fetchone() is not None
+            if not existia:
+                cursor.execute(DDL)
+        finally:
+            cursor.close()
+        if not existia:
+            reconstruir(conexao)
+        _tabela_verificada = True
+
+
+def _linha_resumo(id_aluno, nome, notas):
+    return (id_aluno, nome or NOME_PADRAO, *notas, media_geral(notas))
+
+
+def atualizar_aluno(cursor, id_aluno):
+    """
+    Recalcula a linha de um aluno a partir das views (5 consultas por id)
+
+    Usa o cursor da transação corrente, então enxerga as respostas recém
+    inseridas e é confirmado (ou desfeito) junto com elas.
+    """
+    nome = None
+    notas = []
+    for dominio, view in DOMINIOS:
+        cursor.execute(
+            f"SELECT nome_aluno, ROUND(COALESCE(media_{dominio}, 0), 1) AS media "
+            f"FROM {view} WHERE id_aluno = %s LIMIT 1",
+            (id_aluno,)
+        )
+        linha = cursor.fetchone()
+        if linha is None:
+            notas.append(0.0)
+            continue
+        nome = nome or linha['nome_aluno']
+        notas.append(float(linha['media'] or 0.0))
+    if nome is None and not any(notas):
+        return False
+    cursor.execute(UPSERT, _linha_resumo(id_aluno, nome, notas))
+    return True
+
+
+def sincronizar_nome(cursor, matricula_aluno):
+    """Repete no resumo o nome atual do aluno (após edição do cadastro)"""
+    cursor.execute("""
+        UPDATE tbl_resumo_guide r
+        JOIN tbl_cad_alunos a ON a.id_aluno = r.id_aluno
+        SET r.nome_aluno = a.nome_aluno
+        WHERE a.matricula_aluno = %s
+    """, (matricula_aluno,))
+
+
+def reconstruir(conexao):
+    """
+    Recalcula a tabela inteira a partir das cinco views e remove alunos que
+    não aparecem mais em nenhuma delas
+
+    Returns:
+        (linhas gravadas, linhas removidas)
+    """
+    cursor = conexao.cursor()
+    try:
+        nomes = {}
+        notas = {}
+        for i, (dominio, view) in enumerate(DOMINIOS):
+            cursor.execute(
+                f"SELECT id_aluno, nome_aluno, ROUND(COALESCE(media_{dominio}, 0), 1) AS media FROM {view}"
+            )
+            for linha in cursor.fetchall():
+                id_aluno = linha['id_aluno']
+                nomes.setdefault(id_aluno, linha['nome_aluno'])
+                notas.setdefault(id_aluno, [0.0] * len(DOMINIOS))[i] = float(linha['media'] or 0.0)
+
+        linhas = [_linha_resumo(id_aluno, nomes[id_aluno], notas[id_aluno]) for id_aluno in notas]
+        for inicio in range(0, len(linhas), TAMANHO_LOTE):
+            cursor.executemany(UPSERT, linhas[inicio:inicio + TAMANHO_LOTE])
+
+        cursor.execute("SELECT id_aluno FROM tbl_resumo_guide")
+        existentes = {linha['id_aluno'] for linha in cursor.fetchall()}
+        obsoletos = sorted(existentes - set(notas))
+        for inicio in range(0, len(obsoletos), TAMANHO_LOTE):
+            lote = obsoletos[inicio:inicio + TAMANHO_LOTE]
+            cursor.execute(
+                f"DELETE FROM tbl_resumo_guide WHERE id_aluno IN ({', '.join(['%s'] * len(lote))})",
+                tuple(lote)
+            )
+        conexao.commit()
+    except Exception:
+        conexao.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(linhas), len(obsoletos)
+
+
+def carregar(conexao):
+    """Linhas do resumo ordenadas por nome (leitura única pelo índice)"""
+    cursor = conexao.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT id_aluno, nome_aluno, {', '.join(COLUNAS_MEDIAS)}, media_geral
+            FROM tbl_resumo_guide
+            ORDER BY nome_aluno, id_aluno
+        """)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
@@ -0,0 +1,81 @@
+"""
+Mudança de status de muitos alunos de uma vez (baixa e reativação em lote)
+
+Em vez de um UPDATE e um INSERT de auditoria por aluno, cada bloco de até
+TAMANHO_BLOCO ids faz: um SELECT ... FOR UPDATE para saber quais alunos
+realmente mudam, um UPDATE ... WHERE id_aluno IN (...) e um executemany com
+as linhas de tbl_baixas_alunos, todas com o mesmo horário. Tudo roda no
+cursor da transação da rota, que decide o commit.
+"""
+
+from datetime import datetime
+
+from servicos import contadores_alunos
+
+TAMANHO_BLOCO = 1000
+
+INSERT_AUDITORIA = """
+    INSERT INTO tbl_baixas_alunos
+    (aluno_id, motivo_baixa, observacoes, data_baixa, usuario_baixa)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+def ids_validos(valores):
+    """Ids inteiros, sem repetição, na ordem recebida (valores inválidos são descartados)"""
+    ids = []
+    vistos = set()
+    for valor in valores:
+        try:
+            id_aluno = int(valor)
+        except (TypeError, ValueError):
+            continue
+        if id_aluno not in vistos:
+            vistos.add(id_aluno)
+            ids.append(id_aluno)
+    return ids
+
+
+def alterar_status(cursor, ids, de, para, motivo, observacoes, usuario):
+    """
+    Passa de `de` para `para` os alunos de `ids` que estão com status `de`
+
+    Args:
+        ids: ids já validados (ver ids_validos)
+        motivo, observacoes, usuario: gravados em tbl_baixas_alunos para cada
+                                      aluno alterado
+
+    Returns:
+        quantidade de alunos alterados (os demais já estavam em `para` ou não existem)
+    """
+    data = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    alterados = 0
+    for inicio in range(0, len(ids), TAMANHO_BLOCO):
+        bloco = ids[inicio:inicio + TAMANHO_BLOCO]
+        marcadores = ', '.join(['%s'] * len(bloco))
+        cursor.execute(
+            f"SELECT id_aluno FROM tbl_cad_alunos WHERE id_aluno IN ({marcadores}) AND status_aluno = %s FOR UPDATE",
+            (*bloco, de)
+        )
+        afetados = [linha['id_aluno'] for linha in cursor.fetchall()]
+        if not afetados:
+            continue
+
+        marcadores = ', '.join(['%s'] * len(afetados))
+        cursor.execute(
+            f"UPDATE tbl_cad_alunos SET status_aluno = %s WHERE id_aluno IN ({marcadores})",
+            (para, *afetados)
+        )
+        alterados += cursor.rowcount
+
+        try:
+            cursor.executemany(
+                INSERT_AUDITORIA,
+                [(id_aluno, motivo, observacoes, data, usuario) for id_aluno in afetados]
+            )
+        except Exception as e:
+            # Mesmo comportamento das rotas individuais: sem a tabela de log, segue sem auditoria
+            print(f"Aviso: log de {motivo.lower()} não gravado: {e}")
+
+    contadores_alunos.mudar_status(cursor, de, para, alterados)
+    return alterados
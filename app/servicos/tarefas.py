@@ -0,0 +1,390 @@
+"""
+Fila local de tarefas em segundo plano (PDFs e exportações grandes)
+
+Os workers do gunicorn são síncronos e têm timeout de 60s: uma renderização
+lenta do WeasyPrint ou uma planilha de centenas de milhares de linhas prende
+o worker e pode ser morta no meio. Aqui a rota só grava um pedido numa fila
+persistente em SQLite e responde na hora; um processo separado
+(`flask --app app/app.py tarefas-worker`) reivindica os pedidos e os executa
+num ProcessPoolExecutor. O progresso e o artefato final ficam no SQLite e no
+diretório de artefatos, ambos compartilhados entre web e worker.
+
+Estados: pendente -> executando -> concluida | erro
+"""
+
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+PENDENTE = 'pendente'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluida'
+ERRO = 'erro'
+
+INTERVALO_PROGRESSO = 0.5   # segundos mínimos entre gravações de progresso
+INTERVALO_LIMPEZA = 600     # segundos entre limpezas de tarefas expiradas
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tarefas (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    usuario TEXT,
+    status TEXT NOT NULL,
+    progresso REAL NOT NULL DEFAULT 0,
+    mensagem TEXT,
+    erro TEXT,
+    artefato TEXT,
+    nome_download TEXT,
+    mimetype TEXT,
+    criada_em REAL NOT NULL,
+    iniciada_em REAL,
+    concluida_em REAL,
+    pid INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_tarefas_status ON tarefas (status, criada_em);
+"""
+
+# Fila usada pelos processos filhos do worker (herdada via fork)
+_fila_trabalhador = None
+
+
+def _processo_vivo(pid):
+    """True se `pid` ainda existe (o próprio processo conta como morto: acabou de iniciar)"""
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # existe, mas é de outro usuário
+    return True
+
+
+class TarefaDesconhecidaError(Exception):
+    """Tipo de tarefa sem função registrada"""
+
+
+class ContextoTarefa:
+    """
+    Passado para a função da tarefa, dentro do processo filho
+
+    Attributes:
+        id: identificador da tarefa
+        parametros: dict enviado em enfileirar()
+    """
+
+    def __init__(self, fila, tarefa):
+        self._fila = fila
+        self.id = tarefa['id']
+        self.parametros = tarefa['parametros']
+        self._ultimo_progresso = 0.0
+
+    def progresso(self, fracao, mensagem=None):
+        """Registra o andamento (0.0 a 1.0); gravações muito próximas são descartadas"""
+        agora = time.monotonic()
+        if fracao < 1.0 and agora - self._ultimo_progresso < INTERVALO_PROGRESSO:
+            return
+        self._ultimo_progresso = agora
+        campos = {'progresso': max(0.0, min(float(fracao), 1.0))}
+        if mensagem is not None:
+            campos['mensagem'] = mensagem
+        self._fila.atualizar(self.id, **campos)
+
+    def arquivo(self, extensao):
+        """Caminho onde a tarefa deve gravar o artefato"""
+        return self._fila.caminho_artefato(self.id, extensao)
+
+
+class FilaTarefas:
+    """
+    Args:
+        caminho_banco: arquivo SQLite da fila (criado se não existir)
+        diretorio_artefatos: onde os arquivos gerados ficam até expirar
+        retencao: segundos que tarefas finalizadas (e seus arquivos) são mantidas
+    """
+
+    def __init__(self, caminho_banco, diretorio_artefatos, retencao=24 * 3600):
+        self.caminho_banco = caminho_banco
+        self.diretorio_artefatos = diretorio_artefatos
+        self.retencao = retencao
+        self.app = None
+        self._funcoes = {}
+        self._esquema_criado = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Guarda o app: as tarefas rodam dentro de um contexto de requisição de teste"""
+        self.app = app
+        app.extensions['fila_tarefas'] = self
+
+    def registrar(self, tipo):
+        """
+        Decorador que associa `tipo` a uma função f(contexto) executada no worker
+
+        A função grava o artefato em contexto.arquivo(ext) e retorna
+        {'artefato': caminho, 'nome_download': ..., 'mimetype': ...}, ou None
+        quando não há nada a gerar (a tarefa termina sem arquivo).
+        """
+        def decorador(funcao):
+            self._funcoes[tipo] = funcao
+            return funcao
+        return decorador
+
+    @property
+    def tipos(self):
+        return tuple(self._funcoes)
+
+    # ------------------------------------------------------------------ #
+    # SQLite
+    # ------------------------------------------------------------------ #
+
+    def _conectar(self):
+        if not self._esquema_criado:
+            with self._lock:
+                if not self._esquema_criado:
+                    os.makedirs(os.path.dirname(self.caminho_banco) or '.', exist_ok=True)
+                    os.makedirs(self.diretorio_artefatos, exist_ok=True)
+                    conexao = sqlite3.connect(self.caminho_banco, timeout=30, isolation_level=None)
+                    try:
+                        # WAL: leituras de status não bloqueiam o worker gravando progresso
+                        conexao.execute('PRAGMA journal_mode=WAL')
+                        conexao.executescript(ESQUEMA)
+                    finally:
+                        conexao.close()
+                    self._esquema_criado = True
+        conexao = sqlite3.connect(self.caminho_banco, timeout=30, isolation_level=None)
+        conexao.row_factory = sqlite3.Row
+        return conexao
+
+    @staticmethod
+    def _linha_para_dict(linha):
+        tarefa = dict(linha)
+        tarefa['parametros'] = json.loads(tarefa['parametros'])
+        return tarefa
+
+    def enfileirar(self, tipo, parametros=None, usuario=None):
+        """Grava um pedido pendente e retorna seu id"""
+        if tipo not in self._funcoes:
+            raise TarefaDesconhecidaError(tipo)
+        id_tarefa = uuid.uuid4().hex
+        conexao = self._conectar()
+        try:
+            conexao.execute(
+                "INSERT INTO tarefas (id, tipo, parametros, usuario, status, criada_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (id_tarefa, tipo, json.dumps(parametros or {}, default=str), usuario, PENDENTE, time.time())
+            )
+        finally:
+            conexao.close()
+        return id_tarefa
+
+    def obter(self, id_tarefa):
+        """dict da tarefa, ou None se não existir (ou já tiver expirado)"""
+        conexao = self._conectar()
+        try:
+            linha = conexao.execute("SELECT * FROM tarefas WHERE id = ?", (id_tarefa,)).fetchone()
+        finally:
+            conexao.close()
+        return self._linha_para_dict(linha) if linha else None
+
+    def atualizar(self, id_tarefa, **campos):
+        atribuicoes = ', '.join(f'{campo} = ?' for campo in campos)
+        conexao = self._conectar()
+        try:
+            conexao.execute(f"UPDATE tarefas SET {atribuicoes} WHERE id = ?",
+                            (*campos.values(), id_tarefa))
+        finally:
+            conexao.close()
+
+    def reivindicar(self):
+        """Marca a tarefa pendente mais antiga como em execução e a retorna (ou None)"""
+        conexao = self._conectar()
+        try:
+            # BEGIN IMMEDIATE: dois workers nunca pegam a mesma tarefa
+            conexao.execute('BEGIN IMMEDIATE')
+            linha = conexao.execute(
+                "SELECT * FROM tarefas WHERE status = ? ORDER BY criada_em LIMIT 1", (PENDENTE,)
+            ).fetchone()
+            if linha is None:
+                conexao.execute('COMMIT')
+                return None
+            conexao.execute(
+                "UPDATE tarefas SET status = ?, iniciada_em = ?, pid = ? WHERE id = ?",
+                (EXECUTANDO, time.time(), os.getpid(), linha['id'])
+            )
+            conexao.execute('COMMIT')
+        except Exception:
+            conexao.execute('ROLLBACK')
+            raise
+        finally:
+            conexao.close()
+        return self._linha_para_dict(linha)
+
+    def recuperar_orfas(self):
+        """
+        Devolve à fila tarefas 'executando' de um worker que morreu; retorna quantas
+
+        Só as do pid que não existe mais: as de outro worker vivo (dois
+        `tarefas-worker`, ou um reiniciado enquanto outro trabalha) continuam
+        com ele. Os workers rodam na mesma máquina do arquivo SQLite.
+        """
+        conexao = self._conectar()
+        try:
+            conexao.execute('BEGIN IMMEDIATE')
+            linhas = conexao.execute("SELECT id, pid FROM tarefas WHERE status = ?", (EXECUTANDO,)).fetchall()
+            orfas = [(linha['id'],) for linha in linhas if not _processo_vivo(linha['pid'])]
+            conexao.executemany(
+                "UPDATE tarefas SET status = ?, progresso = 0, iniciada_em = NULL, pid = NULL "
+                "WHERE id = ? AND status = ?", [(PENDENTE, id_tarefa, EXECUTANDO) for id_tarefa, in orfas]
+            )
+            conexao.execute('COMMIT')
+        except Exception:
+            conexao.execute('ROLLBACK')
+            raise
+        finally:
+            conexao.close()
+        return len(orfas)
+
+    def limpar_expiradas(self):
+        """Apaga tarefas finalizadas há mais de `retencao` segundos e seus arquivos"""
+        limite = time.time() - self.retencao
+        conexao = self._conectar()
+        try:
+            linhas = conexao.execute(
+                "SELECT id, artefato FROM tarefas WHERE status IN (?, ?) AND concluida_em < ?",
+                (CONCLUIDA, ERRO, limite)
+            ).fetchall()
+            for linha in linhas:
+                if linha['artefato']:
+                    try:
+                        os.remove(linha['artefato'])
+                    except OSError:
+                        pass
+            conexao.executemany("DELETE FROM tarefas WHERE id = ?", [(l['id'],) for l in linhas])
+        finally:
+            conexao.close()
+        return len(linhas)
+
+    def caminho_artefato(self, id_tarefa, extensao):
+        return os.path.join(self.diretorio_artefatos, f'{id_tarefa}.{extensao.lstrip(".")}')
+
+    def metricas(self):
+        """Quantidade de tarefas por status"""
+        conexao = self._conectar()
+        try:
+            linhas = conexao.execute("SELECT status, COUNT(*) AS total FROM tarefas GROUP BY status").fetchall()
+        finally:
+            conexao.close()
+        return {linha['status']: linha['total'] for linha in linhas}
+
+    # ------------------------------------------------------------------ #
+    # Execução
+    # ------------------------------------------------------------------ #
+
+    def executar(self, tarefa):
+        """Roda uma tarefa já reivindicada e grava o resultado (chamado no processo filho)"""
+        funcao = self._funcoes.get(tarefa['tipo'])
+        contexto = ContextoTarefa(self, tarefa)
+        try:
+            if funcao is None:
+                raise TarefaDesconhecidaError(tarefa['tipo'])
+            if self.app is not None:
+                with self.app.test_request_context():
+                    resultado = funcao(contexto)
+            else:
+                resultado = funcao(contexto)
+        except Exception as e:
+            traceback.print_exc()
+            self.atualizar(tarefa['id'], status=ERRO, erro=str(e) or e.__class__.__name__,
+                           concluida_em=time.time())
+            return
+
+        campos = {'status': CONCLUIDA, 'progresso': 1.0, 'concluida_em': time.time()}
+        if resultado:
+            campos.update({chave: resultado.get(chave) for chave in ('artefato', 'nome_download', 'mimetype')})
+        self.atualizar(tarefa['id'], **campos)
+
+    def executar_trabalhador(self, processos=2, intervalo=1.0):
+        """
+        Laço do worker: reivindica tarefas e as executa em `processos` filhos
+
+        Usa fork (Linux): os filhos herdam o app e as funções registradas sem
+        precisar reimportar o app.py. SIGTERM/SIGINT param o laço depois que
+        as tarefas em andamento terminam.
+        """
+        global _fila_trabalhador
+        _fila_trabalhador = self
+
+        parar = threading.Event()
+
+        def ao_sinal(signum, frame):
+            print(f"Worker de tarefas: sinal {signum} recebido, aguardando tarefas em andamento...")
+            parar.set()
+
+        signal.signal(signal.SIGTERM, ao_sinal)
+        signal.signal(signal.SIGINT, ao_sinal)
+
+        recuperadas = self.recuperar_orfas()
+        if recuperadas:
+            print(f"Worker de tarefas: {recuperadas} tarefa(s) interrompida(s) voltaram para a fila")
+
+        contexto_mp = multiprocessing.get_context('fork')
+        ultima_limpeza = 0.0
+
+        while not parar.is_set():
+            em_execucao = {}
+            pool = ProcessPoolExecutor(processos, mp_context=contexto_mp, initializer=_iniciar_processo_filho)
+            try:
+                while not parar.is_set():
+                    for futuro in [f for f in em_execucao if f.done()]:
+                        id_tarefa = em_execucao.pop(futuro)
+                        erro = futuro.exception()
+                        if erro is not None:
+                            # Processo filho morreu (OOM, segfault no motor de PDF...)
+                            self.atualizar(id_tarefa, status=ERRO, erro=f'Processo interrompido: {erro!r}',
+                                           concluida_em=time.time())
+                            if isinstance(erro, BrokenProcessPool):
+                                raise erro
+
+                    while len(em_execucao) < processos:
+                        tarefa = self.reivindicar()
+                        if tarefa is None:
+                            break
+                        em_execucao[pool.submit(_executar_tarefa, tarefa)] = tarefa['id']
+
+                    if time.monotonic() - ultima_limpeza > INTERVALO_LIMPEZA:
+                        self.limpar_expiradas()
+                        ultima_limpeza = time.monotonic()
+
+                    parar.wait(intervalo)
+            except BrokenProcessPool:
+                # As demais tarefas do pool quebrado também falharam
+                for id_tarefa in em_execucao.values():
+                    tarefa = self.obter(id_tarefa)
+                    if tarefa and tarefa['status'] == EXECUTANDO:
+                        self.atualizar(id_tarefa, status=ERRO, erro='Processo interrompido',
+                                       concluida_em=time.time())
+                print("Worker de tarefas: pool de processos quebrado, recriando")
+                continue
+            finally:
+                pool.shutdown(wait=True)
+
+
+def _iniciar_processo_filho():
+    # Ctrl+C e SIGTERM são tratados pelo processo principal do worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _executar_tarefa(tarefa):
+    _fila_trabalhador.executar(tarefa)
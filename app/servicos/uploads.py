@@ -0,0 +1,196 @@
+"""
+Recepção de arquivos enviados em multipart direto para o disco
+
+Por padrão o Werkzeug guarda cada arquivo do formulário num
+SpooledTemporaryFile (em memória até 500KB) e a rota ainda lia tudo com
+file.read() ou copiava para o destino com file.save(). Aqui o parser escreve
+cada bloco recebido num temporário já no diretório de destino, calculando o
+SHA-256 e o tamanho no caminho. Acima do limite, ou se os primeiros bytes não
+forem de um tipo aceito, o arquivo é descartado ali mesmo e o restante do
+corpo é só consumido, sem ir para o disco. No fim a rota move o temporário
+para o lugar definitivo (os.replace, mesmo sistema de arquivos), sem segunda
+cópia.
+
+A rota escolhe o destino com o decorador recebe_uploads() do app.py, que
+preenche request.fabrica_uploads antes de request.files ser lido.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+from flask import Request
+
+TAMANHO_BLOCO = 1024 * 1024
+
+ASSINATURAS_PDF = (b'%PDF-',)
+ASSINATURAS_IMAGEM = (
+    b'\x89PNG\r\n\x1a\n',
+    b'\xff\xd8\xff',        # JPEG
+    b'GIF87a', b'GIF89a',
+    b'RIFF',                # WEBP (RIFF....WEBP)
+)
+TIPOS_POR_ASSINATURA = {
+    b'%PDF-': 'application/pdf',
+    b'\x89PNG\r\n\x1a\n': 'image/png',
+    b'\xff\xd8\xff': 'image/jpeg',
+    b'GIF87a': 'image/gif',
+    b'GIF89a': 'image/gif',
+    b'RIFF': 'image/webp',
+}
+
+
+class UploadRecusado(Exception):
+    """Arquivo acima do limite ou de tipo não aceito"""
+
+
+class ArquivoGrandeDemais(UploadRecusado):
+    """O arquivo passou do tamanho máximo"""
+
+
+class TipoNaoPermitido(UploadRecusado):
+    """Os primeiros bytes não são de nenhum tipo aceito"""
+
+
+class ArquivoRecebido:
+    """
+    Destino de um arquivo do multipart (objeto de arquivo para o Werkzeug)
+
+    Args:
+        diretorio: onde fica o temporário (o mesmo do destino final)
+        tamanho_max: limite em bytes (None = sem limite)
+        assinaturas: prefixos aceitos no início do conteúdo (None = qualquer)
+
+    Depois do upload: sha256, tamanho, tipo (mimetype pela assinatura, se
+    conferida) e erro (None ou a UploadRecusado da recusa).
+    """
+
+    def __init__(self, diretorio, tamanho_max=None, assinaturas=None):
+        os.makedirs(diretorio, exist_ok=True)
+        fd, self.caminho = tempfile.mkstemp(dir=diretorio, suffix='.upload')
+        self._arquivo = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self._inicio = b''
+        self.tamanho_max = tamanho_max
+        self.assinaturas = assinaturas
+        self.tamanho = 0
+        self.sha256 = None
+        self.tipo = None
+        self.erro = None
+
+    # --- escrita, chamada pelo parser bloco a bloco ---
+
+    def write(self, dados):
+        if self.erro is not None:
+            return len(dados)
+        self.tamanho += len(dados)
+        if self.tamanho_max is not None and self.tamanho > self.tamanho_max:
+            self._recusar(ArquivoGrandeDemais(
+                f"Arquivo muito grande. Tamanho máximo: {self.tamanho_max // (1024 * 1024)}MB"))
+            return len(dados)
+        if self.assinaturas and self._inicio is not None:
+            necessario = max(map(len, self.assinaturas))
+            self._inicio += dados[:necessario - len(self._inicio)]
+            if len(self._inicio) >= necessario:
+                self._conferir_tipo()
+                if self.erro is not None:
+                    return len(dados)
+        self._hash.update(dados)
+        self._arquivo.write(dados)
+        return len(dados)
+
+    def _conferir_tipo(self):
+        encontrada = next((a for a in self.assinaturas if self._inicio.startswith(a)), None)
+        if encontrada is None:
+            self._recusar(TipoNaoPermitido("Tipo de arquivo não permitido"))
+        else:
+            self.tipo = TIPOS_POR_ASSINATURA.get(encontrada)
+        self._inicio = None  # decidido: não acumula mais
+
+    def _recusar(self, erro):
+        self.erro = erro
+        self.descartar()
+
+    def concluir(self):
+        """Fecha a escrita (arquivo vazio ou menor que a assinatura também é conferido)"""
+        if self.sha256 is not None or self.erro is not None:
+            return
+        if self.assinaturas and self._inicio is not None:
+            self._conferir_tipo()
+            if self.erro is not None:
+                return
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        self.sha256 = self._hash.hexdigest()
+
+    # --- leitura: o parser volta ao início ao terminar; FileStorage.save() lê ---
+
+    def seek(self, posicao, de_onde=os.SEEK_SET):
+        self.concluir()
+        if self.erro is not None:
+            return 0
+        return self._arquivo.seek(posicao, de_onde)
+
+    def tell(self):
+        return 0 if self.erro is not None else self._arquivo.tell()
+
+    def read(self, tamanho=-1):
+        return b'' if self.erro is not None else self._arquivo.read(tamanho)
+
+    # --- destino final ---
+
+    def mover_para(self, destino):
+        """Move o conteúdo para `destino` (mesmo sistema de arquivos: só renomeia)"""
+        self.concluir()
+        if self.erro is not None:
+            raise self.erro
+        self._arquivo.close()
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(self.caminho, destino)
+        self.caminho = None
+
+    def descartar(self):
+        self._arquivo.close()
+        if self.caminho is not None and os.path.exists(self.caminho):
+            os.unlink(self.caminho)
+        self.caminho = None
+
+    def close(self):
+        """Chamado pelo Flask ao fim da requisição: apaga o que não foi movido"""
+        self.descartar()
+
+    @property
+    def closed(self):
+        return self._arquivo.closed
+
+
+def receber(origem, diretorio, tamanho_max=None, assinaturas=None):
+    """
+    ArquivoRecebido a partir de um arquivo aberto
+
+    Se `origem` já é um ArquivoRecebido (rota com recebe_uploads) ele mesmo é
+    devolvido; senão o conteúdo é copiado em blocos, com as mesmas checagens.
+    """
+    if isinstance(origem, ArquivoRecebido):
+        origem.concluir()
+        return origem
+    recebido = ArquivoRecebido(diretorio, tamanho_max, assinaturas)
+    try:
+        shutil.copyfileobj(origem, recebido, TAMANHO_BLOCO)
+        recebido.concluir()
+    except BaseException:
+        recebido.descartar()
+        raise
+    return recebido
+
+
+class RequisicaoComUploads(Request):
+    """Request do Flask que usa request.fabrica_uploads para os arquivos do multipart"""
+
+    fabrica_uploads = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.fabrica_uploads is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return self.fabrica_uploads()
@@ -0,0 +1,263 @@
+"""
+Uploads retomáveis em blocos para os anexos das avaliações
+
+Um PDF escaneado enviado num único POST multipart, a partir da rede de uma
+escola, costuma passar dos 60s do proxy_read_timeout do nginx e recomeça do
+zero. Aqui o cliente:
+
+    1. inicia o upload informando nome e tamanho     -> id do upload
+    2. envia blocos (PUT com o byte inicial)          -> faixas já recebidas
+    3. consulta as faixas recebidas para retomar      (após queda/recarga)
+    4. finaliza: o arquivo é conferido e vai para o armazém de anexos
+
+Cada upload fica em <diretorio>/<id>/: `conteudo` (o arquivo, escrito na
+posição de cada bloco), `recebido/<inicio>-<fim>` (um marcador vazio por
+bloco gravado por inteiro) e `estado.json`. Blocos podem chegar fora de
+ordem, repetidos ou em paralelo: os marcadores são criados só depois que o
+bloco foi escrito, sem trava entre processos. Uma queda custa só o bloco em
+andamento.
+
+O diretório deve ficar no mesmo sistema de arquivos do armazém (por padrão
+ANEXOS_DIR/parciais) para a finalização só renomear o arquivo.
+"""
+
+import hashlib
+import json
+import os
+import re
+import secrets
+import shutil
+import time
+
+from servicos.uploads import ArquivoGrandeDemais, TipoNaoPermitido
+
+TAMANHO_LEITURA = 1024 * 1024
+
+_ID_VALIDO = re.compile(r'^[0-9a-f]{32}$')
+_MARCADOR = re.compile(r'^(\d+)-(\d+)$')
+
+
+class UploadInexistente(Exception):
+    """Id desconhecido, expirado ou de outro usuário"""
+
+
+class BlocoInvalido(Exception):
+    """Bloco fora do arquivo, grande demais ou incompleto"""
+
+
+class UploadIncompleto(Exception):
+    """Finalização pedida antes de todos os bytes chegarem"""
+
+
+def _mesclar(faixas):
+    """Une faixas [inicio, fim) sobrepostas ou contíguas"""
+    unidas = []
+    for inicio, fim in sorted(faixas):
+        if unidas and inicio <= unidas[-1][1]:
+            unidas[-1][1] = max(unidas[-1][1], fim)
+        else:
+            unidas.append([inicio, fim])
+    return unidas
+
+
+class AreaUploads:
+    """
+    Args:
+        diretorio: área de preparação dos uploads em andamento
+        tamanho_max: tamanho máximo do arquivo em bytes
+        tamanho_bloco: tamanho máximo de cada PUT em bytes
+        validade: segundos sem atividade até o upload ser descartado
+    """
+
+    def __init__(self, diretorio, tamanho_max, tamanho_bloco, validade):
+        self.diretorio = diretorio
+        self.tamanho_max = tamanho_max
+        self.tamanho_bloco = tamanho_bloco
+        self.validade = validade
+
+    # --- caminhos e estado ---
+
+    def _pasta(self, id_upload):
+        if not _ID_VALIDO.match(id_upload or ''):
+            raise UploadInexistente(id_upload)
+        return os.path.join(self.diretorio, id_upload)
+
+    def _gravar_estado(self, pasta, estado):
+        temporario = os.path.join(pasta, 'estado.json.tmp')
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(estado, arquivo)
+        os.replace(temporario, os.path.join(pasta, 'estado.json'))
+
+    def _carregar(self, id_upload, usuario):
+        pasta = self._pasta(id_upload)
+        try:
+            with open(os.path.join(pasta, 'estado.json'), encoding='utf-8') as arquivo:
+                estado = json.load(arquivo)
+        except (OSError, ValueError):
+            raise UploadInexistente(id_upload)
+        if estado['usuario'] != usuario:
+            raise UploadInexistente(id_upload)
+        return pasta, estado
+
+    def _recebido(self, pasta):
+        try:
+            nomes = os.listdir(os.path.join(pasta, 'recebido'))
+        except OSError:
+            return []
+        faixas = []
+        for nome in nomes:
+            encontrado = _MARCADOR.match(nome)
+            if encontrado:
+                faixas.append((int(encontrado.group(1)), int(encontrado.group(2))))
+        return _mesclar(faixas)
+
+    def _resumo(self, pasta, estado):
+        recebido = self._recebido(pasta) if not estado.get('sha256') else [[0, estado['tamanho']]]
+        bytes_recebidos = sum(fim - inicio for inicio, fim in recebido)
+        return {
+            'id': estado['id'],
+            'nome': estado['nome'],
+            'tamanho': estado['tamanho'],
+            'tamanho_bloco': self.tamanho_bloco,
+            'recebido': recebido,
+            'bytes_recebidos': bytes_recebidos,
+            'completo': bytes_recebidos == estado['tamanho'],
+            'finalizado': bool(estado.get('sha256')),
+            'sha256': estado.get('sha256'),
+        }
+
+    # --- protocolo ---
+
+    def iniciar(self, nome, tamanho, usuario):
+        """
+        Reserva um upload de `tamanho` bytes
+
+        Raises:
+            ArquivoGrandeDemais: tamanho acima do limite
+            BlocoInvalido: tamanho ausente ou inválido
+        """
+        if not isinstance(tamanho, int) or tamanho <= 0:
+            raise BlocoInvalido("Tamanho do arquivo inválido")
+        if tamanho > self.tamanho_max:
+            raise ArquivoGrandeDemais(
+                f"Arquivo muito grande. Tamanho máximo: {self.tamanho_max // (1024 * 1024)}MB")
+        self.limpar_expirados()
+
+        id_upload = secrets.token_hex(16)
+        pasta = os.path.join(self.diretorio, id_upload)
+        os.makedirs(os.path.join(pasta, 'recebido'))
+        with open(os.path.join(pasta, 'conteudo'), 'wb') as arquivo:
+            arquivo.truncate(tamanho)
+        estado = {'id': id_upload, 'nome': nome, 'tamanho': tamanho, 'usuario': usuario,
+                  'criado_em': time.time()}
+        self._gravar_estado(pasta, estado)
+        return self._resumo(pasta, estado)
+
+    def consultar(self, id_upload, usuario):
+        """Faixas já recebidas (para o cliente retomar do que falta)"""
+        return self._resumo(*self._carregar(id_upload, usuario))
+
+    def gravar_bloco(self, id_upload, usuario, inicio, origem, tamanho):
+        """
+        Escreve `tamanho` bytes lidos de `origem` a partir de `inicio`
+
+        Raises:
+            BlocoInvalido: fora do arquivo, acima de tamanho_bloco, ou a
+                           conexão terminou antes do bloco inteiro (nada é marcado)
+        """
+        pasta, estado = self._carregar(id_upload, usuario)
+        if estado.get('sha256'):
+            return self._resumo(pasta, estado)
+        if tamanho is None or tamanho <= 0 or tamanho > self.tamanho_bloco:
+            raise BlocoInvalido(f"Cada bloco deve ter entre 1 byte e {self.tamanho_bloco} bytes")
+        if inicio is None or inicio < 0 or inicio + tamanho > estado['tamanho']:
+            raise BlocoInvalido("Bloco fora dos limites do arquivo")
+
+        escritos = 0
+        with open(os.path.join(pasta, 'conteudo'), 'r+b') as arquivo:
+            arquivo.seek(inicio)
+            while escritos < tamanho:
+                dados = origem.read(min(TAMANHO_LEITURA, tamanho - escritos))
+                if not dados:
+                    break
+                arquivo.write(dados)
+                escritos += len(dados)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        if escritos != tamanho:
+            raise BlocoInvalido(f"Bloco incompleto: {escritos} de {tamanho} bytes")
+
+        # Marcador só depois do bloco no disco; também conta como atividade recente
+        open(os.path.join(pasta, 'recebido', f"{inicio}-{inicio + tamanho}"), 'wb').close()
+        os.utime(pasta)
+        return self._resumo(pasta, estado)
+
+    def finalizar(self, id_upload, usuario, armazem):
+        """
+        Confere o arquivo completo e o move para o armazém de anexos
+
+        Idempotente: finalizar de novo devolve o mesmo resultado.
+
+        Raises:
+            UploadIncompleto: ainda faltam bytes
+            TipoNaoPermitido: o conteúdo não começa com uma assinatura aceita
+        """
+        pasta, estado = self._carregar(id_upload, usuario)
+        if estado.get('sha256'):
+            return self._resumo(pasta, estado)
+        resumo = self._resumo(pasta, estado)
+        if not resumo['completo']:
+            raise UploadIncompleto(f"Recebidos {resumo['bytes_recebidos']} de {estado['tamanho']} bytes")
+
+        caminho = os.path.join(pasta, 'conteudo')
+        h = hashlib.sha256()
+        try:
+            with open(caminho, 'rb') as arquivo:
+                inicio = arquivo.read(TAMANHO_LEITURA)
+                if armazem.assinaturas and not any(inicio.startswith(a) for a in armazem.assinaturas):
+                    raise TipoNaoPermitido("Tipo de arquivo não permitido")
+                while inicio:
+                    h.update(inicio)
+                    inicio = arquivo.read(TAMANHO_LEITURA)
+            armazem.adotar_caminho(caminho, h.hexdigest())
+        except FileNotFoundError:
+            # Outra finalização simultânea já moveu o arquivo
+            return self._resumo(*self._carregar(id_upload, usuario))
+
+        estado['sha256'] = h.hexdigest()
+        shutil.rmtree(os.path.join(pasta, 'recebido'), ignore_errors=True)
+        self._gravar_estado(pasta, estado)
+        return self._resumo(pasta, estado)
+
+    def finalizado(self, id_upload, usuario):
+        """
+        Resumo de um upload já finalizado, para gravar seus metadados no relatório
+
+        Raises:
+            UploadInexistente, UploadIncompleto
+        """
+        resumo = self.consultar(id_upload, usuario)
+        if not resumo['finalizado']:
+            raise UploadIncompleto("Upload ainda não finalizado")
+        return resumo
+
+    def descartar(self, id_upload):
+        shutil.rmtree(self._pasta(id_upload), ignore_errors=True)
+
+    def limpar_expirados(self):
+        """Apaga uploads sem atividade há mais de `validade` segundos"""
+        limite = time.time() - self.validade
+        removidos = 0
+        try:
+            nomes = os.listdir(self.diretorio)
+        except OSError:
+            return 0
+        for nome in nomes:
+            pasta = os.path.join(self.diretorio, nome)
+            try:
+                if _ID_VALIDO.match(nome) and os.path.getmtime(pasta) < limite:
+                    shutil.rmtree(pasta)
+                    removidos += 1
+            except OSError:
+                pass
+        return removidos
@@ -0,0 +1,53 @@
+"""
+Contadores de versão compartilhados entre os workers do gunicorn
+
+Cada worker tem seus próprios caches em memória; quando uma gravação torna
+um cache obsoleto, a rota chama incrementar('nome') e todos os workers
+percebem a mudança na próxima leitura de atual('nome').
+
+A versão de um nome é o arquivo <diretorio>/<nome>: incrementar() grava um
+arquivo novo e o troca de lugar com os.replace (novo inode), e atual()
+faz só um os.stat, sem abrir o arquivo nem travar nada.
+"""
+
+import os
+import tempfile
+import uuid
+
+
+class VersoesCompartilhadas:
+    """
+    Args:
+        diretorio: pasta compartilhada pelos processos (criada se não existir)
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def atual(self, nome):
+        """Identificador opaco da versão atual (None se nunca foi incrementada)"""
+        try:
+            info = os.stat(self._caminho(nome))
+        except OSError:
+            return None
+        return (info.st_ino, info.st_mtime_ns)
+
+    def etiqueta(self, nome):
+        """Versão atual como texto curto (para templates, ETags e chaves de cache)"""
+        versao = self.atual(nome)
+        return '0' if versao is None else f'{versao[0]:x}-{versao[1]:x}'
+
+    def incrementar(self, nome):
+        """Invalida tudo que foi calculado com a versão anterior de `nome`"""
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            fd, temporario = tempfile.mkstemp(dir=self.diretorio, prefix=f'.{nome}.')
+            with os.fdopen(fd, 'w') as f:
+                f.write(uuid.uuid4().hex)
+            os.replace(temporario, self._caminho(nome))
+        except OSError as e:
+            # Sem o arquivo os caches ainda expiram pelo TTL
+            print(f"Aviso: não foi possível incrementar a versão '{nome}': {e}")
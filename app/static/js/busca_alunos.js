@@ -0,0 +1,139 @@
+// Busca incremental de alunos para os <select data-busca-alunos>
+// Mostra um campo de busca acima da lista; os resultados vêm de /api/alunos/search
+// e, ao escolher um aluno, a opção correspondente é selecionada no <select>.
+// Enquanto o servidor ainda carrega o índice (carregando: true), tenta de novo.
+(function () {
+    const ATRASO_MS = 150;
+    const NOVA_TENTATIVA_MS = 1000;
+
+    function criarBusca(select) {
+        const caixa = document.createElement('div');
+        caixa.className = 'position-relative mb-2';
+
+        const campo = document.createElement('input');
+        campo.type = 'search';
+        campo.className = 'form-control';
+        campo.placeholder = 'Buscar aluno por nome, matrícula ou CPF...';
+        campo.autocomplete = 'off';
+
+        const lista = document.createElement('div');
+        lista.className = 'list-group position-absolute w-100 shadow-sm';
+        lista.style.zIndex = 1050;
+        lista.style.maxHeight = '300px';
+        lista.style.overflowY = 'auto';
+
+        caixa.appendChild(campo);
+        caixa.appendChild(lista);
+        select.parentNode.insertBefore(caixa, select);
+
+        let temporizador = null;
+        let controlador = null;
+
+        function limpar() {
+            lista.innerHTML = '';
+        }
+
+        function escolher(aluno) {
+            const valor = String(aluno.id_aluno);
+            let opcao = Array.from(select.options).find(o => o.value === valor);
+            if (!opcao) {
+                opcao = new Option(aluno.nome_aluno, valor);
+                select.add(opcao);
+            }
+            select.value = valor;
+            select.dispatchEvent(new Event('change', { bubbles: true }));
+            campo.value = aluno.nome_aluno;
+            limpar();
+        }
+
+        function mostrar(alunos, carregando) {
+            limpar();
+            if (carregando) {
+                const aviso = document.createElement('div');
+                aviso.className = 'list-group-item text-muted';
+                aviso.textContent = 'Carregando lista de alunos...';
+                lista.appendChild(aviso);
+                return;
+            }
+            if (alunos.length === 0) {
+                const vazio = document.createElement('div');
+                vazio.className = 'list-group-item text-muted';
+                vazio.textContent = 'Nenhum aluno encontrado';
+                lista.appendChild(vazio);
+                return;
+            }
+            alunos.forEach(aluno => {
+                const item = document.createElement('button');
+                item.type = 'button';
+                item.className = 'list-group-item list-group-item-action';
+                item.textContent = aluno.nome_aluno;
+                if (aluno.matricula_aluno) {
+                    const matricula = document.createElement('small');
+                    matricula.className = 'text-muted ms-2';
+                    matricula.textContent = `Matrícula ${aluno.matricula_aluno}`;
+                    item.appendChild(matricula);
+                }
+                item.addEventListener('click', () => escolher(aluno));
+                lista.appendChild(item);
+            });
+        }
+
+        function buscar(termo) {
+            if (controlador) {
+                controlador.abort();
+            }
+            controlador = new AbortController();
+            fetch(`/api/alunos/search?q=${encodeURIComponent(termo)}`, { signal: controlador.signal })
+                .then(resposta => resposta.json())
+                .then(dados => {
+                    mostrar(dados.alunos || [], dados.carregando);
+                    if (dados.carregando) {
+                        temporizador = setTimeout(() => buscar(termo), NOVA_TENTATIVA_MS);
+                    }
+                })
+                .catch(erro => {
+                    if (erro.name !== 'AbortError') {
+                        console.error('Erro na busca de alunos:', erro);
+                    }
+                });
+        }
+
+        campo.addEventListener('input', () => {
+            clearTimeout(temporizador);
+            const termo = campo.value.trim();
+            if (!termo) {
+                limpar();
+                return;
+            }
+            temporizador = setTimeout(() => buscar(termo), ATRASO_MS);
+        });
+
+        campo.addEventListener('keydown', evento => {
+            if (evento.key === 'Enter') {
+                // Não envia o formulário: escolhe o primeiro resultado
+                evento.preventDefault();
+                const primeiro = lista.querySelector('button');
+                if (primeiro) {
+                    primeiro.click();
+                }
+            } else if (evento.key === 'Escape') {
+                limpar();
+            }
+        });
+
+        document.addEventListener('click', evento => {
+            if (!caixa.contains(evento.target)) {
+                limpar();
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', () => {
+        const selects = document.querySelectorAll('select[data-busca-alunos]');
+        selects.forEach(criarBusca);
+        if (selects.length) {
+            // Sem termos: só adianta a carga do índice no servidor (ALUNOS_BUSCA_AQUECER)
+            fetch('/api/alunos/search').catch(() => {});
+        }
+    });
+})();
@@ -0,0 +1,158 @@
+// Upload retomável em blocos para os <input type="file" data-upload-retomavel="/anexos/uploads">
+// Arquivos maiores que data-upload-minimo são enviados antes do formulário, um PUT por bloco;
+// uma queda de conexão custa só o bloco em andamento e, se a página for recarregada, o envio
+// continua do que o servidor já recebeu (id guardado no localStorage). O formulário segue
+// só com o id do upload no campo anexo_upload.
+(function () {
+    const TENTATIVAS = 5;
+
+    function esperar(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function json(resposta) {
+        const dados = await resposta.json().catch(() => ({}));
+        if (!resposta.ok) {
+            const erro = new Error(dados.erro || `Erro ${resposta.status}`);
+            erro.status = resposta.status;
+            throw erro;
+        }
+        return dados;
+    }
+
+    // Repete requisições que falharam por rede ou erro do servidor (não as recusas 4xx)
+    async function comRetentativas(fazer) {
+        for (let tentativa = 1; ; tentativa++) {
+            try {
+                return await fazer();
+            } catch (erro) {
+                if ((erro.status && erro.status < 500) || tentativa >= TENTATIVAS) {
+                    throw erro;
+                }
+                await esperar(1000 * 2 ** (tentativa - 1));
+            }
+        }
+    }
+
+    function faltando(estado) {
+        const faixas = [];
+        let posicao = 0;
+        estado.recebido.forEach(([inicio, fim]) => {
+            if (inicio > posicao) {
+                faixas.push([posicao, inicio]);
+            }
+            posicao = Math.max(posicao, fim);
+        });
+        if (posicao < estado.tamanho) {
+            faixas.push([posicao, estado.tamanho]);
+        }
+        return faixas;
+    }
+
+    async function retomarOuIniciar(url, arquivo, chave) {
+        const anterior = localStorage.getItem(chave);
+        if (anterior) {
+            try {
+                return await json(await fetch(`${url}/${anterior}`));
+            } catch (erro) {
+                localStorage.removeItem(chave);  // expirou: começa de novo
+            }
+        }
+        const estado = await json(await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ nome: arquivo.name, tamanho: arquivo.size }),
+        }));
+        localStorage.setItem(chave, estado.id);
+        return estado;
+    }
+
+    async function enviar(url, arquivo, progresso) {
+        const chave = `upload_retomavel:${arquivo.name}:${arquivo.size}:${arquivo.lastModified}`;
+        let estado = await retomarOuIniciar(url, arquivo, chave);
+        let enviados = estado.bytes_recebidos;
+        progresso(enviados, arquivo.size);
+
+        for (const [inicioFaixa, fimFaixa] of faltando(estado)) {
+            for (let inicio = inicioFaixa; inicio < fimFaixa; inicio += estado.tamanho_bloco) {
+                const fim = Math.min(inicio + estado.tamanho_bloco, fimFaixa);
+                await comRetentativas(async () => json(await fetch(`${url}/${estado.id}?inicio=${inicio}`, {
+                    method: 'PUT',
+                    headers: { 'Content-Type': 'application/octet-stream' },
+                    body: arquivo.slice(inicio, fim),
+                })));
+                enviados += fim - inicio;
+                progresso(enviados, arquivo.size);
+            }
+        }
+
+        estado = await comRetentativas(async () => json(await fetch(`${url}/${estado.id}/finalizar`, {
+            method: 'POST',
+        })));
+        localStorage.removeItem(chave);
+        return estado.id;
+    }
+
+    function preparar(entrada) {
+        const formulario = entrada.form;
+        const url = entrada.dataset.uploadRetomavel;
+        const minimo = Number(entrada.dataset.uploadMinimo || 0);
+
+        const barra = document.createElement('div');
+        barra.className = 'progress mt-2 d-none';
+        barra.innerHTML = '<div class="progress-bar" role="progressbar" style="width: 0%"></div>';
+        entrada.parentNode.appendChild(barra);
+
+        const mensagem = document.createElement('div');
+        mensagem.className = 'form-text text-danger';
+        entrada.parentNode.appendChild(mensagem);
+
+        formulario.addEventListener('submit', async evento => {
+            const arquivo = entrada.files[0];
+            if (!arquivo || arquivo.size <= minimo || formulario.dataset.uploadConcluido) {
+                return;
+            }
+            evento.preventDefault();
+            const botao = evento.submitter;
+            mensagem.textContent = '';
+            barra.classList.remove('d-none');
+            if (botao) {
+                botao.disabled = true;
+            }
+
+            try {
+                const idUpload = await enviar(url, arquivo, (enviados, total) => {
+                    barra.firstElementChild.style.width = `${Math.floor(100 * enviados / total)}%`;
+                });
+
+                const campo = document.createElement('input');
+                campo.type = 'hidden';
+                campo.name = 'anexo_upload';
+                campo.value = idUpload;
+                formulario.appendChild(campo);
+                // O botão clicado (ex.: action=save) não vai junto no submit() programático
+                if (botao && botao.name) {
+                    const acao = document.createElement('input');
+                    acao.type = 'hidden';
+                    acao.name = botao.name;
+                    acao.value = botao.value;
+                    formulario.appendChild(acao);
+                }
+                entrada.removeAttribute('name');  // o arquivo não é enviado de novo
+                formulario.dataset.uploadConcluido = '1';
+                formulario.submit();
+            } catch (erro) {
+                console.error('Erro no envio do anexo:', erro);
+                mensagem.textContent = `Não foi possível enviar o anexo: ${erro.message}. ` +
+                    'Tente de novo: o envio continua de onde parou.';
+                if (botao) {
+                    botao.disabled = false;
+                }
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', () => {
+        document.querySelectorAll('input[type=file][data-upload-retomavel]').forEach(preparar);
+    });
+})();
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca de alunos (servicos.busca_alunos) com cadastros sintéticos
+
+Carrega N alunos fictícios no índice (nomes com 3 ou 4 palavras: parte dos
+nomes e sobrenomes comuns, parte raros) e mede cada consulta R vezes, só
+alunos ativos e com ?todos=1. As consultas incluem prefixos curtos de termos
+comuns ('a p l'), que são o pior caso de uma varredura, e combinações raras.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_busca_alunos.py [--alunos 100000] [--repeticoes 200] [--comuns 0.6]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'app'))
+
+from servicos.busca_alunos import IndiceAlunos  # noqa: E402
+
+NOMES = ['João', 'Maria', 'José', 'Ana', 'Pedro', 'Paulo', 'Lucas', 'Gabriel', 'Rafael', 'Carlos', 'Francisca',
+         'Antônio', 'Luiz', 'Marcos', 'Juliana', 'Fernanda', 'Patrícia', 'Aline', 'Bruno', 'Felipe', 'Larissa',
+         'Leonardo', 'Letícia', 'Luana', 'Priscila', 'Paula']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+              'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira',
+              'Barbosa', 'Pinto', 'Leite', 'Lacerda', 'Paiva']
+CONSULTAS = ['joao', 'm0001', 'maria s', 'maria da', 'ma si', 'j s', 'p p', 'joao souza', 'joao souza silva',
+             'jose silva santos', 'pedro santos oliveira', 'ana p l', 'a p l', 'a b c', 'l l l', 'ana raro1',
+             'raro12 raro13', 'nome1 raro1 raro2', 'zzz']
+
+
+class CursorSintetico:
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    def execute(self, sql, parametros=()):
+        pass
+
+    def fetchone(self):
+        return {'agora': 0}
+
+    def fetchall(self):
+        return self.linhas
+
+    def close(self):
+        pass
+
+
+class ConexaoSintetica:
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    def cursor(self):
+        return CursorSintetico(self.linhas)
+
+
+def gerar(alunos, comuns):
+    nomes = NOMES + [f'Nome{i}' for i in range(300)]
+    sobrenomes = SOBRENOMES + [f'Raro{i}' for i in range(500)]
+
+    def escolher(lista, frequentes):
+        return random.choice(lista[:frequentes]) if random.random() < comuns else random.choice(lista)
+
+    linhas = []
+    for i in range(alunos):
+        palavras = [escolher(nomes, len(NOMES))] + [escolher(sobrenomes, len(SOBRENOMES))
+                                                    for _ in range(3 if random.random() < 0.4 else 2)]
+        linhas.append({
+            'id_aluno': i, 'nome_aluno': ' '.join(palavras), 'matricula_aluno': f'M{i:06d}',
+            'cpf_normalizado': f'{random.randrange(10 ** 11):011d}',
+            'status_aluno': 'Ativo' if random.random() < 0.7 else 'Inativo',
+        })
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alunos', type=int, default=100000)
+    parser.add_argument('--repeticoes', type=int, default=200)
+    parser.add_argument('--comuns', type=float, default=0.6, help='Fração de nomes/sobrenomes comuns')
+    parser.add_argument('--semente', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.semente)
+    conexao = ConexaoSintetica(gerar(args.alunos, args.comuns))
+    indice = IndiceAlunos()
+    inicio = time.perf_counter()
+    indice.sincronizar(conexao, 1)
+    print(f"carga: {time.perf_counter() - inicio:.2f}s {indice.metricas()}")
+
+    print(f"{'consulta':<22}{'todos':>6}{'mediana (ms)':>14}{'p95 (ms)':>10}{'máx (ms)':>10}{'achados':>9}")
+    pior = 0.0
+    for consulta in CONSULTAS:
+        for apenas_ativos in (True, False):
+            tempos = []
+            for _ in range(args.repeticoes):
+                inicio = time.perf_counter()
+                achados = indice.buscar(consulta, 20, apenas_ativos)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            tempos.sort()
+            p95 = tempos[min(int(len(tempos) * 0.95), len(tempos) - 1)]
+            pior = max(pior, p95)
+            print(f"{consulta:<22}{'' if apenas_ativos else 'sim':>6}{tempos[len(tempos) // 2]:>14.3f}"
+                  f"{p95:>10.3f}{tempos[-1]:>10.3f}{len(achados):>9}")
+    print(f"pior p95: {pior:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark das exportações Excel: pandas em memória x streaming constant_memory
+
+Cada cenário roda num processo separado (para o pico de RSS ser isolado) com
+linhas sintéticas no formato das views vw_quest_* e mede:
+
+    pico RSS    ru_maxrss do processo ao final da exportação
+    TTFB        tempo até o primeiro bloco da resposta ficar disponível
+    total       tempo até o último byte
+
+Uso (na raiz do projeto, com pandas e xlsxwriter instalados):
+    python benchmarks/bench_exportacao_excel.py [--linhas 10000 100000 1000000] [--colunas 40]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SONDA = r"""
+import datetime, io, json, resource, sys, time
+sys.path.insert(0, 'app')
+
+modo, n_linhas, n_colunas = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+colunas = ['id_aluno', 'nome_aluno', 'dt_nascimento'] + [f'campo_{i}' for i in range(n_colunas - 3)]
+hoje = datetime.date(2025, 1, 1)
+
+
+def linhas():
+    for i in range(n_linhas):
+        yield (i, f'Aluno {i}', hoje) + tuple(f'Resposta {i}-{c}' for c in range(n_colunas - 3))
+
+
+class CursorSintetico:
+    description = [(c,) for c in colunas]
+
+    def __init__(self):
+        self._linhas = linhas()
+
+    def fetchmany(self, n):
+        lote = []
+        for linha in self._linhas:
+            lote.append(linha)
+            if len(lote) == n:
+                break
+        return lote
+
+    def fetchall(self):
+        return list(self._linhas)
+
+
+inicio = time.perf_counter()
+if modo == 'pandas':
+    import pandas as pd
+    dados = CursorSintetico().fetchall()
+    df = pd.DataFrame(dados, columns=colunas)
+    arquivo = io.BytesIO()
+    with pd.ExcelWriter(arquivo, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name='PEI')
+    arquivo.seek(0)
+else:
+    from servicos.exportacao import gerar_xlsx
+    arquivo = gerar_xlsx(CursorSintetico(), 'PEI')
+
+primeiro = arquivo.read(64 * 1024)
+ttfb = time.perf_counter() - inicio
+tamanho = len(primeiro)
+while True:
+    bloco = arquivo.read(64 * 1024)
+    if not bloco:
+        break
+    tamanho += len(bloco)
+total = time.perf_counter() - inicio
+
+pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+pico_mb = pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+print(json.dumps({'pico_rss_mb': pico_mb, 'ttfb_s': ttfb, 'total_s': total, 'bytes': tamanho}))
+"""
+
+
+def medir(modo, linhas, colunas):
+    saida = subprocess.run(
+        [sys.executable, '-c', SONDA, modo, str(linhas), str(colunas)],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--colunas', type=int, default=40)
+    parser.add_argument('--modos', nargs='+', default=['pandas', 'streaming'], choices=['pandas', 'streaming'])
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10}  {'modo':<10}{'pico RSS (MB)':>15}{'TTFB (s)':>11}{'total (s)':>11}{'xlsx (MB)':>11}")
+    for linhas in args.linhas:
+        for modo in args.modos:
+            r = medir(modo, linhas, args.colunas)
+            print(f"{linhas:>10}  {modo:<10}{r['pico_rss_mb']:>15.1f}{r['ttfb_s']:>11.2f}"
+                  f"{r['total_s']:>11.2f}{r['bytes'] / 1048576:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inicialização dos workers do NeuroEduca
+
+Mede, em processos Python novos (como um worker do gunicorn), o tempo de
+`import app.app` e o RSS resultante em dois modos:
+
+    antecipado  PRELOAD_REPORT_LIBS=True  (equivale ao comportamento antigo,
+                com weasyprint/pandas/xhtml2pdf importados no topo do app.py)
+    tardio      PRELOAD_REPORT_LIBS=False (bibliotecas só no primeiro relatório)
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_inicializacao.py [--repeticoes 5] [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado em cada processo filho
+SONDA = r"""
+import json, os, sys, time
+inicio = time.perf_counter()
+import app.app
+importacao = time.perf_counter() - inicio
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / (1024 * 1024) if sys.platform == 'darwin' else maximo / 1024
+
+rss_inicial = rss_mb()
+inicio = time.perf_counter()
+app.app.aquecer_bibliotecas()
+primeiro_relatorio = time.perf_counter() - inicio
+print(json.dumps({
+    'importacao_s': importacao,
+    'rss_mb': rss_inicial,
+    'carga_primeiro_relatorio_s': primeiro_relatorio,
+    'rss_apos_relatorio_mb': rss_mb(),
+}))
+"""
+
+
+def medir(modo, repeticoes):
+    env = dict(os.environ)
+    env['PRELOAD_REPORT_LIBS'] = 'True' if modo == 'antecipado' else 'False'
+    env.setdefault('FLASK_ENV', 'development')
+    amostras = []
+    for _ in range(repeticoes):
+        saida = subprocess.run(
+            [sys.executable, '-c', SONDA],
+            cwd=RAIZ, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        amostras.append(json.loads(saida.strip().splitlines()[-1]))
+    return {chave: statistics.median(a[chave] for a in amostras) for chave in amostras[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4, help='workers do gunicorn (Dockerfile usa 4)')
+    args = parser.parse_args()
+
+    resultados = {modo: medir(modo, args.repeticoes) for modo in ('antecipado', 'tardio')}
+
+    print(f"{'modo':<12}{'import (s)':>12}{'RSS (MB)':>12}{'RSS x' + str(args.workers):>12}"
+          f"{'1º relatório (s)':>20}")
+    for modo, r in resultados.items():
+        print(f"{modo:<12}{r['importacao_s']:>12.3f}{r['rss_mb']:>12.1f}"
+              f"{r['rss_mb'] * args.workers:>12.1f}{r['carga_primeiro_relatorio_s']:>20.3f}")
+
+    antes, depois = resultados['antecipado'], resultados['tardio']
+    print(f"\nInicialização: {antes['importacao_s'] / max(depois['importacao_s'], 1e-9):.1f}x mais rápida; "
+          f"RSS por worker: -{antes['rss_mb'] - depois['rss_mb']:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
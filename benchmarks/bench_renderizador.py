@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark do renderizador de PDF: configuração fria x processo aquecido
+
+Renderiza o relatório GUIDE (WeasyPrint) N vezes num processo novo e mede o
+tempo por PDF em dois modos:
+
+    frio     como era em gerar_pdf_guide: FontConfiguration, CSS(@page) e
+             busca dos recursos (CSS do CDN, logo) refeitos a cada PDF
+    quente   servicos.render_pdf.html_para_pdf: fontes, CSS interpretado e
+             recursos em memória reaproveitados entre PDFs
+
+O HTML é renderizado uma vez (fora da medição), com respostas fictícias.
+
+Uso (na raiz do projeto, com weasyprint instalado):
+    python benchmarks/bench_renderizador.py [--pdfs 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SONDA = r"""
+import json, sys, time
+from collections import defaultdict
+from io import BytesIO
+
+modo, n_pdfs = sys.argv[1], int(sys.argv[2])
+import app.app as m
+from servicos.render_pdf import CSS_GUIDE, html_para_pdf
+
+with m.app.test_request_context():
+    respostas = defaultdict(lambda: 'Resposta de teste', id_aluno=1, nome_aluno='Aluno Teste')
+    motor, html, css, hints = m.trabalho_pdf('guide', respostas)
+
+
+def frio():
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
+    font_config = FontConfiguration()
+    pdf = BytesIO()
+    HTML(string=html).write_pdf(pdf, stylesheets=[CSS(string=CSS_GUIDE)], font_config=font_config,
+                                presentational_hints=True)
+    return pdf.getvalue()
+
+
+renderizar = frio if modo == 'frio' else (lambda: html_para_pdf(motor, html, css, hints))
+
+tempos = []
+for _ in range(n_pdfs):
+    inicio = time.perf_counter()
+    renderizar()
+    tempos.append(time.perf_counter() - inicio)
+print(json.dumps({'primeiro_s': tempos[0], 'demais_s': tempos[1:] or tempos}))
+"""
+
+
+def medir(modo, pdfs):
+    env = dict(os.environ)
+    env.setdefault('FLASK_ENV', 'development')
+    saida = subprocess.run(
+        [sys.executable, '-c', SONDA, modo, str(pdfs)],
+        cwd=RAIZ, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdfs', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'modo':<8}{'1º PDF (s)':>12}{'mediana (s)':>13}{'p95 (s)':>10}{'PDFs/s':>9}")
+    for modo in ('frio', 'quente'):
+        r = medir(modo, args.pdfs)
+        demais = sorted(r['demais_s'])
+        mediana = statistics.median(demais)
+        p95 = demais[min(int(len(demais) * 0.95), len(demais) - 1)]
+        print(f"{modo:<8}{r['primeiro_s']:>12.3f}{mediana:>13.3f}{p95:>10.3f}{1 / mediana:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,58 @@ class Config:
     MYSQL_DB = os.getenv('MYSQL_DB')
     MYSQL_CURSORCLASS = 'DictCursor'
     
+    # Pool de conexões MySQL (por processo/worker do gunicorn)
+    MYSQL_POOL_MIN_SIZE = int(os.getenv('MYSQL_POOL_MIN_SIZE', 1))
+    MYSQL_POOL_MAX_SIZE = int(os.getenv('MYSQL_POOL_MAX_SIZE', 4))
+    MYSQL_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', 10))  # segundos aguardando conexão livre
+    MYSQL_POOL_IDLE_TIMEOUT = int(os.getenv('MYSQL_POOL_IDLE_TIMEOUT', 300))  # fecha ociosas acima do mínimo
+    MYSQL_POOL_PING_INTERVAL = int(os.getenv('MYSQL_POOL_PING_INTERVAL', 5))  # 0 = ping em toda retirada
+    
+    # Importa weasyprint/pandas/xhtml2pdf já na inicialização (útil com gunicorn --preload)
+    PRELOAD_REPORT_LIBS = os.getenv('PRELOAD_REPORT_LIBS', 'False').lower() == 'true'
+    
+    # Cache em disco dos PDFs gerados (LRU por tamanho total)
+    PDF_CACHE_ENABLED = os.getenv('PDF_CACHE_ENABLED', 'True').lower() == 'true'
+    PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', 'app/cache/pdf')
+    PDF_CACHE_MAX_MB = int(os.getenv('PDF_CACHE_MAX_MB', 500))
+    
+    # Caches em memória por worker, invalidados por versões compartilhadas em disco
+    CACHE_VERSIONS_DIR = os.getenv('CACHE_VERSIONS_DIR', 'data/versoes')
+    DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 60))  # segundos; 0 desliga
+    CPF_CACHE_SIZE = int(os.getenv('CPF_CACHE_SIZE', 1024))  # buscas por CPF em memória (LRU)
+    ALUNOS_ATIVOS_CACHE_TTL = int(os.getenv('ALUNOS_ATIVOS_CACHE_TTL', 300))  # lista dos selects; 0 desliga
+    ALUNOS_IMPORT_BATCH_SIZE = int(os.getenv('ALUNOS_IMPORT_BATCH_SIZE', 500))  # linhas por transação na importação
+    # Abrir uma página com a busca de alunos já dispara a carga do índice (em segundo plano); se False, só a primeira busca
+    ALUNOS_BUSCA_AQUECER = os.getenv('ALUNOS_BUSCA_AQUECER', 'True').lower() == 'true'
+    
+    # Importação de respostas em NDJSON (rota /ingestao/<tipo> e `flask importar-respostas`)
+    INGESTAO_BATCH_SIZE = int(os.getenv('INGESTAO_BATCH_SIZE', 500))  # linhas por transação
+    INGESTAO_MAX_ERROS = int(os.getenv('INGESTAO_MAX_ERROS', 1000))  # erros detalhados no relatório
+    
+    # Evidências dos chamados de suporte (imagem ou PDF, endereçadas por SHA-256; `flask suporte-evidencias-migrar`)
+    SUPORTE_EVIDENCIA_DIR = os.getenv('SUPORTE_EVIDENCIA_DIR', 'data/evidencias')
+    SUPORTE_EVIDENCIA_MAX_MB = int(os.getenv('SUPORTE_EVIDENCIA_MAX_MB', 10))
+    
+    # Anexos dos relatórios de avaliação (arquivos endereçados por SHA-256; `flask anexos-migrar`)
+    ANEXOS_DIR = os.getenv('ANEXOS_DIR', 'data/anexos')
+    ANEXOS_MAX_MB = int(os.getenv('ANEXOS_MAX_MB', 10))  # limite por arquivo enviado num único POST
+    # Upload retomável em blocos (/anexos/uploads): arquivos maiores, um PUT curto por bloco
+    ANEXOS_RETOMAVEL_MAX_MB = int(os.getenv('ANEXOS_RETOMAVEL_MAX_MB', 100))
+    ANEXOS_BLOCO_MB = int(os.getenv('ANEXOS_BLOCO_MB', 2))
+    ANEXOS_PARCIAIS_HORAS = int(os.getenv('ANEXOS_PARCIAIS_HORAS', 24))  # uploads parados são apagados
+    
+    # Fila de tarefas em segundo plano (SQLite + `flask tarefas-worker`)
+    JOBS_DB = os.getenv('JOBS_DB', 'data/tarefas.sqlite3')
+    JOBS_DIR = os.getenv('JOBS_DIR', 'data/tarefas')
+    JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))  # processos filhos do worker
+    JOBS_RETENTION_HOURS = int(os.getenv('JOBS_RETENTION_HOURS', 24))  # depois disso o arquivo é apagado
+    JOBS_EXCEL_THRESHOLD_ROWS = int(os.getenv('JOBS_EXCEL_THRESHOLD_ROWS', 50000))  # 0 = só com ?assincrono=1
+    JOBS_PDF_BATCH_THRESHOLD = int(os.getenv('JOBS_PDF_BATCH_THRESHOLD', 30))  # alunos; acima disso o ZIP vai para a fila
+    
+    # PDFs em lote: processos de conversão HTML -> PDF aquecidos (0 = um por núcleo)
+    PDF_BATCH_WORKERS = int(os.getenv('PDF_BATCH_WORKERS', 0))
+    PDF_BATCH_IDLE_TIMEOUT = int(os.getenv('PDF_BATCH_IDLE_TIMEOUT', 300))  # encerra os processos ociosos (0 = nunca)
+    
     # Servidor
     HOST = os.getenv('HOST', '127.0.0.1')
     PORT = int(os.getenv('PORT', 5000))
@@ -86,16 +138,16 @@ class TestingConfig(Config):
     MYSQL_DB = 'test_db_funcae'
 
 
-def get_config(env=None):
+def get_config_class(env=None):
     """
-    Retorna a configuração apropriada baseada no ambiente
+    Retorna a classe de configuração do ambiente, sem instanciá-la
+    
+    Útil para ler valores (ex.: pool MySQL) sem disparar as validações
+    de produção feitas no __init__.
     
     Args:
         env: Nome do ambiente ('development', 'staging', 'production', 'testing')
              Se None, usa a variável FLASK_ENV ou padrão para desenvolvimento
-    
-    Returns:
-        Classe de configuração apropriada
     """
     if env is None:
         env = os.getenv('FLASK_ENV', 'development').lower()
@@ -110,4 +162,18 @@ def get_config(env=None):
     if env not in config_map:
         raise ValueError(f"Ambiente inválido: {env}. Use: {', '.join(config_map.keys())}")
     
-    return config_map[env]()
+    return config_map[env]
+
+
+def get_config(env=None):
+    """
+    Retorna a configuração apropriada baseada no ambiente
+    
+    Args:
+        env: Nome do ambiente ('development', 'staging', 'production', 'testing')
+             Se None, usa a variável FLASK_ENV ou padrão para desenvolvimento
+    
+    Returns:
+        Classe de configuração apropriada
+    """
+    return get_config_class(env)()